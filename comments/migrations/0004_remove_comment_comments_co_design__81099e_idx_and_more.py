@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_initial'),
+        ('designs', '0004_remove_design_designs_des_user_id_84d3bd_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comments_co_design__81099e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comments_co_created_f3c0a0_idx',
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['design', '-created_at', '-id'], name='comments_co_design__361949_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='comments_co_created_86dec8_idx'),
+        ),
+    ]
@@ -18,8 +18,8 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['design_id']),
-            models.Index(fields=['-created_at']),
+            models.Index(fields=['design', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
         ]
     
     def __str__(self):
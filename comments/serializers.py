@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Comment
+from social.viewer import get_viewer
 
 class CommentSerializer(serializers.ModelSerializer):
     is_owner = serializers.SerializerMethodField()
@@ -14,10 +15,7 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user_nickname', 'user_profile_image', 'created_at', 'updated_at']
     
     def get_is_owner(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.user == request.user
-        return False
+        return get_viewer(self.context).is_self(obj.user_id)
 
 class CommentCreateSerializer(serializers.ModelSerializer):
     class Meta:
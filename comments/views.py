@@ -2,8 +2,13 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
 from .models import Comment
 from .serializers import CommentSerializer, CommentCreateSerializer
+from designs.cache import bump_designs
+from fab_sketch_project.conditional import conditional_response, make_etag
 from designs.models import Design
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -25,11 +30,25 @@ class CommentViewSet(viewsets.ModelViewSet):
         """Get comments for a specific design"""
         if design_id:
             self.design_id = design_id
-            design = get_object_or_404(Design, id=design_id)
         
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        def render():
+            if design_id:
+                get_object_or_404(Design, id=design_id)
+            page = self.paginate_queryset(self.get_queryset())
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        # The unfiltered list changes with every comment anywhere; it is not worth validating
+        filtered_by = design_id or request.query_params.get('design_id')
+        if not filtered_by:
+            return render()
+        # Comments carry their author's nickname and image, so the design's comment
+        # count and timestamp decide the response; both come from one primary key lookup
+        row = Design.objects.filter(pk=filtered_by).values_list('comment_count', 'comments_updated_at').first()
+        if row is None:
+            return render()
+        etag = make_etag('comments', filtered_by, request.user.pk, *row)
+        return conditional_response(request, etag, row[1], render)
     
     def create(self, request, design_id=None):
         """Create comment for a specific design"""
@@ -40,7 +59,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        with transaction.atomic():
+            comment = serializer.save(user=request.user)
+            Design.objects.filter(pk=comment.design_id).update(
+                comment_count=F('comment_count') + 1, comments_updated_at=Now(), last_activity_at=Now()
+            )
+            bump_designs(comment.design_id)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
     def update(self, request, *args, **kwargs):
@@ -50,9 +74,23 @@ class CommentViewSet(viewsets.ModelViewSet):
                           status=status.HTTP_403_FORBIDDEN)
         return super().update(request, *args, **kwargs)
     
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            comment = serializer.save()
+            Design.objects.filter(pk=comment.design_id).update(comments_updated_at=Now())
+    
     def destroy(self, request, *args, **kwargs):
         comment = self.get_object()
         if comment.user != request.user:
             return Response({'error': 'Permission denied'}, 
                           status=status.HTTP_403_FORBIDDEN)
         return super().destroy(request, *args, **kwargs)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Design.objects.filter(pk=instance.design_id).update(
+                comment_count=Greatest(F('comment_count') - 1, 0), comments_updated_at=Now(),
+                last_activity_at=Now()
+            )
+            bump_designs(instance.design_id)
@@ -98,11 +98,49 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'fab_sketch_project.pagination.CreatedAtCursorPagination',
 }
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Design view count write-behind buffer
+# The stored count lags by at most FLUSH_INTERVAL seconds or MAX_PENDING views.
+VIEW_COUNT_FLUSH_INTERVAL = float(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', '5'))
+VIEW_COUNT_MAX_PENDING = int(os.environ.get('VIEW_COUNT_MAX_PENDING', '1000'))
+
+# Following timeline: designers with more followers than this are read on demand
+# instead of being fanned out to every follower's inbox
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Recent designs copied into the inbox when following someone
+TIMELINE_BACKFILL_LIMIT = 100
+
+# Trending feed: engagement loses half its weight every TRENDING_HALF_LIFE_HOURS.
+# Scores are refreshed by running `manage.py update_trending` periodically (cron).
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Serialized designs are cached per design/designer version (designs/cache.py).
+# Version bumps must reach every Gunicorn worker, so the default here is a cache
+# shared on disk by the instance's workers rather than per-process local memory.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', '/tmp/fab-sketch-cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+DESIGN_CACHE_TIMEOUT = int(os.environ.get('DESIGN_CACHE_TIMEOUT', '300'))
+
+# Design generation runs off the request thread (designs/generation_backends.py)
+GENERATION_BACKEND = os.environ.get('GENERATION_BACKEND', 'designs.generation_backends.LambdaEventBackend')
+GENERATION_CALLBACK_SECRET = os.environ.get('GENERATION_CALLBACK_SECRET', '')
+GENERATION_BATCH_CONCURRENCY = int(os.environ.get('GENERATION_BATCH_CONCURRENCY', '3'))
+SKETCH_MAX_DIMENSION = int(os.environ.get('SKETCH_MAX_DIMENSION', '1024'))
+SKETCH_PREPROCESS_WORKERS = int(os.environ.get('SKETCH_PREPROCESS_WORKERS', '4'))
+SKETCH_STORAGE_BACKEND = os.environ.get('SKETCH_STORAGE_BACKEND', 'designs.storage.S3Storage')
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', '2'))
+
 # AWS S3 configuration
 AWS_ACCESS_KEY_ID = None  # Use IAM Role
 AWS_SECRET_ACCESS_KEY = None  # Use IAM Role
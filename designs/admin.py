@@ -1,12 +1,12 @@
 from django.contrib import admin
-from .models import Design
+from .models import Design, GenerationBatch, GenerationJob
 
 @admin.register(Design)
 class DesignAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'view_count', 'like_count', 'comment_count', 'created_at']
+    list_display = ['title', 'user', 'view_count', 'like_count', 'comment_count', 'bookmark_count', 'created_at']
     list_filter = ['created_at', 'user']
     search_fields = ['title', 'description', 'user__nickname']
-    readonly_fields = ['view_count', 'created_at', 'like_count', 'comment_count']
+    readonly_fields = ['view_count', 'created_at', 'like_count', 'comment_count', 'bookmark_count']
     ordering = ['-created_at']
     
     fieldsets = (
@@ -14,21 +14,28 @@ class DesignAdmin(admin.ModelAdmin):
             'fields': ('user', 'title', 'description')
         }),
         ('Images', {
-            'fields': ('sketch_url', 'flat_url', 'wearing_url')
+            'fields': ('sketch_url', 'tech_flat_url', 'try_on_url')
         }),
         ('Details', {
             'fields': ('hashtags', 'materials')
         }),
         ('Stats', {
-            'fields': ('view_count', 'like_count', 'comment_count', 'created_at'),
+            'fields': ('view_count', 'like_count', 'comment_count', 'bookmark_count', 'created_at'),
             'classes': ('collapse',)
         })
     )
-    
-    def like_count(self, obj):
-        return obj.likes.count()
-    like_count.short_description = 'Likes'
-    
-    def comment_count(self, obj):
-        return obj.comments.count()
-    comment_count.short_description = 'Comments'
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'user', 'status', 'batch', 'created_at', 'completed_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['session_id', 'batch__session_id', 'user__nickname']
+    readonly_fields = ['created_at', 'updated_at', 'submitted_at', 'completed_at']
+    ordering = ['-created_at']
+
+@admin.register(GenerationBatch)
+class GenerationBatchAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'user', 'concurrency', 'created_at']
+    search_fields = ['session_id', 'user__nickname']
+    readonly_fields = ['created_at']
+    ordering = ['-created_at']
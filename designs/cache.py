@@ -0,0 +1,99 @@
+"""
+Versioned cache of serialized designs.
+
+Every design and every user has a version number in the cache. A cached
+design payload is stored under its design version, along with the version of
+its designer at the time it was rendered; it is used only while both are
+still current. Writes never delete payloads, they bump a version (likes,
+bookmarks and comments bump the design, follows and profile edits bump the
+user), and stale entries simply expire.
+
+Payloads hold only the part of the response that is the same for everyone.
+Viewer-specific fields are filled in per request by the serializers.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _timeout():
+    return getattr(settings, 'DESIGN_CACHE_TIMEOUT', 300)
+
+
+def _design_version_key(design_id):
+    return f'design:v:{design_id}'
+
+
+def _user_version_key(user_id):
+    return f'user:v:{user_id}'
+
+
+def _versions(keys):
+    """Current value of each version key, starting missing ones at a fresh number"""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A clock-based start never matches payloads written before an eviction
+            initial = time.time_ns()
+            cache.add(key, initial, timeout=None)
+            versions[key] = cache.get(key, initial)
+    return versions
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_designs(*design_ids):
+    """Invalidate cached payloads of these designs once the current transaction commits"""
+    keys = [_design_version_key(pk) for pk in design_ids]
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def bump_users(*user_ids):
+    """Invalidate cached payloads of every design by these users once the transaction commits"""
+    keys = [_user_version_key(pk) for pk in user_ids]
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def get_or_render(design_ids, render):
+    """
+    Return ``{design_id: payload}`` for ``design_ids``.
+
+    ``render(missing_ids)`` is called once with the ids that have no valid
+    cached payload and must return ``{design_id: (user_id, payload)}``; ids it
+    leaves out are left out of the result too.
+    """
+    design_keys = {pk: _design_version_key(pk) for pk in design_ids}
+    design_versions = _versions(list(design_keys.values()))
+    entry_keys = {pk: f'design:{pk}:{design_versions[key]}' for pk, key in design_keys.items()}
+
+    entries = cache.get_many(list(entry_keys.values()))
+    user_versions = _versions(list({_user_version_key(entry['user_id']) for entry in entries.values()}))
+
+    payloads = {}
+    for pk, key in entry_keys.items():
+        entry = entries.get(key)
+        if entry is not None and user_versions[_user_version_key(entry['user_id'])] == entry['user_version']:
+            payloads[pk] = entry['data']
+
+    missing = [pk for pk in design_ids if pk not in payloads]
+    if missing:
+        rendered = render(missing)
+        user_versions = _versions(list({_user_version_key(user_id) for user_id, _ in rendered.values()}))
+        cache.set_many({
+            entry_keys[pk]: {
+                'user_id': user_id,
+                'user_version': user_versions[_user_version_key(user_id)],
+                'data': data,
+            }
+            for pk, (user_id, data) in rendered.items()
+        }, timeout=_timeout())
+        payloads.update({pk: data for pk, (_, data) in rendered.items()})
+    return payloads
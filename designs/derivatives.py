@@ -0,0 +1,129 @@
+"""
+Resized derivatives of design images.
+
+Feed cards used to load the full-size generated images. After a design is
+saved, ``schedule_derivatives`` renders every image in ``image_urls`` at each
+of ``IMAGE_DERIVATIVE_WIDTHS`` (narrower than the original) as JPEG and WebP
+on a background pool of ``IMAGE_DERIVATIVE_WORKERS`` threads, writes them next
+to the original in storage and replaces the entry with a size-keyed map (see
+``designs/images.py``). Images outside the configured storage are left as
+they are.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import Now
+from PIL import Image
+
+from .cache import bump_designs
+from .models import Design
+from .storage import get_sketch_storage
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+CONTENT_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+def derivative_widths():
+    return sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1080)))
+
+
+def derivative_key(key, width, image_format):
+    return f'{os.path.splitext(key)[0]}_w{width}.{EXTENSIONS[image_format]}'
+
+
+def render_derivatives(data, widths):
+    """``{width: {format: bytes}}`` for every width in ``widths`` narrower than the image"""
+    image = Image.open(BytesIO(data))
+    image = image.convert('RGB')
+    rendered = {}
+    # Widest first, each resized from the previous one: much cheaper than
+    # resizing the original every time, at no visible cost for these ratios
+    for width in sorted(widths, reverse=True):
+        if width >= image.width:
+            continue
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.LANCZOS)
+        jpeg, webp = BytesIO(), BytesIO()
+        image.save(jpeg, 'JPEG', quality=82, optimize=True, progressive=True)
+        image.save(webp, 'WEBP', quality=80, method=4)
+        rendered[width] = {'jpeg': jpeg.getvalue(), 'webp': webp.getvalue()}
+    return rendered
+
+
+def build_entry(storage, entry, widths):
+    """``entry`` of ``image_urls`` with derivatives built, or unchanged if it needs none"""
+    if isinstance(entry, dict):
+        return entry
+    key = storage.key_for_url(entry)
+    if key is None:
+        return entry
+    built = {'original': entry}
+    for width, variants in sorted(render_derivatives(storage.read(key), widths).items()):
+        built[str(width)] = {}
+        for image_format, data in variants.items():
+            variant_key = derivative_key(key, width, image_format)
+            storage.write(variant_key, data, CONTENT_TYPES[image_format])
+            built[str(width)][image_format] = storage.url(variant_key)
+    return built
+
+
+def needs_derivatives(entries, storage=None):
+    storage = storage or get_sketch_storage()
+    return any(
+        not isinstance(entry, dict) and storage.key_for_url(entry) is not None
+        for entry in entries or []
+    )
+
+
+def build_design_derivatives(design_id):
+    """Build derivatives of one design's images; returns whether ``image_urls`` changed"""
+    storage = get_sketch_storage()
+    widths = derivative_widths()
+    entries = Design.objects.filter(pk=design_id).values_list('image_urls', flat=True).first()
+    if not entries:
+        return False
+    built = [build_entry(storage, entry, widths) for entry in entries]
+    if built == entries:
+        return False
+
+    with transaction.atomic():
+        # Keep an edit made while the derivatives were rendering
+        design = Design.objects.select_for_update().filter(pk=design_id).only('image_urls').first()
+        if design is None or design.image_urls != entries:
+            return False
+        Design.objects.filter(pk=design_id).update(image_urls=built, updated_at=Now())
+        bump_designs(design_id)
+    return True
+
+
+def _run(design_id):
+    try:
+        build_design_derivatives(design_id)
+    except Exception:
+        logger.exception('Building image derivatives of design %s failed', design_id)
+    finally:
+        connection.close()
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2), thread_name_prefix='image-derivatives'
+        )
+    return _executor
+
+
+def schedule_derivatives(design):
+    """Build derivatives of ``design`` in the background once the current transaction commits"""
+    if needs_derivatives(design.image_urls):
+        design_id = design.pk
+        transaction.on_commit(lambda: get_executor().submit(_run, design_id))
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import secrets
+from urllib import parse
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class SeededPermutation:
+    """
+    Pseudo-random bijection over ``range(size)`` keyed by ``seed``.
+
+    A small Feistel network scrambles indexes inside the next power of four
+    and cycle-walks values that fall outside ``size``, so position ``i`` can be
+    mapped without materializing (or sorting) the whole sequence.
+    """
+    ROUNDS = 4
+
+    def __init__(self, seed, size):
+        self.size = size
+        half_bits = max((max(size - 1, 1).bit_length() + 1) // 2, 1)
+        self.half_bits = half_bits
+        self.mask = (1 << half_bits) - 1
+        self.keys = [
+            int.from_bytes(hashlib.blake2b(f'{seed}:{i}'.encode(), digest_size=4).digest(), 'big')
+            for i in range(self.ROUNDS)
+        ]
+
+    def _round(self, value, key):
+        x = ((value ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+        x ^= x >> 16
+        x = (x * 0x45D9F3B) & 0xFFFFFFFF
+        x ^= x >> 16
+        return x & self.mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class RandomFeedPagination(BasePagination):
+    """
+    Stable random ordering for the home feed.
+
+    The first request picks a seed and snapshots the current id range; every
+    later page walks the same seeded permutation of that range, so a session
+    never sees duplicates and each page costs one primary-key lookup no matter
+    how large the table is. Ids that no longer exist are skipped.
+    """
+    cursor_query_param = 'cursor'
+    seed_query_param = 'seed'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 50
+    # Candidates fetched per missing item, to absorb gaps left by deleted rows
+    overfetch = 2
+    max_rounds = 5
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.cursor = self.start_cursor(queryset, request)
+
+        seed, low, high, position = self.cursor
+        size = high - low + 1 if high >= low else 0
+        permutation = SeededPermutation(seed, size)
+
+        page = []
+        rounds = 0
+        while len(page) < self.page_size and position < size and rounds < self.max_rounds:
+            rounds += 1
+            wanted = (self.page_size - len(page)) * self.overfetch
+            end = min(position + wanted, size)
+            candidates = [low + permutation[index] for index in range(position, end)]
+            found = {
+                item['id'] if isinstance(item, dict) else item.pk: item
+                for item in queryset.filter(pk__in=candidates)
+            }
+            consumed = len(candidates)
+            for offset, pk in enumerate(candidates):
+                if pk in found:
+                    page.append(found[pk])
+                    if len(page) == self.page_size:
+                        consumed = offset + 1
+                        break
+            position += consumed
+
+        self.next_cursor = (seed, low, high, position) if position < size else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def start_cursor(self, queryset, request):
+        try:
+            seed = int(request.query_params[self.seed_query_param])
+        except (KeyError, ValueError):
+            seed = secrets.randbits(32)
+        # Two index seeks; a combined MIN/MAX aggregate scans the table on some backends
+        pks = queryset.order_by('pk').values_list('pk', flat=True)
+        low = pks.first()
+        if low is None:
+            return (seed, 1, 0, 0)
+        return (seed, low, pks.last(), 0)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            querystring = base64.b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            seed, low, high, position = (int(tokens[key][0]) for key in ('s', 'l', 'h', 'p'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Cursors are only ever built by encode_cursor; anything else was edited
+        if low < 0 or high < low - 1 or position < 0:
+            raise NotFound(self.invalid_cursor_message)
+        return seed, low, high, position
+
+    def encode_cursor(self, cursor):
+        seed, low, high, position = cursor
+        querystring = parse.urlencode({'s': seed, 'l': low, 'h': high, 'p': position}, doseq=True)
+        encoded = base64.b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return self.encode_cursor(self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'seed': self.cursor[0],
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'seed': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,221 @@
+"""
+Generation backends.
+
+``generate_design`` records a ``GenerationJob`` and hands it to the backend
+named by ``GENERATION_BACKEND``; ``submit()`` must return as soon as the work
+is queued, never after it is done, so no web worker waits on a generation.
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from fab_sketch_project.aws import aws_client
+from . import generation_events
+from .models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationError(Exception):
+    pass
+
+
+def generation_payload(session_id, parameters, sketch_key='', image_data='', callback_url=''):
+    """
+    Input of the generator for one job. A sketch already in storage is passed
+    by ``sketch_key`` alone; only one that is not goes inline as base64 ``image_data``.
+    """
+    payload = {
+        'action': 'generate_full_collection',
+        'session_id': session_id,
+        'parameters': parameters
+    }
+    if sketch_key:
+        payload['sketch_key'] = sketch_key
+    else:
+        payload['image_data'] = image_data
+    if callback_url:
+        payload['callback_url'] = callback_url
+    return payload
+
+
+def status_cache_key(session_id):
+    return f'generation:status:{session_id}'
+
+
+def _status_changed(session_id):
+    cache.delete(status_cache_key(session_id))
+    # Subscribers read the status back, so they must not be woken before it is visible
+    transaction.on_commit(lambda: generation_events.publish(session_id))
+
+
+def mark_running(session_id):
+    GenerationJob.objects.filter(session_id=session_id, status=GenerationJob.STATUS_PENDING).update(
+        status=GenerationJob.STATUS_RUNNING, updated_at=timezone.now()
+    )
+    _status_changed(session_id)
+
+
+def report_steps(session_id, steps):
+    """Record step URLs (or ``specs_log``) of a job the generator is still working on"""
+    with transaction.atomic():
+        job = GenerationJob.objects.select_for_update().filter(
+            session_id=session_id, status__in=[GenerationJob.STATUS_PENDING, GenerationJob.STATUS_RUNNING]
+        ).first()
+        if job is None:
+            return False
+        job.result = {**job.result, **steps}
+        job.status = GenerationJob.STATUS_RUNNING
+        job.save(update_fields=['result', 'status', 'updated_at'])
+    _status_changed(session_id)
+    return True
+
+
+def complete_job(session_id, result):
+    """Record the step URLs of a finished job; returns False if it had already finished"""
+    updated = GenerationJob.objects.filter(session_id=session_id).exclude(
+        status__in=[GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED]
+    ).update(
+        status=GenerationJob.STATUS_COMPLETED, result=result,
+        completed_at=timezone.now(), updated_at=timezone.now(),
+    )
+    _status_changed(session_id)
+    if updated:
+        _job_finished(session_id)
+    return bool(updated)
+
+
+def fail_job(session_id, error):
+    updated = GenerationJob.objects.filter(session_id=session_id).exclude(
+        status__in=[GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED]
+    ).update(
+        status=GenerationJob.STATUS_FAILED, error=str(error),
+        completed_at=timezone.now(), updated_at=timezone.now(),
+    )
+    _status_changed(session_id)
+    if updated:
+        _job_finished(session_id)
+    return bool(updated)
+
+
+def _job_finished(session_id):
+    # A finished batch variant frees a slot for the next one waiting
+    batch_id = GenerationJob.objects.filter(session_id=session_id).values_list('batch_id', flat=True).first()
+    if batch_id is not None:
+        from .generation_batches import submit_queued
+        submit_queued(batch_id)
+
+
+class GenerationBackend:
+    # Whether the backend updates the job row itself when it finishes;
+    # otherwise status reads fall back to checking the outputs in S3
+    reports_completion = False
+    # Whether ``submit`` only returns once the job has finished
+    finishes_in_submit = False
+
+    def submit(self, job, payload):
+        """Queue ``payload`` (the generator's input) for ``job`` and return immediately"""
+        raise NotImplementedError
+
+
+class LambdaEventBackend(GenerationBackend):
+    """
+    Invokes the generator Lambda ``LAMBDA_FUNCTION_NAME`` asynchronously
+    (``InvocationType='Event'``).
+
+    With ``GENERATION_CALLBACK_SECRET`` set the Lambda reports back through
+    the generation callback endpoint, whose URL is passed as ``callback_url``.
+    """
+
+    @property
+    def function_name(self):
+        return getattr(settings, 'LAMBDA_FUNCTION_NAME', 'fabsketch-gen')
+
+    @property
+    def client(self):
+        return aws_client('lambda', getattr(settings, 'LAMBDA_REGION', 'ap-northeast-2'))
+
+    @property
+    def reports_completion(self):
+        return bool(getattr(settings, 'GENERATION_CALLBACK_SECRET', ''))
+
+    def submit(self, job, payload):
+        body = json.dumps(payload)
+        limit = getattr(settings, 'GENERATION_MAX_PAYLOAD_BYTES', 256 * 1024)
+        # Lambda would refuse it anyway; fail the job with a clear reason instead
+        if len(body) > limit:
+            raise GenerationError(f'Generator payload is {len(body)} bytes, over the {limit} byte limit')
+        response = self.client.invoke(
+            FunctionName=self.function_name,
+            InvocationType='Event',
+            Payload=body,
+        )
+        # Lambda answers 202 once the event is queued
+        if response['StatusCode'] != 202:
+            raise GenerationError(f"Lambda did not accept the job (status {response['StatusCode']})")
+
+
+class FakeBackend(GenerationBackend):
+    """
+    Completes jobs on a local thread pool after ``GENERATION_FAKE_LATENCY``
+    seconds with placeholder URLs. For development and load tests without AWS.
+    """
+    reports_completion = True
+    base_url = 'https://fake-generator.local'
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'GENERATION_FAKE_WORKERS', 4),
+            thread_name_prefix='fake-generation',
+        )
+
+    @property
+    def latency(self):
+        return getattr(settings, 'GENERATION_FAKE_LATENCY', 2.0)
+
+    def submit(self, job, payload):
+        self.executor.submit(self.run, job.session_id)
+
+    def generate(self, session_id):
+        mark_running(session_id)
+        time.sleep(self.latency)
+        result = {f'step_{n}': f'{self.base_url}/{session_id}/step_{n}.jpg' for n in (1, 2, 3)}
+        result['specs_log'] = 'Generated by the fake backend'
+        complete_job(session_id, result)
+
+    def run(self, session_id):
+        try:
+            self.generate(session_id)
+        except Exception:
+            logger.exception('Fake generation of %s failed', session_id)
+        finally:
+            connection.close()
+
+
+class BlockingFakeBackend(FakeBackend):
+    """
+    Generates inside ``submit``, holding the request's worker for the whole
+    ``GENERATION_FAKE_LATENCY`` as a synchronous generator call would. For
+    comparing worker blocking against FakeBackend in load tests.
+    """
+    finishes_in_submit = True
+
+    def submit(self, job, payload):
+        self.generate(job.session_id)
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_generation_backend():
+    return _load_backend(getattr(settings, 'GENERATION_BACKEND', 'designs.generation_backends.LambdaEventBackend'))
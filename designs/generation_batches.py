@@ -0,0 +1,82 @@
+"""
+Generating several variants of one sketch together.
+
+``start_batch`` stores the preprocessed sketch once under the batch's parent
+session (every variant's payload refers to it by key), creates a job per variant and hands the first ``concurrency`` of
+them to the backend at once. Every time a variant finishes (``complete_job``
+or ``fail_job``) ``submit_queued`` hands over the next waiting one, so no
+more than ``concurrency`` variants of a batch are with the generator at a
+time. Each variant is an ordinary job: its status and result are available
+as soon as it finishes, whatever the others are doing.
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import transaction
+from django.utils import timezone
+
+from .generation_backends import fail_job, generation_payload, get_generation_backend
+from .generation_dedupe import content_hash
+from .models import GenerationBatch, GenerationJob
+from .storage import get_sketch_storage
+
+logger = logging.getLogger(__name__)
+
+
+def start_batch(user, session_id, sketch, variants, concurrency, callback_url=''):
+    """Create a batch generating ``sketch`` with every parameter dict in ``variants``"""
+    sketch_key = f'{session_id}/sketch.jpg'
+    get_sketch_storage().write(sketch_key, sketch.data)
+    with transaction.atomic():
+        batch = GenerationBatch.objects.create(
+            session_id=session_id, user=user, sketch_key=sketch_key,
+            concurrency=concurrency, callback_url=callback_url,
+        )
+        GenerationJob.objects.bulk_create([
+            GenerationJob(
+                session_id=str(uuid.uuid4()), user=user, batch=batch, parameters=parameters,
+                content_hash=content_hash(sketch.data, parameters),
+            )
+            for parameters in variants
+        ])
+    submit_queued(batch.pk)
+    return batch
+
+
+def submit_queued(batch_id):
+    """Hand waiting variants of a batch to the backend while it has free slots"""
+    finished = [GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED]
+    with transaction.atomic():
+        # Locking the batch keeps concurrent completions from overfilling its slots
+        batch = GenerationBatch.objects.select_for_update().get(pk=batch_id)
+        unfinished = batch.jobs.exclude(status__in=finished)
+        running = unfinished.filter(submitted_at__isnull=False).count()
+        queued = list(unfinished.filter(submitted_at__isnull=True).order_by('pk')[:max(0, batch.concurrency - running)])
+        GenerationJob.objects.filter(pk__in=[job.pk for job in queued]).update(submitted_at=timezone.now())
+    if not queued:
+        return []
+
+    backend = get_generation_backend()
+
+    def submit(job):
+        try:
+            backend.submit(job, generation_payload(
+                job.session_id, job.parameters, sketch_key=batch.sketch_key, callback_url=batch.callback_url
+            ))
+        except Exception as e:
+            return e
+        return None
+
+    # Submissions are network calls, so they go out together; database
+    # writes stay on this thread
+    if len(queued) == 1:
+        errors = [submit(queued[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=len(queued), thread_name_prefix='batch-submit') as executor:
+            errors = list(executor.map(submit, queued))
+    for job, error in zip(queued, errors):
+        if error is not None:
+            logger.warning('Submitting variant %s of batch %s failed: %s', job.session_id, batch.session_id, error)
+            fail_job(job.session_id, error)
+    return queued
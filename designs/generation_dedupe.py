@@ -0,0 +1,82 @@
+"""
+Reuse of identical generations.
+
+A generation is identified by a hash of the preprocessed sketch bytes and its
+parameters. When a user submits the same sketch and parameters again, e.g.
+retrying after a client timeout, ``reusable_job`` returns their completed job
+(within ``GENERATION_DEDUPE_TTL`` seconds) or the one still running, instead
+of paying for another generation. The hash -> session id mapping is kept in
+the default cache, which bounds it by TTL and its own eviction (least recently
+used for the local memory cache); the job rows are the fallback on a miss.
+
+Concurrent identical requests coalesce through ``claim``: the first one to
+add the cache key owns the generation and the others attach to its job.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import GenerationJob
+
+
+def content_hash(sketch, parameters):
+    digest = hashlib.sha256(sketch)
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def dedupe_key(user_id, content_hash):
+    return f'generation:dedupe:{user_id}:{content_hash}'
+
+
+def ttl():
+    return getattr(settings, 'GENERATION_DEDUPE_TTL', 24 * 60 * 60)
+
+
+def is_reusable(job):
+    """Completed within the TTL, or still running and not given up on"""
+    age = timezone.now() - job.created_at
+    if job.status == GenerationJob.STATUS_COMPLETED:
+        return age <= timedelta(seconds=ttl())
+    if job.status == GenerationJob.STATUS_FAILED:
+        return False
+    return age <= timedelta(seconds=getattr(settings, 'GENERATION_INFLIGHT_TIMEOUT', 600))
+
+
+def reusable_job(user, content_hash):
+    """An earlier job of ``user`` with the same content that can answer this request, or None"""
+    key = dedupe_key(user.pk, content_hash)
+    session_id = cache.get(key)
+    if session_id is not None:
+        job = GenerationJob.objects.filter(session_id=session_id).first()
+    else:
+        job = GenerationJob.objects.filter(
+            user=user, content_hash=content_hash, created_at__gte=timezone.now() - timedelta(seconds=ttl()),
+        ).exclude(status=GenerationJob.STATUS_FAILED).first()
+
+    if job is None or not is_reusable(job):
+        if session_id is not None:
+            cache.delete(key)
+        return None
+    if session_id is None:
+        cache.set(key, job.session_id, ttl())
+    return job
+
+
+def claim(job):
+    """
+    Register ``job`` as the generation for its content. Returns None if it
+    now owns it, or the job of a concurrent identical request that got there first.
+    """
+    key = dedupe_key(job.user_id, job.content_hash)
+    if cache.add(key, job.session_id, ttl()):
+        return None
+    other = reusable_job(job.user, job.content_hash)
+    if other is not None and other.pk != job.pk:
+        return other
+    cache.set(key, job.session_id, ttl())
+    return None
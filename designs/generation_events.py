@@ -0,0 +1,74 @@
+"""
+In-process notifications of generation status changes.
+
+``mark_running``, ``report_steps``, ``complete_job`` and ``fail_job`` call
+``publish(session_id)`` once their change is committed, from whichever
+thread made it. Async views ``subscribe`` on their event loop and wait
+without holding a thread; a notification only says that the session
+changed, so subscribers read the new status themselves and bursts of
+changes collapse into one wake-up.
+
+Only subscribers in the publishing process are woken. With several server
+processes a change may be made in another one, so subscribers also re-read
+the status every ``GENERATION_EVENTS_POLL_INTERVAL`` seconds.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+_subscribers = defaultdict(set)
+_lock = threading.Lock()
+
+
+class Subscription:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.changed = asyncio.Event()
+        self.loop = None
+
+    def __enter__(self):
+        self.loop = asyncio.get_running_loop()
+        with _lock:
+            _subscribers[self.session_id].add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        with _lock:
+            subscribers = _subscribers.get(self.session_id)
+            if subscribers is not None:
+                subscribers.discard(self)
+                if not subscribers:
+                    del _subscribers[self.session_id]
+
+    def notify(self):
+        try:
+            self.loop.call_soon_threadsafe(self.changed.set)
+        except RuntimeError:
+            # The loop was closed under a subscriber that did not get to unsubscribe
+            pass
+
+    async def wait(self, timeout):
+        """Whether the session changed within ``timeout`` seconds"""
+        try:
+            await asyncio.wait_for(self.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.changed.clear()
+        return True
+
+
+def subscribe(session_id):
+    """``with subscribe(session_id) as subscription:`` inside a coroutine"""
+    return Subscription(session_id)
+
+
+def publish(session_id):
+    with _lock:
+        subscribers = list(_subscribers.get(session_id, ()))
+    for subscription in subscribers:
+        subscription.notify()
+
+
+def subscriber_count(session_id):
+    with _lock:
+        return len(_subscribers.get(session_id, ()))
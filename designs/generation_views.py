@@ -1,32 +1,167 @@
+import asyncio
+import hmac
 import json
-import boto3
+import logging
+import re
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from django.views.decorators.http import require_GET, require_http_methods
+from django.views.static import serve
+from django.utils import timezone
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-import base64
-from PIL import Image
-from io import BytesIO
 
-# AWS clients
-lambda_client = boto3.client('lambda', region_name='ap-northeast-2')
-s3_client = boto3.client('s3', region_name='ap-northeast-2')
+from . import generation_events
+from .cache import bump_users
+from .derivatives import schedule_derivatives
+from .generation_backends import (
+    complete_job, fail_job, generation_payload, get_generation_backend, mark_running, report_steps,
+    status_cache_key,
+)
+from .generation_batches import start_batch
+from .generation_dedupe import claim, content_hash, reusable_job
+from .models import GenerationBatch, GenerationJob
+from .sketches import SketchError, preprocess_image_data, preprocess_upload
+from .storage import LocalStorage, StorageError, get_sketch_storage
 
-S3_BUCKET_NAME = 'fab-sketch-media-xp8zu198'
-LAMBDA_FUNCTION_NAME = 'fabsketch-gen'
+logger = logging.getLogger(__name__)
+
+STEP_FILES = ['step_1.jpg', 'step_2.jpg', 'step_3.jpg']
+# Result keys of a job: one per step image, then the generator's log
+STEP_NAMES = ['step_1', 'step_2', 'step_3', 'specs_log']
+GENERATION_PARAMETERS = ['category', 'gender', 'type', 'style']
+
+# Uploaded sketches live at {session_id}/sketch.jpg, next to the generated steps
+SKETCH_KEY_RE = re.compile(r'^(?P<session_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/sketch\.jpg$')
+
+# Fallback storage checks look for all step files at once instead of one after another
+storage_check_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='storage-check')
+
+# A finished job never changes again, so its status can be cached for long
+FINISHED_STATUS_TIMEOUT = 60 * 60
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def sketch_upload_url(request):
+    """
+    Issue a presigned URL for uploading a sketch straight to storage.
+    Send the JPEG to upload_url with the returned method and headers (for
+    POST, as the "file" field of a multipart form after the returned fields),
+    then pass sketch_key to generate instead of an inline image.
+    """
+    session_id = str(uuid.uuid4())
+    sketch_key = f"{session_id}/sketch.jpg"
+    expires_in = getattr(settings, 'SKETCH_UPLOAD_URL_EXPIRES', 600)
+    max_bytes = getattr(settings, 'SKETCH_MAX_UPLOAD_BYTES', 15 * 1024 * 1024)
+    try:
+        target = get_sketch_storage().upload_target(sketch_key, 'image/jpeg', expires_in, max_bytes)
+    except Exception as e:
+        return Response({
+            'error': 'Failed to create upload URL',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    return Response({
+        'session_id': session_id,
+        'sketch_key': sketch_key,
+        'upload_url': request.build_absolute_uri(target['url']),
+        'method': target['method'],
+        'headers': target['headers'],
+        'fields': target['fields'],
+        'max_bytes': max_bytes,
+        'expires_in': expires_in
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['PUT'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def local_sketch_upload(request):
+    """
+    Upload target of LocalStorage presigned URLs, standing in for S3 in
+    development, tests and benchmarks.
+    """
+    storage = get_sketch_storage()
+    if not isinstance(storage, LocalStorage):
+        return Response({'error': 'Uploads go directly to storage'}, status=status.HTTP_404_NOT_FOUND)
+    
+    key = storage.verify_upload(request.query_params.get('token', ''))
+    if key is None:
+        return Response({'error': 'Invalid or expired upload URL'}, status=status.HTTP_403_FORBIDDEN)
+    # Read the stream rather than request.body, which is capped at DATA_UPLOAD_MAX_MEMORY_SIZE
+    max_bytes = getattr(settings, 'SKETCH_MAX_UPLOAD_BYTES', 15 * 1024 * 1024)
+    data = request.stream.read(max_bytes + 1) if request.stream is not None else b''
+    if len(data) > max_bytes:
+        return Response({'error': 'image is too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    storage.write(key, data, request.content_type or 'image/jpeg')
+    return Response(status=status.HTTP_200_OK)
+
+@require_GET
+def local_sketch_file(request, key):
+    """Serve LocalStorage files at the URLs it gives them, standing in for the S3 bucket"""
+    storage = get_sketch_storage()
+    if not isinstance(storage, LocalStorage):
+        raise Http404
+    return serve(request, key, document_root=storage.root)
+
+def read_uploaded_sketch(sketch_key):
+    """Session id and bytes of an uploaded sketch; raises SketchError if it cannot be used"""
+    match = SKETCH_KEY_RE.match(sketch_key) if isinstance(sketch_key, str) else None
+    if match is None:
+        raise SketchError('sketch_key must be a key returned by the upload URL endpoint')
+    session_id = match.group('session_id')
+    if (GenerationJob.objects.filter(session_id=session_id).exists()
+            or GenerationBatch.objects.filter(session_id=session_id).exists()):
+        raise SketchError('sketch_key has already been used')
+    # One byte over the limit is enough for preprocess_upload to reject an oversized upload
+    max_bytes = getattr(settings, 'SKETCH_MAX_UPLOAD_BYTES', 15 * 1024 * 1024)
+    try:
+        return session_id, get_sketch_storage().read(sketch_key, limit=max_bytes + 1)
+    except (FileNotFoundError, StorageError):
+        raise SketchError('sketch has not been uploaded')
+
+def generation_callback_url(request):
+    """Where the generator reports back, if a callback secret is configured"""
+    if not getattr(settings, 'GENERATION_CALLBACK_SECRET', ''):
+        return ''
+    return request.build_absolute_uri(reverse('generation_callback'))
+
+def job_accepted(request, job):
+    """Response to a generate request: 202 while the job runs, its result once it completed"""
+    data = {
+        'job_id': job.session_id,
+        'session_id': job.session_id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('generation_status', args=[job.session_id]))
+    }
+    if job.status == GenerationJob.STATUS_COMPLETED:
+        return Response({**job_status(job), **data}, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_202_ACCEPTED)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_design(request):
     """
-    Generate 3 design images from sketch
+    Start generating 3 design images from a sketch.
+    Returns 202 with the job id right away; poll generation-status for the result.
+    Resubmitting a sketch with the same parameters returns the earlier job
+    (200 with the step images if it already completed, as is every job of a
+    backend that generates inside submit).
     Expected payload:
     {
+        "sketch_key": "uuid/sketch.jpg",  (from upload-url, or inline:)
         "image": "base64_string",
         "category": "adult_clothing",
         "gender": "unisex", 
@@ -36,58 +171,82 @@ def generate_design(request):
     """
     try:
         # Validate input
+        sketch_key = request.data.get('sketch_key')
         image_data = request.data.get('image')
         category = request.data.get('category')
         gender = request.data.get('gender')
         clothing_type = request.data.get('type')
         style = request.data.get('style', 'casual')
         
-        if not all([image_data, category, gender, clothing_type]):
+        if not all([sketch_key or image_data, category, gender, clothing_type]):
             return Response({
-                'error': 'Missing required fields: image, category, gender, type'
+                'error': 'Missing required fields: sketch_key or image, category, gender, type'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Generate unique session ID
-        session_id = str(uuid.uuid4())
+        # Shrink the upload to the generator's working resolution
+        try:
+            if sketch_key:
+                session_id, raw = read_uploaded_sketch(sketch_key)
+                sketch = preprocess_upload(raw)
+            else:
+                session_id = str(uuid.uuid4())
+                sketch = preprocess_image_data(image_data)
+        except SketchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info(
+            'Preprocessed sketch %dx%d: %d -> %d bytes in %.1fms',
+            sketch.width, sketch.height, sketch.original_bytes, len(sketch.data), sketch.elapsed_ms,
+        )
         
-        # Prepare lambda payload
-        lambda_payload = {
-            'action': 'generate_full_collection',
-            'session_id': session_id,
-            'image_data': image_data,
-            'parameters': {
-                'category': category,
-                'gender': gender,
-                'type': clothing_type,
-                'style': style
-            }
+        parameters = {
+            'category': category,
+            'gender': gender,
+            'type': clothing_type,
+            'style': style
         }
         
-        # Call lambda function
-        response = lambda_client.invoke(
-            FunctionName=LAMBDA_FUNCTION_NAME,
-            InvocationType='RequestResponse',
-            Payload=json.dumps(lambda_payload)
+        # The same sketch and parameters again (usually a retry) reuse the earlier job
+        sketch_hash = content_hash(sketch.data, parameters)
+        job = reusable_job(request.user, sketch_hash)
+        if job is not None:
+            return job_accepted(request, job)
+        job = GenerationJob.objects.create(
+            session_id=session_id, user=request.user, parameters=parameters, content_hash=sketch_hash,
+            submitted_at=timezone.now()
         )
+        other = claim(job)
+        if other is not None:
+            # An identical request is already generating; attach to it
+            job.delete()
+            return job_accepted(request, other)
         
-        # Parse lambda response
-        lambda_result = json.loads(response['Payload'].read())
-        
-        if response['StatusCode'] != 200:
+        try:
+            if sketch_key:
+                # The generator reads the sketch by key, so replace the raw upload with
+                # the preprocessed one instead of also sending it inline
+                get_sketch_storage().write(sketch_key, sketch.data)
+                lambda_payload = generation_payload(
+                    session_id, parameters, sketch_key=sketch_key, callback_url=generation_callback_url(request)
+                )
+            else:
+                lambda_payload = generation_payload(
+                    session_id, parameters, image_data=sketch.as_base64(),
+                    callback_url=generation_callback_url(request)
+                )
+            backend = get_generation_backend()
+            backend.submit(job, lambda_payload)
+            if backend.finishes_in_submit:
+                # Answer with the result, as for a deduplicated job that already completed
+                job.refresh_from_db()
+        except Exception as e:
+            fail_job(session_id, e)
             return Response({
-                'error': 'Lambda function failed',
-                'details': lambda_result
+                'error': 'Failed to start design generation',
+                'session_id': session_id,
+                'details': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        # Return result with S3 URLs
-        return Response({
-            'session_id': session_id,
-            'status': 'completed',
-            'step_1': lambda_result.get('step_1'),  # Final Design
-            'step_2': lambda_result.get('step_2'),  # Tech Flat  
-            'step_3': lambda_result.get('step_3'),  # Try-On
-            'specs_log': lambda_result.get('specs_log')
-        }, status=status.HTTP_200_OK)
+        return job_accepted(request, job)
         
     except Exception as e:
         return Response({
@@ -95,6 +254,117 @@ def generate_design(request):
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def batch_status(request, batch):
+    """Status of every variant of a batch, each with its result once it finished"""
+    variants = []
+    for job in batch.jobs.order_by('pk'):
+        variants.append({
+            **current_status(job.session_id, job),
+            'job_id': job.session_id,
+            'parameters': job.parameters,
+            'status_url': request.build_absolute_uri(reverse('generation_status', args=[job.session_id]))
+        })
+    completed = sum(variant['status'] == GenerationJob.STATUS_COMPLETED for variant in variants)
+    failed = sum(variant['status'] == GenerationJob.STATUS_FAILED for variant in variants)
+    return {
+        'batch_id': batch.session_id,
+        'session_id': batch.session_id,
+        'status': 'completed' if completed + failed == len(variants) else 'in_progress',
+        'total': len(variants),
+        'completed': completed,
+        'failed': failed,
+        'status_url': request.build_absolute_uri(reverse('generation_batch_status', args=[batch.session_id])),
+        'variants': variants
+    }
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_batch(request):
+    """
+    Generate several variants of one sketch under a parent session.
+    The sketch is preprocessed and stored once, and at most
+    GENERATION_BATCH_CONCURRENCY variants run at a time. Returns 202 right
+    away; the batch status lists each variant's result as soon as it finishes.
+    Expected payload:
+    {
+        "sketch_key": "uuid/sketch.jpg",  (or "image": "base64_string")
+        "category": "adult_clothing",
+        "gender": "unisex",
+        "type": "top",
+        "variants": [{"style": "casual"}, {"style": "street"}, {"style": "formal"}]
+    }
+    """
+    try:
+        sketch_key = request.data.get('sketch_key')
+        image_data = request.data.get('image')
+        variants = request.data.get('variants')
+        max_variants = getattr(settings, 'GENERATION_BATCH_MAX_VARIANTS', 8)
+        
+        if not isinstance(variants, list) or not variants or not all(isinstance(v, dict) for v in variants):
+            return Response({
+                'error': 'variants must be a non-empty list of parameter objects'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(variants) > max_variants:
+            return Response({
+                'error': f'At most {max_variants} variants per batch'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Each variant overrides the top-level parameters; identical variants run once
+        base = {'style': 'casual'}
+        base.update({name: request.data[name] for name in GENERATION_PARAMETERS if request.data.get(name)})
+        parameter_sets = []
+        for variant in variants:
+            parameters = {**base, **{name: variant[name] for name in GENERATION_PARAMETERS if variant.get(name)}}
+            if parameters not in parameter_sets:
+                parameter_sets.append(parameters)
+        
+        if not (sketch_key or image_data) or not all(
+            all(parameters.get(name) for name in GENERATION_PARAMETERS) for parameters in parameter_sets
+        ):
+            return Response({
+                'error': 'Missing required fields: sketch_key or image, and category, gender, type for every variant'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            if sketch_key:
+                session_id, raw = read_uploaded_sketch(sketch_key)
+                sketch = preprocess_upload(raw)
+            else:
+                session_id = str(uuid.uuid4())
+                sketch = preprocess_image_data(image_data)
+        except SketchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        batch = start_batch(
+            request.user, session_id, sketch, parameter_sets,
+            concurrency=getattr(settings, 'GENERATION_BATCH_CONCURRENCY', 3),
+            callback_url=generation_callback_url(request),
+        )
+        return Response(batch_status(request, batch), status=status.HTTP_202_ACCEPTED)
+        
+    except Exception as e:
+        return Response({
+            'error': 'Batch generation failed',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def get_batch_status(request, session_id):
+    """
+    Check the variants of a batch; finished ones carry their step images
+    """
+    batch = GenerationBatch.objects.filter(session_id=session_id).first()
+    if batch is None:
+        return Response({'error': 'Batch not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        return Response(batch_status(request, batch))
+        
+    except Exception as e:
+        return Response({
+            'error': 'Failed to check status',
+            'details': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def save_design_to_feed(request):
@@ -112,6 +382,7 @@ def save_design_to_feed(request):
     """
     try:
         from .models import Design
+        from social.timeline import fan_out_design
         
         session_id = request.data.get('session_id')
         title = request.data.get('title')
@@ -125,11 +396,12 @@ def save_design_to_feed(request):
                 'error': 'Missing required fields: session_id, title, description'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get image URLs from S3 based on session_id
-        sketch_url = f"https://{S3_BUCKET_NAME}.s3.ap-northeast-2.amazonaws.com/{session_id}/sketch.jpg"
-        final_design_url = f"https://{S3_BUCKET_NAME}.s3.ap-northeast-2.amazonaws.com/{session_id}/step_1.jpg"
-        tech_flat_url = f"https://{S3_BUCKET_NAME}.s3.ap-northeast-2.amazonaws.com/{session_id}/step_2.jpg"
-        try_on_url = f"https://{S3_BUCKET_NAME}.s3.ap-northeast-2.amazonaws.com/{session_id}/step_3.jpg"
+        # Get image URLs from storage based on session_id
+        storage = get_sketch_storage()
+        sketch_url = storage.url(f"{session_id}/sketch.jpg")
+        final_design_url = storage.url(f"{session_id}/step_1.jpg")
+        tech_flat_url = storage.url(f"{session_id}/step_2.jpg")
+        try_on_url = storage.url(f"{session_id}/step_3.jpg")
         
         # Determine main image for feed based on selection
         if 'final_design' in selected_images:
@@ -140,18 +412,25 @@ def save_design_to_feed(request):
             main_image_url = final_design_url
         
         # Create design record
-        design = Design.objects.create(
-            user=request.user,
-            title=title,
-            description=description,
-            image_url=main_image_url,
-            sketch_url=sketch_url,
-            tech_flat_url=tech_flat_url,
-            try_on_url=try_on_url,
-            hashtags=hashtags,
-            materials=materials,
-            session_id=session_id
-        )
+        with transaction.atomic():
+            design = Design.objects.create(
+                user=request.user,
+                title=title,
+                description=description,
+                image_urls=[main_image_url],
+                sketch_url=sketch_url,
+                tech_flat_url=tech_flat_url,
+                try_on_url=try_on_url,
+                hashtags=hashtags,
+                materials=materials,
+                session_id=session_id
+            )
+            get_user_model().objects.filter(pk=request.user.pk).update(design_count=F('design_count') + 1)
+            # Cached payloads of the designer's other designs show their post count
+            bump_users(request.user.pk)
+            # Feed cards load resized copies of the images once they are built
+            schedule_derivatives(design)
+        fan_out_design(design)
         
         return Response({
             'message': 'Design saved to feed successfully',
@@ -160,7 +439,7 @@ def save_design_to_feed(request):
                 'id': design.id,
                 'title': design.title,
                 'description': design.description,
-                'image_url': design.image_url,
+                'image_url': main_image_url,
                 'sketch_url': design.sketch_url,
                 'tech_flat_url': design.tech_flat_url,
                 'try_on_url': design.try_on_url,
@@ -176,39 +455,215 @@ def save_design_to_feed(request):
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def job_status(job):
+    """Status response for a job the backend keeps up to date"""
+    if job.status == GenerationJob.STATUS_COMPLETED:
+        completed_files = STEP_FILES
+    else:
+        # Steps the generator reported while still running
+        completed_files = [file_name for file_name in STEP_FILES if file_name.split('.')[0] in job.result]
+    data = {
+        'session_id': job.session_id,
+        'status': job.status,
+        'completed_files': completed_files,
+        'progress': len(completed_files) / 3 * 100,
+    }
+    if job.status == GenerationJob.STATUS_FAILED:
+        data['error'] = job.error
+    else:
+        data.update(job.result)
+    return data
+
+def step_url(session_id, file_name):
+    return get_sketch_storage().url(f"{session_id}/{file_name}")
+
+def storage_status(session_id, job):
+    """Status from the step files in storage, for jobs nothing has reported on"""
+    storage = get_sketch_storage()
+    exists = storage_check_executor.map(lambda file_name: storage.exists(f"{session_id}/{file_name}"), STEP_FILES)
+    completed_files = [file_name for file_name, found in zip(STEP_FILES, exists) if found]
+    
+    if len(completed_files) == 3:
+        result = {file_name.split('.')[0]: step_url(session_id, file_name) for file_name in STEP_FILES}
+        if job is not None:
+            complete_job(session_id, result)
+        return {
+            'session_id': session_id,
+            'status': GenerationJob.STATUS_COMPLETED,
+            'completed_files': completed_files,
+            'progress': 100.0,
+            **result,
+        }
+    
+    return {
+        'session_id': session_id,
+        'status': 'in_progress' if completed_files else 'pending',
+        'completed_files': completed_files,
+        'progress': len(completed_files) / 3 * 100
+    }
+
+def should_check_storage(job):
+    if job is None:
+        return True
+    if job.batch_id is not None and job.submitted_at is None:
+        # A batch variant still waiting for a slot has nothing in storage yet
+        return False
+    if not get_generation_backend().reports_completion:
+        return True
+    # The backend reports completion, but look at storage anyway once it is overdue
+    # in case its callback got lost
+    age = (timezone.now() - (job.submitted_at or job.created_at)).total_seconds()
+    return age > getattr(settings, 'GENERATION_STATUS_FALLBACK_AFTER', 120)
+
+def current_status(session_id, job=None):
+    """
+    Status of a session, from a short-lived cache or its job row; the step
+    files in storage are only checked for jobs the backend does not report on.
+    ``job`` saves the lookup when the caller already has the row.
+    """
+    key = status_cache_key(session_id)
+    data = cache.get(key)
+    if data is not None:
+        return data
+    
+    if job is None:
+        job = GenerationJob.objects.filter(session_id=session_id).first()
+    if job is not None and job.is_finished:
+        data = job_status(job)
+    elif should_check_storage(job):
+        data = storage_status(session_id, job)
+    else:
+        data = job_status(job)
+    
+    finished = data['status'] in (GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED)
+    cache.set(key, data, FINISHED_STATUS_TIMEOUT if finished else getattr(settings, 'GENERATION_STATUS_CACHE_TIMEOUT', 2))
+    return data
+
 @api_view(['GET'])
 def get_generation_status(request, session_id):
     """
     Check generation status for a session
     """
     try:
-        # Check if files exist in S3
-        files_to_check = ['step_1.jpg', 'step_2.jpg', 'step_3.jpg']
-        completed_files = []
-        
-        for file_name in files_to_check:
-            try:
-                s3_client.head_object(Bucket=S3_BUCKET_NAME, Key=f"{session_id}/{file_name}")
-                completed_files.append(file_name)
-            except:
-                pass
-        
-        if len(completed_files) == 3:
-            status_result = 'completed'
-        elif len(completed_files) > 0:
-            status_result = 'in_progress'
-        else:
-            status_result = 'pending'
-        
-        return Response({
-            'session_id': session_id,
-            'status': status_result,
-            'completed_files': completed_files,
-            'progress': len(completed_files) / 3 * 100
-        })
+        return Response(current_status(session_id))
         
     except Exception as e:
         return Response({
             'error': 'Failed to check status',
             'details': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def status_event_changes(data, sent):
+    """
+    SSE events for what changed in a status since the events in ``sent``: a
+    ``step`` event per new step image or ``specs_log``, then the full status
+    """
+    events = []
+    for name in STEP_NAMES:
+        if data.get(name) and sent.get(name) != data[name]:
+            events.append(sse_event('step', {'session_id': data['session_id'], 'name': name, 'value': data[name]}))
+            sent[name] = data[name]
+    if sent.get('status') != data:
+        events.append(sse_event('status', data))
+        sent['status'] = data
+    return events
+
+def is_finished(data):
+    return data['status'] in (GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED)
+
+async def status_events(session_id):
+    """Events of a session until it finishes or GENERATION_EVENTS_TIMEOUT passes"""
+    poll_interval = getattr(settings, 'GENERATION_EVENTS_POLL_INTERVAL', 5)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'GENERATION_EVENTS_TIMEOUT', 600)
+    sent = {}
+    yield f"retry: {int(poll_interval * 1000)}\n\n"
+    
+    # Subscribed before the first read, so a change made in between is not missed
+    with generation_events.subscribe(session_id) as subscription:
+        while True:
+            data = await sync_to_async(current_status)(session_id)
+            events = status_event_changes(data, sent)
+            # A comment keeps proxies from closing a connection that has been quiet
+            yield ''.join(events) or ': keepalive\n\n'
+            remaining = deadline - loop.time()
+            if is_finished(data) or remaining <= 0:
+                return
+            # Woken by a change made in this process, otherwise re-read in case
+            # another process made it
+            await subscription.wait(min(poll_interval, remaining))
+
+@require_GET
+async def generation_status_events(request, session_id):
+    """
+    Server-Sent Events stream of a session's status, as pushed by the
+    generator, instead of polling generation-status. Waiting clients hold no
+    thread, which needs the ASGI application (fab_sketch_project/asgi.py).
+    """
+    if isinstance(request, ASGIRequest):
+        stream = status_events(session_id)
+    else:
+        # Under WSGI a waiting stream would hold a worker: send the current status
+        # once and let the client's EventSource reconnect after the poll interval
+        data = await sync_to_async(current_status)(session_id)
+        poll_interval = getattr(settings, 'GENERATION_EVENTS_POLL_INTERVAL', 5)
+        stream = [f"retry: {int(poll_interval * 1000)}\n\n", *status_event_changes(data, {})]
+    
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def generation_callback(request):
+    """
+    Called by the generator when a job changes state.
+    Authenticated with the shared GENERATION_CALLBACK_SECRET in the X-Generation-Secret header.
+    Expected payload:
+    {
+        "session_id": "uuid",
+        "status": "running" | "completed" | "failed",
+        "step_1": "url", "step_2": "url", "step_3": "url", "specs_log": "...",
+        "error": "message"
+    }
+    A "running" report may carry the steps finished so far; they are pushed to
+    clients streaming the session's events.
+    """
+    secret = getattr(settings, 'GENERATION_CALLBACK_SECRET', '')
+    provided = request.headers.get('X-Generation-Secret', '')
+    if not secret or not hmac.compare_digest(provided.encode(), secret.encode()):
+        return Response({'error': 'Invalid callback secret'}, status=status.HTTP_403_FORBIDDEN)
+    
+    session_id = request.data.get('session_id')
+    job_state = request.data.get('status')
+    if not GenerationJob.objects.filter(session_id=session_id).exists():
+        return Response({'error': 'Unknown session'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if job_state == GenerationJob.STATUS_RUNNING:
+        steps = {name: request.data[name] for name in STEP_NAMES if request.data.get(name)}
+        if steps:
+            report_steps(session_id, steps)
+        else:
+            mark_running(session_id)
+    elif job_state == GenerationJob.STATUS_COMPLETED:
+        result = {
+            file_name.split('.')[0]: request.data.get(file_name.split('.')[0]) or step_url(session_id, file_name)
+            for file_name in STEP_FILES
+        }
+        if request.data.get('specs_log'):
+            result['specs_log'] = request.data['specs_log']
+        complete_job(session_id, result)
+    elif job_state == GenerationJob.STATUS_FAILED:
+        fail_job(session_id, request.data.get('error') or 'Generation failed')
+    else:
+        return Response({
+            'error': 'status must be one of: running, completed, failed'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(job_status(GenerationJob.objects.get(session_id=session_id)))
@@ -0,0 +1,50 @@
+"""
+Entries of ``Design.image_urls``.
+
+An entry is either the URL of an image or, once derivatives were built for
+it (``designs/derivatives.py``), a size-keyed map::
+
+    {"original": "https://.../step_1.jpg",
+     "320": {"webp": "https://.../step_1_w320.webp", "jpeg": "https://.../step_1_w320.jpg"},
+     "640": {...}}
+
+Responses keep ``image_urls`` a list of URLs: the originals, or with
+``?image_width=`` (and ``?view=card``) the smallest variant at least that wide.
+"""
+IMAGE_FORMATS = ('jpeg', 'webp')
+
+
+def original_url(entry):
+    return entry.get('original') if isinstance(entry, dict) else entry
+
+
+def variant_widths(entry):
+    if not isinstance(entry, dict):
+        return []
+    return sorted(int(key) for key in entry if key.isdigit())
+
+
+def pick_url(entry, width, image_format='jpeg'):
+    """URL of the smallest variant of ``entry`` at least ``width`` wide, else the original"""
+    for candidate in variant_widths(entry):
+        if candidate >= width:
+            variant = entry[str(candidate)]
+            return variant.get(image_format) or variant.get('jpeg') or original_url(entry)
+    return original_url(entry)
+
+
+def image_urls(entries, width=None, image_format='jpeg'):
+    """``image_urls`` as rendered: one URL per entry"""
+    if width is None:
+        return [original_url(entry) for entry in entries or []]
+    return [pick_url(entry, width, image_format) for entry in entries or []]
+
+
+def requested_image_size(request, default_width=None):
+    """``(width, format)`` asked for with ``?image_width=`` and ``?image_format=``"""
+    width = request.query_params.get('image_width')
+    image_format = request.query_params.get('image_format')
+    return (
+        int(width) if width and width.isdigit() else default_width,
+        image_format if image_format in IMAGE_FORMATS else 'jpeg',
+    )
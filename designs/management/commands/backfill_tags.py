@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from designs.models import Design
+from designs.tags import sync_design_tags
+
+
+class Command(BaseCommand):
+    help = 'Parse Design.hashtags of existing rows into the normalized Tag/DesignTag index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        removed = added = processed = 0
+        last_pk = 0
+        while True:
+            designs = list(
+                Design.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'hashtags', 'created_at')[:batch_size]
+            )
+            if not designs:
+                break
+            last_pk = designs[-1].pk
+            stale, missing = sync_design_tags(designs)
+            removed += stale
+            added += missing
+            processed += len(designs)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {processed} design(s): {added} tag link(s) added, {removed} removed'
+        ))
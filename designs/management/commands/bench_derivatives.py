@@ -0,0 +1,56 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+
+from designs.derivatives import build_entry, derivative_widths
+from designs.storage import LocalStorage
+
+
+class Command(BaseCommand):
+    help = 'Benchmark image derivative throughput (images/sec, per core) by worker count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=24)
+        parser.add_argument('--size', type=int, default=1024, help='width and height of the source images')
+        parser.add_argument('--workers', default='1,2,4')
+
+    def handle(self, *args, **options):
+        cores = os.cpu_count() or 1
+        widths = derivative_widths()
+        with tempfile.TemporaryDirectory() as root, override_settings(SKETCH_STORAGE_ROOT=root):
+            storage = LocalStorage()
+            entries = []
+            for i in range(options['images']):
+                key = f'bench/{i}/step_1.jpg'
+                storage.write(key, self.generated_image(options['size'], seed=i))
+                entries.append(storage.url(key))
+
+            self.stdout.write(
+                f"{options['images']} images of {options['size']}px -> widths {widths} as JPEG+WebP, {cores} core(s)"
+            )
+            self.stdout.write(f"{'workers':>8} {'images/s':>9} {'per core':>9} {'core ms/img':>11}")
+            for workers in [int(n) for n in options['workers'].split(',')]:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    start = time.perf_counter()
+                    list(executor.map(lambda entry: build_entry(storage, entry, widths), entries))
+                    elapsed = time.perf_counter() - start
+                rate = len(entries) / elapsed
+                self.stdout.write(
+                    f'{workers:>8} {rate:>9.1f} {rate / min(workers, cores):>9.1f} '
+                    f'{elapsed * 1000 * min(workers, cores) / len(entries):>11.1f}'
+                )
+
+    def generated_image(self, size, seed):
+        """A smooth gradient with noise, closer to a generated design than a flat colour"""
+        gradient = Image.linear_gradient('L').resize((size, size))
+        noise = Image.effect_noise((size, size), 20 + seed % 10)
+        image = Image.merge('RGB', [gradient, noise, gradient.transpose(Image.Transpose.ROTATE_90)])
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=90)
+        return output.getvalue()
@@ -0,0 +1,77 @@
+import base64
+import statistics
+import time
+from urllib import parse
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from designs.feed import RandomFeedPagination
+from designs.models import Design
+from fab_sketch_project.benchmarks import scratch_database
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Benchmark the seeded random feed against order_by('?')"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000',
+                            help='Comma separated table sizes to benchmark')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.page_size = options['page_size']
+        self.repeat = options['repeat']
+        self.factory = RequestFactory()
+
+        # The table must hold exactly `size` designs, so use an empty database of our own
+        with scratch_database():
+            user = User.objects.create(username='bench_feed', user_id='bench_feed', nickname='bench')
+            created = 0
+            self.stdout.write(f"{'designs':>10} {'order_by(?)':>14} {'seeded p1':>12} {'seeded deep':>12}")
+            for size in sizes:
+                created = self.fill(user, created, size)
+                random_ms = self.time(self.order_by_random)
+                first_ms = self.time(lambda: self.seeded_page({'seed': 42}))
+                deep = self.deep_cursor(size // 2)
+                deep_ms = self.time(lambda: self.seeded_page({'cursor': deep}))
+                self.stdout.write(f'{size:>10} {random_ms:>12.2f}ms {first_ms:>10.2f}ms {deep_ms:>10.2f}ms')
+
+    def fill(self, user, created, size, batch_size=5000):
+        while created < size:
+            count = min(batch_size, size - created)
+            Design.objects.bulk_create([
+                Design(user=user, title=f'bench {created + i}', description='bench')
+                for i in range(count)
+            ])
+            created += count
+        return created
+
+    def time(self, func):
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
+
+    def base_queryset(self):
+        return Design.objects.select_related('user')
+
+    def order_by_random(self):
+        return list(self.base_queryset().order_by('?')[:self.page_size])
+
+    def deep_cursor(self, position):
+        pks = Design.objects.order_by('pk').values_list('pk', flat=True)
+        querystring = parse.urlencode({'s': 42, 'l': pks.first(), 'h': pks.last(), 'p': position})
+        return base64.b64encode(querystring.encode('ascii')).decode('ascii')
+
+    def seeded_page(self, params):
+        request = Request(self.factory.get('/api/feed/', {'page_size': self.page_size, **params}))
+        return RandomFeedPagination().paginate_queryset(self.base_queryset(), request)
@@ -0,0 +1,105 @@
+import base64
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from PIL import Image
+from rest_framework.test import force_authenticate
+
+from designs.generation_views import generate_design
+from designs.models import GenerationJob
+
+User = get_user_model()
+
+BACKENDS = {
+    'blocking': 'designs.generation_backends.BlockingFakeBackend',
+    'queued': 'designs.generation_backends.FakeBackend',
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark /api/generate/ latency and throughput with a blocking vs a queued generator backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='concurrent web workers')
+        parser.add_argument('--requests', type=int, default=40)
+        parser.add_argument('--latency', type=float, default=0.5, help='seconds the fake generator takes')
+
+    def handle(self, *args, **options):
+        self.threads = options['threads']
+        self.requests = options['requests']
+        self.factory = RequestFactory()
+
+        # Worker threads need committed rows, so clean up explicitly instead of rolling back
+        self.user, _ = User.objects.get_or_create(
+            username='bench_generation',
+            defaults={'user_id': 'bench_generation', 'nickname': 'bench'}
+        )
+        try:
+            self.stdout.write(
+                f'{self.requests} generations on {self.threads} worker threads, '
+                f"generator latency {options['latency'] * 1000:.0f}ms"
+            )
+            for offset, (label, path) in enumerate(BACKENDS.items()):
+                with override_settings(
+                    GENERATION_BACKEND=path, GENERATION_FAKE_LATENCY=options['latency'],
+                    GENERATION_FAKE_WORKERS=self.threads,
+                ):
+                    self.run(label, offset * self.requests)
+        finally:
+            self.user.delete()
+
+    def run(self, label, offset):
+        # Distinct sketches, so deduplication does not answer from an earlier run
+        sketches = [self.sketch(offset + i) for i in range(self.requests)]
+
+        def worker(image_data):
+            try:
+                return self.generate(image_data)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            latencies = sorted(pool.map(worker, sketches))
+        elapsed = time.perf_counter() - start
+        finished = self.wait_for_jobs()
+
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f'{label:>9}: {self.requests / elapsed:>7.1f} req/s  p50 {statistics.median(latencies):.1f}ms  '
+            f'p95 {p95:.1f}ms  all jobs done after {finished:.1f}s'
+        )
+
+    def generate(self, image_data):
+        request = self.factory.post(
+            '/api/generate/',
+            {'image': image_data, 'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top'},
+            content_type='application/json',
+        )
+        force_authenticate(request, user=self.user)
+        start = time.perf_counter()
+        response = generate_design(request)
+        assert response.status_code in (200, 202), response.data
+        return (time.perf_counter() - start) * 1000
+
+    def wait_for_jobs(self, timeout=300):
+        """Seconds until every job of the run has finished, so the next run starts idle"""
+        start = time.perf_counter()
+        finished = [GenerationJob.STATUS_COMPLETED, GenerationJob.STATUS_FAILED]
+        while GenerationJob.objects.filter(user=self.user).exclude(status__in=finished).exists():
+            if time.perf_counter() - start > timeout:
+                break
+            time.sleep(0.05)
+        return time.perf_counter() - start
+
+    def sketch(self, seed):
+        image = Image.new('RGB', (256, 256), (seed % 256, seed // 256 % 256, 128))
+        output = BytesIO()
+        image.save(output, 'JPEG')
+        return base64.b64encode(output.getvalue()).decode('ascii')
@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from designs.models import Design
+from designs.rendering import DESIGN_VALUES, render_row
+from designs.serializers import DesignSerializer
+from fab_sketch_project.benchmarks import rolled_back
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rows/sec of DesignSerializer against the .values() rendering path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--designers', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.repeat = options['repeat']
+
+        with rolled_back():
+            designers = [
+                User.objects.create(username=f'bench_render{i}', user_id=f'bench_render{i}', nickname=f'designer {i}')
+                for i in range(options['designers'])
+            ]
+            Design.objects.bulk_create([
+                Design(
+                    user=designers[i % len(designers)], title=f'bench design {i}', description='bench ' * 20,
+                    hashtags='#bench #design', image_urls=[f'https://example.com/{i}.jpg'],
+                )
+                for i in range(rows)
+            ])
+            queryset = Design.objects.filter(user__in=designers)
+
+            serializer = DesignSerializer(context={})
+            instances = list(queryset.select_related('user'))
+            values = list(queryset.values(*DESIGN_VALUES))
+
+            results = [
+                ('serializer render', lambda: [serializer.to_representation(design) for design in instances]),
+                ('values render', lambda: [render_row(row) for row in values]),
+                ('serializer fetch+render', lambda: [
+                    serializer.to_representation(design) for design in queryset.select_related('user')
+                ]),
+                ('values fetch+render', lambda: [render_row(row) for row in queryset.values(*DESIGN_VALUES)]),
+            ]
+            self.stdout.write(f"{'path':>24} {'ms':>9} {'rows/s':>10}")
+            for name, func in results:
+                ms = self.time(func)
+                self.stdout.write(f'{name:>24} {ms:>9.2f} {rows / ms * 1000:>10.0f}')
+
+    def time(self, func):
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
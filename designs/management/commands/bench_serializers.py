@@ -0,0 +1,87 @@
+import gzip
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from designs.models import Design
+from designs.serializers import DesignSerializer, requested_fields
+from fab_sketch_project.benchmarks import rolled_back
+from social.models import Like
+
+User = get_user_model()
+
+VARIANTS = {
+    'full': {},
+    'card': {'view': 'card'},
+    'fields': {'fields': 'id,title,image_urls'},
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark payload size and serialization time of a design page per representation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.factory = RequestFactory()
+
+        with rolled_back():
+            viewer = User.objects.create(username='bench_viewer', user_id='bench_viewer', nickname='viewer')
+            designs = []
+            for i in range(options['page_size']):
+                designer = User.objects.create(
+                    username=f'bench_designer{i}', user_id=f'bench_designer{i}', nickname=f'designer {i}',
+                    profile_image=f'https://example.com/profile/{i}.jpg',
+                )
+                designs.append(Design(
+                    user=designer, title=f'bench design {i}', description='bench ' * 40,
+                    hashtags='#bench #fashion #design', materials='Cotton 100%',
+                    image_urls=[f'https://example.com/designs/{i}/{n}.jpg' for n in range(3)],
+                ))
+            Design.objects.bulk_create(designs)
+            Like.objects.bulk_create([Like(user=viewer, design=design) for design in designs[::2]])
+            page = list(Design.objects.select_related('user').order_by('-pk'))
+
+            self.stdout.write(f"{'variant':>8} {'bytes':>8} {'gzip':>7} {'cold':>9} {'cached':>9}")
+            for name, params in VARIANTS.items():
+                request = self.request(viewer, params)
+                body = self.render(page, request)
+                cold_ms = self.time(page, viewer, params, clear=True)
+                cached_ms = self.time(page, viewer, params, clear=False)
+                self.stdout.write(
+                    f'{name:>8} {len(body):>8} {len(gzip.compress(body)):>7} '
+                    f'{cold_ms:>7.2f}ms {cached_ms:>7.2f}ms'
+                )
+
+    def request(self, viewer, params):
+        request = Request(self.factory.get('/api/feed/', params))
+        request.user = viewer
+        return request
+
+    def render(self, page, request):
+        serializer = DesignSerializer(
+            page, many=True, context={'request': request}, fields=requested_fields(request)
+        )
+        return JSONRenderer().render(serializer.data)
+
+    def time(self, page, viewer, params, clear):
+        samples = []
+        for _ in range(self.repeat):
+            if clear:
+                # The private cache of rolled_back(), never the deployed one
+                cache.clear()
+            # A fresh request per sample, so viewer state is loaded every time as in production
+            request = self.request(viewer, params)
+            start = time.perf_counter()
+            self.render(page, request)
+            samples.append((time.perf_counter() - start) * 1000)
+        return statistics.median(samples)
@@ -0,0 +1,116 @@
+import base64
+import json
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from designs.generation_backends import GenerationBackend
+from designs.sketches import preprocess_image_data
+from fab_sketch_project.benchmarks import rolled_back
+
+User = get_user_model()
+
+PAYLOAD_LIMIT = 256 * 1024
+
+
+class PayloadSizeBackend(GenerationBackend):
+    """Serializes the payload as the Lambda backend would, then drops it"""
+    sizes = []
+
+    def submit(self, job, payload):
+        self.sizes.append(len(json.dumps(payload)))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark sketch preprocessing and uploads: generator payload bytes and /api/generate/ latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=4032)
+        parser.add_argument('--height', type=int, default=3024)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=4)
+
+    def handle(self, *args, **options):
+        image_data = self.phone_photo(options['width'], options['height'])
+        raw_payload = len(json.dumps({'image_data': image_data}))
+        self.stdout.write(
+            f"Input: {options['width']}x{options['height']} JPEG, "
+            f'{len(image_data)} base64 bytes (payload limit {PAYLOAD_LIMIT})'
+        )
+
+        with rolled_back(), override_settings(
+            GENERATION_BACKEND='designs.management.commands.bench_sketch_preprocessing.PayloadSizeBackend'
+        ):
+            user = User.objects.create(username='bench_sketcher', user_id='bench_sketcher', nickname='sketcher')
+            client = APIClient()
+            client.force_authenticate(user)
+            body = {'image': image_data, 'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top'}
+            key_body = {**body, 'image': None}
+
+            def generate():
+                start = time.perf_counter()
+                response = client.post('/api/generate/', body, format='json')
+                assert response.status_code == 202, response.content
+                return (time.perf_counter() - start) * 1000
+
+            latencies = [generate() for _ in range(options['requests'])]
+            payload = PayloadSizeBackend.sizes[-1]
+            self.stdout.write(f'Payload: {raw_payload} -> {payload} bytes ({payload / raw_payload:.1%})')
+            self.report('inline', latencies)
+
+            # The same photo uploaded to LocalStorage first and referenced by sketch_key
+            with tempfile.TemporaryDirectory() as root, override_settings(
+                SKETCH_STORAGE_BACKEND='designs.storage.LocalStorage', SKETCH_STORAGE_ROOT=root
+            ):
+                raw = base64.b64decode(image_data)
+
+                def generate_from_key():
+                    target = client.post('/api/generate/upload-url/').json()
+                    APIClient().put(target['upload_url'], raw, content_type='image/jpeg')
+                    start = time.perf_counter()
+                    response = client.post('/api/generate/', {**key_body, 'sketch_key': target['sketch_key']}, format='json')
+                    assert response.status_code == 202, response.content
+                    return (time.perf_counter() - start) * 1000
+
+                latencies = [generate_from_key() for _ in range(options['requests'])]
+            self.stdout.write(
+                f"Request body: {len(json.dumps(body))} bytes inline, "
+                f"{len(raw)} bytes uploaded + {len(json.dumps({**key_body, 'sketch_key': 'x' * 47}))} bytes by key"
+            )
+            self.report('sketch_key', latencies)
+
+            # SQLite allows one writer at a time, so concurrent requests only time the preprocessing
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                def preprocess():
+                    start = time.perf_counter()
+                    preprocess_image_data(image_data)
+                    return (time.perf_counter() - start) * 1000
+
+                start = time.perf_counter()
+                latencies = list(executor.map(lambda _: preprocess(), range(options['requests'])))
+                elapsed = time.perf_counter() - start
+            self.report(f"preprocess x{options['concurrency']}", latencies)
+            self.stdout.write(f'Throughput: {options["requests"] / elapsed:.1f} sketches/s')
+
+    def phone_photo(self, width, height):
+        """A noisy, EXIF-rotated JPEG that compresses about as badly as a real photo"""
+        noise = Image.effect_noise((width, height), 40)
+        image = Image.merge('RGB', [noise, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise])
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=92, exif=exif)
+        return base64.b64encode(output.getvalue()).decode('ascii')
+
+    def report(self, name, latencies):
+        latencies = sorted(latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(f'{name:>16}: p50 {statistics.median(latencies):.1f}ms  p95 {p95:.1f}ms')
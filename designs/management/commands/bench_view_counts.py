@@ -0,0 +1,69 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+
+from designs.models import Design
+from designs.view_counter import view_counts
+from designs.views import DesignViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent detail views of one design with and without the view count buffer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.threads = options['threads']
+        self.requests = options['requests']
+        self.factory = RequestFactory()
+        self.view = DesignViewSet.as_view({'get': 'retrieve'})
+
+        # Worker threads need committed rows, so clean up explicitly instead of rolling back
+        user, _ = User.objects.get_or_create(
+            username='bench_views',
+            defaults={'user_id': 'bench_views', 'nickname': 'bench'}
+        )
+        design = Design.objects.create(user=user, title='bench', description='bench')
+        try:
+            self.stdout.write(f'{self.requests} retrieves of one design on {self.threads} threads')
+            # Interval 0 writes every view straight through, like the old UPDATE per request
+            with override_settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+                self.run('write-through', design, self.retrieve)
+            with override_settings(VIEW_COUNT_FLUSH_INTERVAL=60, VIEW_COUNT_MAX_PENDING=10 ** 9):
+                self.run('buffered', design, self.retrieve, flush=True)
+        finally:
+            user.delete()
+
+    def run(self, label, design, func, flush=False):
+        Design.objects.filter(pk=design.pk).update(view_count=0)
+
+        def worker(_):
+            try:
+                func(design.pk)
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            list(pool.map(worker, range(self.requests)))
+        if flush:
+            view_counts.flush()
+        elapsed = time.perf_counter() - start
+
+        stored = Design.objects.get(pk=design.pk).view_count
+        self.stdout.write(
+            f'{label:>14}: {self.requests / elapsed:>8.0f} req/s  '
+            f'stored view_count={stored}'
+        )
+
+    def retrieve(self, pk):
+        response = self.view(self.factory.get(f'/api/design/{pk}/'), pk=pk)
+        response.render()
@@ -0,0 +1,44 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from designs.derivatives import build_design_derivatives, needs_derivatives
+from designs.models import Design
+
+
+class Command(BaseCommand):
+    help = 'Build resized image derivatives for designs created before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = []
+        last_pk = 0
+        while True:
+            rows = list(
+                Design.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'image_urls')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            pending += [pk for pk, entries in rows if needs_derivatives(entries)]
+
+        def build(pk):
+            try:
+                return build_design_derivatives(pk)
+            except Exception as e:
+                self.stderr.write(f'Design {pk}: {e}')
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            built = sum(executor.map(build, pending))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built derivatives for {built} of {len(pending)} design(s) that needed them'
+        ))
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from comments.models import Comment
+from designs.cache import bump_designs, bump_users
+from designs.models import Design
+from social.models import Bookmark, Follow, Like
+
+User = get_user_model()
+
+# counter field -> (model holding the rows, foreign key pointing at the counted object)
+DESIGN_COUNTERS = {
+    'like_count': (Like, 'design'),
+    'comment_count': (Comment, 'design'),
+    'bookmark_count': (Bookmark, 'design'),
+}
+USER_COUNTERS = {
+    'follower_count': (Follow, 'followee'),
+    'following_count': (Follow, 'follower'),
+    'design_count': (Design, 'user'),
+}
+
+
+def count_subquery(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Count('id')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized design and user counters and repair the ones that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted rows without updating them')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        designs = self.repair(Design, DESIGN_COUNTERS, bump_designs)
+        users = self.repair(User, USER_COUNTERS, bump_users)
+
+        verb = 'Found' if self.dry_run else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {designs} design(s) and {users} user(s) with drifted counters'
+        ))
+
+    def repair(self, model, counters, bump):
+        repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values('pk', *counters)[:self.batch_size]
+            )
+            if not batch:
+                return repaired
+            last_pk = batch[-1]['pk']
+            ids = [row['pk'] for row in batch]
+
+            actual = {}
+            for counter, (related, field) in counters.items():
+                rows = related.objects.filter(**{f'{field}_id__in': ids}).order_by().values(
+                    f'{field}_id'
+                ).annotate(total=Count('id'))
+                actual[counter] = {row[f'{field}_id']: row['total'] for row in rows}
+
+            drifted = [
+                row['pk'] for row in batch
+                if any(row[counter] != actual[counter].get(row['pk'], 0) for counter in counters)
+            ]
+            if drifted and not self.dry_run:
+                # Recount inside the UPDATE so writes that landed since the read are not lost
+                model.objects.filter(pk__in=drifted).update(**{
+                    counter: count_subquery(related, field)
+                    for counter, (related, field) in counters.items()
+                })
+                bump(*drifted)
+            repaired += len(drifted)
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from designs.models import Design
+from designs.trending import hot_score
+
+SCORE_FIELDS = ['like_count', 'comment_count', 'bookmark_count', 'view_count', 'created_at']
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores for designs with activity since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every design, e.g. after changing the weights')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # Activity landing while this run is in progress is picked up by the next one
+        started_at = timezone.now()
+
+        candidates = Design.objects.all()
+        last_run = Design.objects.aggregate(last_run=Max('score_updated_at'))['last_run']
+        if last_run is not None and not options['all']:
+            candidates = candidates.filter(last_activity_at__gte=last_run)
+
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(candidates.filter(pk__gt=last_pk).order_by('pk').values('pk', *SCORE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            designs = [
+                Design(
+                    pk=row['pk'],
+                    hot_score=hot_score(*(row[field] for field in SCORE_FIELDS)),
+                    score_updated_at=started_at,
+                )
+                for row in rows
+            ]
+            Design.objects.bulk_update(designs, ['hot_score', 'score_updated_at'])
+            updated += len(designs)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated trending scores for {updated} design(s)'))
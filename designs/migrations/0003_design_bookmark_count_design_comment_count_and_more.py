@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:48
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Count('id')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Design = apps.get_model('designs', 'Design')
+    Like = apps.get_model('social', 'Like')
+    Bookmark = apps.get_model('social', 'Bookmark')
+    Comment = apps.get_model('comments', 'Comment')
+    Design.objects.update(
+        like_count=_count(Like, 'design'),
+        comment_count=_count(Comment, 'design'),
+        bookmark_count=_count(Bookmark, 'design'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0002_initial'),
+        ('social', '0002_initial'),
+        ('comments', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='design',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='design',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
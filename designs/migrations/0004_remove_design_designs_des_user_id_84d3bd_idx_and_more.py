@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0003_design_bookmark_count_design_comment_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='design',
+            name='designs_des_user_id_84d3bd_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='design',
+            name='designs_des_created_e3335c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='design',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='designs_des_user_id_bfc0b8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='design',
+            index=models.Index(fields=['-created_at', '-id'], name='designs_des_created_528b01_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0005_design_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DesignTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('design', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='design_tags', to='designs.design')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='design_tags', to='designs.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-created_at', '-id'], name='designs_des_tag_id_79d6b8_idx')],
+                'unique_together': {('design', 'tag')},
+            },
+        ),
+    ]
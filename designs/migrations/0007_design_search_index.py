@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Postgres only: SQLite (local development) falls back to icontains in designs/search.py
+FORWARD_SQL = [
+    # Left in place on reverse; other objects may depend on it
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    """
+    CREATE OR REPLACE FUNCTION designs_design_search_text(title text, description text, materials text, hashtags text)
+    RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT coalesce(title, '') || ' ' || coalesce(hashtags, '') || ' '
+            || coalesce(description, '') || ' ' || coalesce(materials, '')
+    $$
+    """,
+    'ALTER TABLE designs_design ADD COLUMN search_vector tsvector',
+    """
+    CREATE OR REPLACE FUNCTION designs_design_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(NEW.hashtags, '')), 'B')
+            || setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(NEW.materials, '')), 'D');
+        RETURN NEW;
+    END
+    $$
+    """,
+    """
+    CREATE TRIGGER designs_design_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, materials, hashtags ON designs_design
+    FOR EACH ROW EXECUTE FUNCTION designs_design_search_vector_update()
+    """,
+    # Fire the trigger once for existing rows
+    'UPDATE designs_design SET title = title',
+    'CREATE INDEX designs_design_search_vector_idx ON designs_design USING gin (search_vector)',
+    """
+    CREATE INDEX designs_design_search_text_trgm_idx ON designs_design
+    USING gin (designs_design_search_text(title, description, materials, hashtags) gin_trgm_ops)
+    """,
+]
+
+REVERSE_SQL = [
+    'DROP INDEX IF EXISTS designs_design_search_text_trgm_idx',
+    'DROP INDEX IF EXISTS designs_design_search_vector_idx',
+    'DROP TRIGGER IF EXISTS designs_design_search_vector_trigger ON designs_design',
+    'DROP FUNCTION IF EXISTS designs_design_search_vector_update()',
+    'ALTER TABLE designs_design DROP COLUMN IF EXISTS search_vector',
+    'DROP FUNCTION IF EXISTS designs_design_search_text(text, text, text, text)',
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0006_tag_designtag'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(FORWARD_SQL), _run(REVERSE_SQL)),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q
+
+
+def mark_fanned_out(apps, schema_editor):
+    # Designs already in someone's inbox were fanned out, and designs by designers
+    # without followers had no inbox to reach; everything else (posted while the
+    # designer was above the fan-out limit) stays pulled at read time
+    Design = apps.get_model('designs', 'Design')
+    TimelineEntry = apps.get_model('social', 'TimelineEntry')
+    Design.objects.filter(
+        Q(Exists(TimelineEntry.objects.filter(design_id=OuterRef('pk')))) | Q(user__follower_count=0)
+    ).update(fanned_out=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0010_generationbatch'),
+        ('social', '0004_timelineentry'),
+        ('users', '0002_user_design_count_user_follower_count_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='fanned_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='design',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['user', '-created_at'], name='designs_not_fanned_out_idx'),
+        ),
+        migrations.RunPython(mark_fanned_out, migrations.RunPython.noop),
+    ]
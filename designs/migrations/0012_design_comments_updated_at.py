@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 09:47
+
+from django.db import migrations, models
+from django.db.models import Exists, Max, OuterRef, Subquery
+
+
+def set_comments_updated_at(apps, schema_editor):
+    Design = apps.get_model('designs', 'Design')
+    Comment = apps.get_model('comments', 'Comment')
+    comments = Comment.objects.filter(design_id=OuterRef('pk'))
+    latest = comments.order_by().values('design_id').annotate(latest=Max('updated_at')).values('latest')
+    Design.objects.filter(Exists(comments)).update(comments_updated_at=Subquery(latest))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0011_design_fanned_out'),
+        ('comments', '0004_remove_comment_comments_co_design__81099e_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='design',
+            name='comments_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_comments_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -28,26 +29,61 @@ class Design(models.Model):
     
     # Stats
     view_count = models.PositiveIntegerField(default=0)
+    # Denormalized counters, updated with F() expressions by the toggle/comment views
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    bookmark_count = models.PositiveIntegerField(default=0)
+    # When a comment on the design was last added, edited or removed; with
+    # comment_count it validates the design's comment list without reading it
+    comments_updated_at = models.DateTimeField(blank=True, null=True)
+    
+    # Trending rank, seeded on create and recomputed by `manage.py update_trending` for designs with new activity
+    hot_score = models.FloatField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now, db_index=True)
+    score_updated_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Set once the design is in every follower's timeline inbox (social/timeline.py);
+    # until then, or if it never is, the following feed pulls it at read time
+    fanned_out = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-created_at']
+        # Match the (created_at, id) cursor pagination of the feed and per-user lists
         indexes = [
-            models.Index(fields=['user_id']),
-            models.Index(fields=['-created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['-hot_score', '-id']),
+            models.Index(fields=['user', '-created_at'], condition=models.Q(fanned_out=False), name='designs_not_fanned_out_idx'),
         ]
     
     def __str__(self):
         return f"{self.title} by {self.user.nickname}"
     
-    @property
-    def like_count(self):
-        return self.likes.count()
-    
-    @property
-    def comment_count(self):
-        return self.comments.count()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The hashtags as stored, so save() only syncs the tag index when they change
+        instance._saved_hashtags = instance.__dict__.get('hashtags')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.hot_score:
+            # Rank new designs in trending right away instead of after the next update_trending
+            from .trending import hot_score
+            self.hot_score = hot_score(
+                self.like_count, self.comment_count, self.bookmark_count, self.view_count,
+                self.created_at or timezone.now(),
+            )
+        super().save(*args, **kwargs)
+        # Keep the normalized tag index in step with the free-form hashtags
+        update_fields = kwargs.get('update_fields')
+        saved = update_fields is None or 'hashtags' in update_fields
+        if saved and 'hashtags' not in self.get_deferred_fields():
+            if self.hashtags != getattr(self, '_saved_hashtags', ''):
+                from .tags import sync_design_tags
+                sync_design_tags([self])
+            self._saved_hashtags = self.hashtags
     
     def is_liked_by(self, user):
         if user.is_anonymous:
@@ -58,3 +94,87 @@ class Design(models.Model):
         if user.is_anonymous:
             return False
         return self.bookmarks.filter(user=user).exists()
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"#{self.name}"
+
+class DesignTag(models.Model):
+    design = models.ForeignKey(Design, on_delete=models.CASCADE, related_name='design_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='design_tags')
+    # Copy of design.created_at so a tag's designs page off a single index
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('design', 'tag')
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.design_id} tagged #{self.tag_id}"
+
+class GenerationBatch(models.Model):
+    """Variants of one sketch generated together; the jobs' parent session"""
+    session_id = models.CharField(max_length=100, unique=True, help_text="Parent session ID, also the S3 key prefix of the sketch")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_batches')
+    sketch_key = models.CharField(max_length=200)
+    # At most this many variants are with the generator at once; the rest wait
+    concurrency = models.PositiveIntegerField()
+    callback_url = models.URLField(max_length=500, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return self.session_id
+
+class GenerationJob(models.Model):
+    """One sketch-to-design generation, submitted to the backend in GENERATION_BACKEND"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    session_id = models.CharField(max_length=100, unique=True, help_text="Generation session ID, also the S3 key prefix")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    parameters = models.JSONField(default=dict)
+    # step_1/step_2/step_3 image URLs and specs_log once completed
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    # sha256 of the preprocessed sketch and parameters, for reusing identical generations
+    content_hash = models.CharField(max_length=64, blank=True)
+    batch = models.ForeignKey(GenerationBatch, on_delete=models.CASCADE, blank=True, null=True, related_name='jobs')
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # When the job was handed to the backend; batch variants wait for a free slot
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', 'content_hash', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.session_id} ({self.status})"
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
@@ -0,0 +1,89 @@
+"""
+Fast rendering of designs from ``.values()`` rows.
+
+``DesignSerializer`` builds a model instance per row and walks its fields one
+by one. List endpoints that render many designs per request (``feed`` and
+``user_designs``) fetch flat rows with ``DESIGN_VALUES`` instead and turn each
+into the same dict ``DesignSerializer.shared_representation`` would produce.
+Viewer state is merged afterwards exactly as for serialized instances.
+``designs/tests.py`` checks both paths stay identical, so a field added to
+``DesignSerializer`` has to be added here too.
+"""
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+DESIGN_VALUES = [
+    'id', 'user_id', 'title', 'description', 'hashtags', 'materials',
+    'image_urls', 'sketch_url', 'tech_flat_url', 'try_on_url', 'session_id',
+    'funding_progress', 'funding_amount', 'funding_goal',
+    'view_count', 'created_at', 'updated_at', 'like_count', 'comment_count',
+    'user__user_id', 'user__nickname', 'user__profile_image', 'user__bio', 'user__location',
+    'user__created_at', 'user__follower_count', 'user__following_count', 'user__design_count',
+]
+
+_fields = None
+
+
+def _typed_fields():
+    # The serializer's own field instances, so dates and decimals format identically
+    global _fields
+    if _fields is None:
+        from .serializers import DesignSerializer
+        fields = DesignSerializer(context={}).fields
+        _fields = (fields['created_at'], fields['funding_progress'])
+    return _fields
+
+
+def _str(value):
+    return None if value is None else str(value)
+
+
+def render_row(row):
+    """Shared (viewer-independent) representation of one ``DESIGN_VALUES`` row"""
+    datetime_field, decimal_field = _typed_fields()
+    return {
+        'id': str(row['id']),
+        'user': {
+            'id': row['user_id'],
+            'user_id': _str(row['user__user_id']),
+            'nickname': _str(row['user__nickname']),
+            'profile_image': _str(row['user__profile_image']),
+            'bio': _str(row['user__bio']),
+            'location': _str(row['user__location']),
+            'created_at': datetime_field.to_representation(row['user__created_at']),
+            'follower_count': User.format_count(row['user__follower_count']),
+            'following_count': User.format_count(row['user__following_count']),
+            'post_count': User.format_count(row['user__design_count']),
+            'is_following': False,
+        },
+        'user_id': _str(row['user__user_id']),
+        'title': _str(row['title']),
+        'description': _str(row['description']),
+        'hashtags': _str(row['hashtags']),
+        'materials': _str(row['materials']),
+        'image_urls': row['image_urls'],
+        'sketch_url': _str(row['sketch_url']),
+        'tech_flat_url': _str(row['tech_flat_url']),
+        'try_on_url': _str(row['try_on_url']),
+        'session_id': _str(row['session_id']),
+        'funding_progress': decimal_field.to_representation(row['funding_progress']),
+        'funding_amount': _str(row['funding_amount']),
+        'funding_goal': _str(row['funding_goal']),
+        'view_count': row['view_count'],
+        'created_at': datetime_field.to_representation(row['created_at']),
+        'updated_at': datetime_field.to_representation(row['updated_at']),
+        'like_count': row['like_count'],
+        'comment_count': row['comment_count'],
+        'is_liked': False,
+        'is_bookmarked': False,
+        'likes': row['like_count'],
+        'comments': row['comment_count'],
+        'tags': _str(row['hashtags']),
+        'designer_nickname': _str(row['user__nickname']),
+        'designer_profile_image': _str(row['user__profile_image']),
+        'designer_follower_count': row['user__follower_count'],
+        'designer_following_count': row['user__following_count'],
+        'designer_post_count': row['user__design_count'],
+        'is_following_designer': False,
+    }
@@ -0,0 +1,76 @@
+"""
+Design search over title, description, materials and hashtags.
+
+On Postgres, ``designs_design.search_vector`` is a ``tsvector`` maintained by a
+trigger and covered by a GIN index (see migration 0007). Korean has no
+built-in text search dictionary, so words are indexed with the ``simple``
+configuration. Substring matches come from a ``pg_trgm`` GIN index over the
+same text, so partial Korean words are still found. Elsewhere (SQLite in
+local development), terms are matched with ``icontains`` and ranked by the
+field they hit.
+"""
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.pagination import PageNumberPagination
+
+# Field -> rank weight for the fallback; mirrors the tsvector setweight labels
+FIELD_WEIGHTS = {
+    'title': 4,
+    'hashtags': 3,
+    'description': 2,
+    'materials': 1,
+}
+
+SEARCH_TEXT = (
+    'designs_design_search_text(designs_design.title, designs_design.description, '
+    'designs_design.materials, designs_design.hashtags)'
+)
+
+
+class SearchPagination(PageNumberPagination):
+    """Search results are ranked, so they page by number rather than by cursor"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+def search_designs(queryset, query):
+    """Filter a Design queryset to ``query`` matches, best first"""
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, query)
+    return _search_fallback(queryset, query)
+
+
+def _search_postgres(queryset, query):
+    tsquery = "websearch_to_tsquery('simple', %s)"
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    matched = RawSQL(
+        f'(designs_design.search_vector @@ {tsquery} OR {SEARCH_TEXT} ILIKE %s)',
+        (query, pattern),
+        output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f'ts_rank_cd(designs_design.search_vector, {tsquery}) + word_similarity(%s, {SEARCH_TEXT})',
+        (query, query),
+        output_field=FloatField(),
+    )
+    return queryset.filter(matched).annotate(rank=rank).order_by('-rank', '-created_at', '-id')
+
+
+def _search_fallback(queryset, query):
+    terms = query.split()
+    if not terms:
+        return queryset.none()
+
+    condition = Q()
+    rank = Value(0)
+    for term in terms:
+        condition &= Q(*(Q(**{f'{field}__icontains': term}) for field in FIELD_WEIGHTS), _connector=Q.OR)
+        for field, weight in FIELD_WEIGHTS.items():
+            rank = rank + Case(
+                When(**{f'{field}__icontains': term}, then=Value(weight)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+    return queryset.filter(condition).annotate(rank=rank).order_by('-rank', '-created_at', '-id')
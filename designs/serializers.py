@@ -1,11 +1,53 @@
+from django.db import models
 from rest_framework import serializers
 from .models import Design
 from users.serializers import UserSerializer
+from social.viewer import get_viewer
+from .cache import get_or_render
+from .images import image_urls
+from .rendering import render_row
+
+# Slim representation for feed and grid cells (``?view=card``)
+CARD_FIELDS = [
+    'id', 'user_id', 'title', 'image_urls', 'view_count', 'created_at',
+    'like_count', 'comment_count', 'is_liked', 'is_bookmarked',
+    'designer_nickname', 'designer_profile_image',
+]
+
+# Grid cells need a preview, not the full-size image
+CARD_IMAGE_WIDTH = 640
+
+def requested_fields(request):
+    """Field names asked for with ``?fields=a,b`` or ``?view=card``; None means every field"""
+    fields = request.query_params.get('fields')
+    if fields:
+        return [name.strip() for name in fields.split(',') if name.strip()]
+    if request.query_params.get('view') == 'card':
+        return CARD_FIELDS
+    return None
+
+class DesignListSerializer(serializers.ListSerializer):
+    """Reuses cached shared payloads and loads viewer state for the whole page up front"""
+    
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Rows from .values(DESIGN_VALUES) skip the per-field serializer machinery
+        if items and isinstance(items[0], dict):
+            owners = {row['id']: row['user_id'] for row in items}
+            by_pk = {row['id']: row for row in items}
+            render = render_row
+        else:
+            owners = {design.pk: design.user_id for design in items}
+            by_pk = {design.pk: design for design in items}
+            render = self.child.shared_representation
+        self.child.preload_viewer(owners)
+        payloads = get_or_render(list(by_pk), lambda missing: {
+            pk: (owners[pk], render(by_pk[pk])) for pk in missing
+        })
+        return [self.child.with_viewer(payloads[pk]) for pk in by_pk]
 
 class DesignSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    like_count = serializers.SerializerMethodField()
-    comment_count = serializers.SerializerMethodField()
     is_liked = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
     
@@ -19,9 +61,9 @@ class DesignSerializer(serializers.ModelSerializer):
     # Flattened designer fields for easy access
     designer_nickname = serializers.CharField(source='user.nickname', read_only=True)
     designer_profile_image = serializers.CharField(source='user.profile_image', read_only=True)
-    designer_follower_count = serializers.SerializerMethodField()
-    designer_following_count = serializers.SerializerMethodField()
-    designer_post_count = serializers.SerializerMethodField()
+    designer_follower_count = serializers.IntegerField(source='user.follower_count', read_only=True)
+    designer_following_count = serializers.IntegerField(source='user.following_count', read_only=True)
+    designer_post_count = serializers.IntegerField(source='user.design_count', read_only=True)
     is_following_designer = serializers.SerializerMethodField()
     
     class Meta:
@@ -36,45 +78,73 @@ class DesignSerializer(serializers.ModelSerializer):
             'designer_nickname', 'designer_profile_image', 'designer_follower_count',
             'designer_following_count', 'designer_post_count', 'is_following_designer'
         ]
-        read_only_fields = ['id', 'user', 'view_count', 'created_at']
+        read_only_fields = ['id', 'user', 'view_count', 'like_count', 'comment_count', 'created_at']
+        list_serializer_class = DesignListSerializer
     
-    def get_like_count(self, obj):
-        return obj.like_count
+    def __init__(self, *args, fields=None, image_size=(None, 'jpeg'), **kwargs):
+        super().__init__(*args, **kwargs)
+        # Width and format of the image variants to return, see designs/images.py
+        self.image_width, self.image_format = image_size
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
     
-    def get_comment_count(self, obj):
-        return obj.comment_count
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'image_urls' in data:
+            data['image_urls'] = image_urls(data['image_urls'], self.image_width, self.image_format)
+        return data
     
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.is_liked_by(request.user)
-        return False
+    def preload_viewer(self, owners):
+        """Load viewer state for ``{design_id: designer_id}`` in bulk; state that is not rendered is not queried"""
+        get_viewer(self.context).load(
+            design_ids=list(owners),
+            user_ids=owners.values() if self.fields.keys() & {'user', 'is_following_designer'} else (),
+            likes='is_liked' in self.fields,
+            bookmarks='is_bookmarked' in self.fields,
+        )
     
-    def get_is_bookmarked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.is_bookmarked_by(request.user)
-        return False
+    def shared_representation(self, instance):
+        """Representation without viewer state, the part that can be cached for everyone"""
+        # Built once per serializer; constructing the fields costs more than rendering a row
+        if not hasattr(self, '_shared'):
+            self._shared = DesignSerializer(context={})
+        # Image entries stay as stored; with_viewer picks the variant each request asks for
+        return serializers.ModelSerializer.to_representation(self._shared, instance)
     
-    def get_designer_follower_count(self, obj):
-        return obj.user.followers.count()
+    def with_viewer(self, payload):
+        """Requested fields of a shared payload, with the requesting user's state filled in"""
+        viewer = get_viewer(self.context)
+        design_id, user_id = int(payload['id']), payload['user']['id']
+        data = {}
+        for name in self.fields:
+            if name == 'user':
+                data['user'] = dict(payload['user'], is_following=viewer.is_following(user_id))
+            elif name == 'is_liked':
+                data['is_liked'] = viewer.is_liked(design_id)
+            elif name == 'is_bookmarked':
+                data['is_bookmarked'] = viewer.is_bookmarked(design_id)
+            elif name == 'is_following_designer':
+                data['is_following_designer'] = viewer.is_following(user_id)
+            elif name == 'image_urls':
+                data['image_urls'] = image_urls(payload['image_urls'], self.image_width, self.image_format)
+            else:
+                data[name] = payload[name]
+        return data
     
-    def get_designer_following_count(self, obj):
-        return obj.user.following.count()
+    def get_is_liked(self, obj):
+        return get_viewer(self.context).is_liked(obj.pk)
     
-    def get_designer_post_count(self, obj):
-        return obj.user.designs.count()
+    def get_is_bookmarked(self, obj):
+        return get_viewer(self.context).is_bookmarked(obj.pk)
     
     def get_is_following_designer(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated and request.user != obj.user:
-            return obj.user.followers.filter(follower=request.user).exists()
-        return False
+        return get_viewer(self.context).is_following(obj.user_id)
 
 class DesignCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Design
         fields = [
-            'sketch_url', 'image_url', 'tech_flat_url', 'try_on_url',
+            'sketch_url', 'image_urls', 'tech_flat_url', 'try_on_url',
             'title', 'description', 'hashtags', 'materials', 'session_id'
         ]
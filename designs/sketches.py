@@ -0,0 +1,153 @@
+"""
+Sketch preprocessing before generation.
+
+Phones upload multi-megabyte photos, but the generator works at a fixed
+resolution and its Event payload is capped at 256 KB. ``preprocess_sketch``
+decodes and validates the upload, applies the EXIF orientation, downsizes it
+to ``SKETCH_MAX_DIMENSION`` and re-encodes it as JPEG. The work runs on a
+bounded thread pool (Pillow releases the GIL while decoding, resizing and
+encoding), so at most ``SKETCH_PREPROCESS_WORKERS`` sketches are processed at
+once however many requests arrive together.
+
+Detailed photos can still encode too large at that size, so the JPEG quality
+and then the dimensions are stepped down until the base64 sketch fits in
+``GENERATION_MAX_PAYLOAD_BYTES`` with room for the rest of the payload.
+"""
+import base64
+import binascii
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'MPO'}
+
+# Lambda's limit for an asynchronous (Event) invocation payload
+EVENT_PAYLOAD_LIMIT = 256 * 1024
+# Payload room kept for everything but the image: session id, parameters, callback URL
+PAYLOAD_HEADROOM = 4 * 1024
+FALLBACK_QUALITIES = (80, 70, 60, 50)
+MIN_DIMENSION = 256
+
+
+class SketchError(ValueError):
+    """The uploaded sketch cannot be used; the message is safe to show the client"""
+
+
+@dataclass
+class ProcessedSketch:
+    data: bytes
+    width: int
+    height: int
+    original_bytes: int
+    elapsed_ms: float
+
+    def as_base64(self):
+        return base64.b64encode(self.data).decode('ascii')
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def max_sketch_bytes():
+    """Largest JPEG whose base64 still fits in a generator payload"""
+    return (setting('GENERATION_MAX_PAYLOAD_BYTES', EVENT_PAYLOAD_LIMIT) - PAYLOAD_HEADROOM) // 4 * 3
+
+
+def encode_within(image, limit):
+    """``(image, jpeg bytes)`` at the best quality, then the largest size, that fits in ``limit`` bytes"""
+    quality = setting('SKETCH_JPEG_QUALITY', 90)
+    qualities = [quality] + [step for step in FALLBACK_QUALITIES if step < quality]
+    while True:
+        for step in qualities:
+            output = BytesIO()
+            image.save(output, 'JPEG', quality=step, optimize=True)
+            if output.tell() <= limit:
+                return image, output.getvalue()
+        if max(image.size) <= MIN_DIMENSION:
+            raise SketchError('image is too detailed to send to the generator')
+        image = image.resize(
+            (max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)), Image.Resampling.LANCZOS
+        )
+
+
+def decode_image_data(image_data):
+    """Bytes of a base64 image, with or without a ``data:image/...;base64,`` prefix"""
+    if not isinstance(image_data, str):
+        raise SketchError('image must be a base64 string')
+    if image_data.startswith('data:'):
+        image_data = image_data.partition(',')[2]
+    # base64 grows the data by a third; reject oversized uploads before decoding them
+    if len(image_data) * 3 // 4 > setting('SKETCH_MAX_UPLOAD_BYTES', 15 * 1024 * 1024):
+        raise SketchError('image is too large')
+    try:
+        return base64.b64decode(image_data, validate=True)
+    except (binascii.Error, ValueError):
+        raise SketchError('image is not valid base64')
+
+
+def preprocess_sketch(raw):
+    """Validate, auto-orient, downsize and re-encode the image bytes ``raw``"""
+    start = time.perf_counter()
+    max_dimension = setting('SKETCH_MAX_DIMENSION', 1024)
+    try:
+        image = Image.open(BytesIO(raw))
+        if image.format not in ALLOWED_FORMATS:
+            raise SketchError(f'unsupported image format: {image.format}')
+        if image.width * image.height > setting('SKETCH_MAX_PIXELS', 50_000_000):
+            raise SketchError('image has too many pixels')
+        # Let JPEG decode at a reduced scale when the image is much larger than needed
+        image.draft('RGB', (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Transparent areas of a sketch are paper, not black
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        image, data = encode_within(image, max_sketch_bytes())
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise SketchError(f'image could not be read: {e}')
+
+    return ProcessedSketch(
+        data=data, width=image.width, height=image.height,
+        original_bytes=len(raw), elapsed_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=setting('SKETCH_PREPROCESS_WORKERS', 4), thread_name_prefix='sketch-preprocess'
+        )
+    return _executor
+
+
+def preprocess_upload(raw):
+    """Preprocess the image bytes ``raw`` on the pool, waiting at most SKETCH_PREPROCESS_TIMEOUT"""
+    if len(raw) > setting('SKETCH_MAX_UPLOAD_BYTES', 15 * 1024 * 1024):
+        raise SketchError('image is too large')
+    future = get_executor().submit(preprocess_sketch, raw)
+    try:
+        return future.result(timeout=setting('SKETCH_PREPROCESS_TIMEOUT', 10))
+    except FutureTimeoutError:
+        future.cancel()
+        raise SketchError('image took too long to process')
+
+
+def preprocess_image_data(image_data):
+    """Decode a base64 upload and preprocess it"""
+    return preprocess_upload(decode_image_data(image_data))
@@ -0,0 +1,175 @@
+"""
+Storage for generation inputs and outputs.
+
+Clients upload sketches straight to storage with a presigned URL instead of
+sending them base64-encoded through ``/api/generate/``. ``S3Storage`` is the
+media bucket used in production; ``LocalStorage`` keeps files on disk and
+accepts uploads through ``/api/uploads/`` so tests and benchmarks run
+without AWS. Pick one with ``SKETCH_STORAGE_BACKEND``.
+"""
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from fab_sketch_project.aws import aws_client
+
+
+class StorageError(Exception):
+    pass
+
+
+class SketchStorage:
+    def upload_target(self, key, content_type, expires_in, max_bytes):
+        """
+        Where and how a client uploads at most ``max_bytes`` to ``key``:
+        ``{'url', 'method', 'headers', 'fields'}``; ``fields`` go with a POST
+        as multipart form fields before the file
+        """
+        raise NotImplementedError
+
+    def read(self, key, limit=None):
+        """
+        Bytes stored at ``key``, only the first ``limit`` of them if given;
+        raises ``FileNotFoundError`` if there are none
+        """
+        raise NotImplementedError
+
+    def write(self, key, data, content_type='image/jpeg'):
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+    def key_for_url(self, url):
+        """Key of a URL returned by ``url()``, or None for URLs outside this storage"""
+        prefix = self.url('')
+        if isinstance(url, str) and url.startswith(prefix) and len(url) > len(prefix):
+            return url[len(prefix):]
+        return None
+
+
+class S3Storage(SketchStorage):
+    """The ``AWS_STORAGE_BUCKET_NAME`` bucket in ``AWS_S3_REGION_NAME``"""
+
+    @property
+    def bucket(self):
+        return getattr(settings, 'AWS_STORAGE_BUCKET_NAME', 'fab-sketch-media-xp8zu198')
+
+    @property
+    def region_name(self):
+        return getattr(settings, 'AWS_S3_REGION_NAME', 'ap-northeast-2')
+
+    @property
+    def client(self):
+        return aws_client('s3', self.region_name)
+
+    def upload_target(self, key, content_type, expires_in, max_bytes):
+        # A presigned PUT cannot limit the size of the upload; a POST policy can
+        post = self.client.generate_presigned_post(
+            Bucket=self.bucket, Key=key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+            ExpiresIn=expires_in,
+        )
+        return {'url': post['url'], 'method': 'POST', 'headers': {}, 'fields': post['fields']}
+
+    def read(self, key, limit=None):
+        from botocore.exceptions import ClientError
+
+        params = {'Bucket': self.bucket, 'Key': key}
+        if limit is not None:
+            params['Range'] = f'bytes=0-{limit - 1}'
+        try:
+            return self.client.get_object(**params)['Body'].read()
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key)
+            if code == 'InvalidRange':
+                # The object is empty
+                return b''
+            raise StorageError(str(e))
+
+    def write(self, key, data, content_type='image/jpeg'):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            # Without s3:ListBucket, S3 answers 403 rather than 404 for a missing key
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound', '403', 'AccessDenied'):
+                return False
+            raise StorageError(str(e))
+        return True
+
+    def url(self, key):
+        return f"https://{self.bucket}.s3.{self.region_name}.amazonaws.com/{key}"
+
+
+class LocalStorage(SketchStorage):
+    """
+    Files under ``SKETCH_STORAGE_ROOT``, served at ``SKETCH_STORAGE_URL``;
+    uploads go through a signed ``/api/uploads/`` URL
+    """
+    salt = 'designs.storage.upload'
+
+    @property
+    def root(self):
+        return getattr(settings, 'SKETCH_STORAGE_ROOT', os.path.join(settings.BASE_DIR, 'media'))
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise StorageError(f'Invalid key: {key}')
+        return path
+
+    def upload_target(self, key, content_type, expires_in, max_bytes):
+        # The upload view caps bodies at SKETCH_MAX_UPLOAD_BYTES itself
+        token = signing.dumps({'key': key, 'expires_in': expires_in}, salt=self.salt)
+        url = f"{reverse('sketch_upload')}?token={quote(token)}"
+        return {'url': url, 'method': 'PUT', 'headers': {'Content-Type': content_type}, 'fields': {}}
+
+    def verify_upload(self, token):
+        """Key a token from ``upload_target`` allows uploading, or None if it is invalid or expired"""
+        try:
+            # Each token carries its own lifetime, signed along with the key
+            expires_in = signing.loads(token, salt=self.salt)['expires_in']
+            return signing.loads(token, salt=self.salt, max_age=expires_in)['key']
+        except (signing.BadSignature, KeyError, TypeError):
+            return None
+
+    def read(self, key, limit=None):
+        with open(self.path(key), 'rb') as f:
+            return f.read(-1 if limit is None else limit)
+
+    def write(self, key, data, content_type='image/jpeg'):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def url(self, key):
+        return f"{getattr(settings, 'SKETCH_STORAGE_URL', '/media/')}{key}"
+
+
+@lru_cache(maxsize=None)
+def _load_storage(path):
+    return import_string(path)()
+
+
+def get_sketch_storage():
+    return _load_storage(getattr(settings, 'SKETCH_STORAGE_BACKEND', 'designs.storage.S3Storage'))
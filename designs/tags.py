@@ -0,0 +1,67 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import DesignTag, Tag
+
+# Anything between separators: whitespace, commas, '#' and list punctuation
+# left behind by rows that stored a Python list repr
+TOKEN_RE = re.compile(r'''[^\s,#\[\]'"]+''')
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize_tag(name):
+    return name.strip().lstrip('#').lower()[:MAX_TAG_LENGTH]
+
+
+def parse_hashtags(text):
+    """
+    Split a free-form hashtag string into unique normalized tag names, in order.
+
+    The field holds nothing but tags, so the leading '#' is optional: plain
+    words such as ``linen`` are tags as well.
+    """
+    names = []
+    for token in TOKEN_RE.findall(text or ''):
+        name = normalize_tag(token)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def sync_design_tags(designs):
+    """Bring the DesignTag rows of ``designs`` in line with their hashtags in a few bulk queries"""
+    wanted = {design.pk: set(parse_hashtags(design.hashtags)) for design in designs}
+    created_at = {design.pk: design.created_at for design in designs}
+
+    existing = {}
+    for design_id, name in DesignTag.objects.filter(design_id__in=wanted).values_list('design_id', 'tag__name'):
+        existing.setdefault(design_id, set()).add(name)
+
+    stale = [
+        (design_id, name)
+        for design_id, names in existing.items()
+        for name in names - wanted[design_id]
+    ]
+    missing = [
+        (design_id, name)
+        for design_id, names in wanted.items()
+        for name in names - existing.get(design_id, set())
+    ]
+
+    if stale:
+        DesignTag.objects.filter(reduce(or_, (
+            Q(design_id=design_id, tag__name=name) for design_id, name in stale
+        ))).delete()
+
+    if missing:
+        names = {name for _, name in missing}
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+        DesignTag.objects.bulk_create([
+            DesignTag(design_id=design_id, tag_id=tag_ids[name], created_at=created_at[design_id])
+            for design_id, name in missing
+        ], ignore_conflicts=True)
+    return len(stale), len(missing)
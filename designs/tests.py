@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from comments.models import Comment
+from social.models import Bookmark, Follow, Like
+from . import generation_events
+from .derivatives import build_design_derivatives
+from .generation_backends import GenerationBackend, complete_job, fail_job, generation_payload
+from .generation_dedupe import claim
+from .generation_views import GENERATION_PARAMETERS
+from .models import Design, DesignTag, GenerationJob, Tag
+from .rendering import DESIGN_VALUES, render_row
+from .serializers import CARD_FIELDS, DesignSerializer
+from .sketches import SketchError, decode_image_data, preprocess_image_data, preprocess_upload
+from .storage import LocalStorage, get_sketch_storage
+from .tags import parse_hashtags
+from .view_counter import ViewCountBuffer, view_counts
+
+User = get_user_model()
+
+
+class DesignListQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+
+    def create_designs(self, count):
+        for i in range(count):
+            designer = User.objects.create_user(username=f'designer{i}', user_id=f'designer{i}', nickname=f'designer{i}')
+            Follow.objects.create(follower=self.viewer, followee=designer)
+            design = Design.objects.create(user=designer, title=f'design {i}', description='desc')
+            Like.objects.create(design=design, user=self.viewer)
+            Comment.objects.create(design=design, user=self.viewer, content='nice')
+        call_command('repair_counters', stdout=StringIO())
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def assert_constant_queries(self, url):
+        self.create_designs(2)
+        small, _ = self.count_queries(url)
+        for i in range(2, 12):
+            designer = User.objects.create_user(username=f'more{i}', user_id=f'more{i}', nickname=f'more{i}')
+            Design.objects.create(user=designer, title=f'design {i}', description='desc')
+        large, data = self.count_queries(url)
+        self.assertEqual(small, large)
+        return data
+
+    def test_list_query_count_is_constant(self):
+        data = self.assert_constant_queries('/api/designs/?page_size=50')
+        self.assertEqual(len(data['results']), 12)
+
+    def test_feed_query_count_is_constant(self):
+        data = self.assert_constant_queries('/api/feed/?page_size=50')
+        self.assertEqual(len(data['results']), 12)
+
+    def test_authenticated_feed_query_count_is_constant(self):
+        self.client.force_authenticate(self.viewer)
+        data = self.assert_constant_queries('/api/feed/?page_size=50')
+        self.assertEqual(len(data['results']), 12)
+
+    def test_viewer_state(self):
+        self.create_designs(3)
+        self.client.force_authenticate(self.viewer)
+        _, data = self.count_queries('/api/designs/')
+        for item in data['results']:
+            self.assertTrue(item['is_liked'])
+            self.assertFalse(item['is_bookmarked'])
+            self.assertTrue(item['is_following_designer'])
+            self.assertTrue(item['user']['is_following'])
+
+    def test_counts_are_correct(self):
+        self.create_designs(3)
+        _, data = self.count_queries('/api/designs/')
+        for item in data['results']:
+            self.assertEqual(item['like_count'], 1)
+            self.assertEqual(item['comment_count'], 1)
+            self.assertEqual(item['designer_follower_count'], 1)
+            self.assertEqual(item['designer_following_count'], 0)
+            self.assertEqual(item['designer_post_count'], 1)
+            self.assertEqual(item['user']['follower_count'], '1')
+            self.assertEqual(item['user']['post_count'], '1')
+
+
+class RandomFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+
+    def create_designs(self, count):
+        return Design.objects.bulk_create([
+            Design(user=self.designer, title=f'design {i}', description='desc') for i in range(count)
+        ])
+
+    def walk(self, url):
+        """Pages of ids, following next links to the end"""
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([int(item['id']) for item in data['results']])
+            url = data['next']
+        return pages
+
+    def test_pages_cover_every_design_once(self):
+        designs = self.create_designs(45)
+        # Gaps left by deleted designs are skipped
+        Design.objects.filter(pk__in=[designs[3].pk, designs[20].pk, designs[44].pk]).delete()
+        pages = self.walk('/api/feed/?seed=7&page_size=10')
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(sorted(ids), sorted(Design.objects.values_list('pk', flat=True)))
+        self.assertEqual([len(page) for page in pages], [10, 10, 10, 10, 2])
+
+    def test_same_seed_gives_the_same_order(self):
+        self.create_designs(30)
+        first = self.walk('/api/feed/?seed=7&page_size=10')
+        self.assertEqual(self.walk('/api/feed/?seed=7&page_size=10'), first)
+        self.assertNotEqual(self.walk('/api/feed/?seed=8&page_size=10'), first)
+        self.assertEqual(self.client.get('/api/feed/?seed=7').json()['seed'], 7)
+
+    def test_invalid_or_edited_cursor_is_rejected(self):
+        self.create_designs(5)
+        edited = base64.b64encode(b's=7&l=1&h=5&p=-3').decode('ascii')
+        for cursor in ['not-a-cursor', base64.b64encode(b's=7&l=1').decode('ascii'), edited]:
+            self.assertEqual(self.client.get('/api/feed/', {'cursor': cursor}).status_code, 404)
+
+    def test_sparse_ids_give_short_pages_until_the_end(self):
+        designs = self.create_designs(300)
+        kept = [designs[0].pk, designs[150].pk, designs[299].pk]
+        Design.objects.exclude(pk__in=kept).delete()
+        pages = self.walk('/api/feed/?seed=7&page_size=10')
+        # Each page looks at a bounded number of candidate ids, so most come back short
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) < 10 for page in pages))
+        self.assertEqual(sorted(pk for page in pages for pk in page), kept)
+
+
+class DesignCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Write buffered views while the test database still exists
+        self.addCleanup(view_counts.flush)
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        self.design = Design.objects.create(user=self.designer, title='design', description='desc')
+        self.url = f'/api/design/{self.design.pk}/'
+
+    def test_detail_is_served_from_cache(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Only the ETag query; the payload comes from the cache
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_writes_invalidate_cached_payloads(self):
+        self.client.force_authenticate(self.viewer)
+        self.client.get(self.url)
+        self.client.get('/api/designs/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/like/{self.design.pk}/')
+            self.client.post(f'/api/follow/{self.designer.pk}/')
+
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['like_count'], 1)
+        self.assertTrue(data['is_liked'])
+        self.assertEqual(data['designer_follower_count'], 1)
+        self.assertTrue(data['user']['is_following'])
+        item = self.client.get('/api/designs/').json()['results'][0]
+        self.assertEqual(item['like_count'], 1)
+        self.assertEqual(item['designer_follower_count'], 1)
+
+    @mock.patch('designs.generation_views.schedule_derivatives')
+    def test_saving_a_generated_design_invalidates_the_designers_cached_payloads(self, schedule_derivatives):
+        self.assertEqual(self.client.get(self.url).json()['designer_post_count'], 0)
+        self.client.force_authenticate(self.designer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/save-design/', {
+                'session_id': str(uuid.uuid4()), 'title': 'generated', 'description': 'desc',
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['designer_post_count'], data['user']['post_count']), (1, '1'))
+
+    def test_viewer_fields_are_not_shared(self):
+        Like.objects.create(design=self.design, user=self.viewer)
+        self.client.force_authenticate(self.viewer)
+        self.assertTrue(self.client.get(self.url).json()['is_liked'])
+        self.client.force_authenticate(self.designer)
+        self.assertFalse(self.client.get(self.url).json()['is_liked'])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(view_counts.flush)
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        self.design = Design.objects.create(user=self.designer, title='design', description='desc')
+        self.client.force_authenticate(self.viewer)
+
+    def assert_revalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(len(context.captured_queries), 1)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_design_detail(self):
+        self.assert_revalidates(
+            f'/api/design/{self.design.pk}/',
+            lambda: self.client.post(f'/api/like/{self.design.pk}/'),
+        )
+
+    def test_comment_list(self):
+        self.client.post('/api/comments/', {'design': self.design.pk, 'content': 'first'})
+        self.assert_revalidates(
+            f'/api/comments/?design_id={self.design.pk}',
+            lambda: self.client.post('/api/comments/', {'design': self.design.pk, 'content': 'second'}),
+        )
+
+    def test_comment_edits_and_deletes_change_the_comment_list(self):
+        self.client.post('/api/comments/', {'design': self.design.pk, 'content': 'first'})
+        comment = Comment.objects.get()
+        url = f'/api/comment/{self.design.pk}/'
+        self.assert_revalidates(
+            url, lambda: self.client.patch(f'/api/comments/{comment.pk}/', {'content': 'edited'}, format='json'),
+        )
+        self.assert_revalidates(url, lambda: self.client.delete(f'/api/comments/{comment.pk}/'))
+
+    def test_unfiltered_comment_list_is_not_validated(self):
+        Comment.objects.create(design=self.design, user=self.designer, content='first')
+        response = self.client.get('/api/comments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.client.get(f'/api/comment/{self.design.pk + 1}/').status_code, 404)
+
+    def test_profile(self):
+        self.assert_revalidates(
+            f'/api/user/{self.designer.pk}/',
+            lambda: self.client.post(f'/api/follow/{self.designer.pk}/'),
+        )
+
+    def test_etag_depends_on_viewer(self):
+        url = f'/api/design/{self.design.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.designer)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=60, VIEW_COUNT_MAX_PENDING=1000)
+class ViewCountBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(view_counts.flush)
+        self.buffer = ViewCountBuffer()
+        # Also cancels the background timer
+        self.addCleanup(self.buffer.flush)
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.designs = [
+            Design.objects.create(user=self.designer, title=f'design {i}', description='desc') for i in range(3)
+        ]
+
+    def test_increment_returns_the_unwritten_delta(self):
+        first, second = self.designs[:2]
+        self.assertEqual(self.buffer.increment(first.pk), 1)
+        self.assertEqual(self.buffer.increment(first.pk), 2)
+        self.assertEqual(self.buffer.increment(second.pk, 3), 3)
+        self.assertEqual(self.buffer.pending(first.pk), 2)
+        first.refresh_from_db()
+        self.assertEqual(first.view_count, 0)
+
+    def test_flush_writes_one_update_per_delta(self):
+        for design, views in zip(self.designs, (5, 5, 2)):
+            for _ in range(views):
+                self.buffer.increment(design.pk)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.buffer.flush(), 3)
+        updates = [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            list(Design.objects.filter(pk__in=[d.pk for d in self.designs]).order_by('pk').values_list('view_count', flat=True)),
+            [5, 5, 2],
+        )
+        self.assertEqual(self.buffer.pending(self.designs[0].pk), 0)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_invalidates_cached_payloads(self):
+        design = self.designs[0]
+        url = f'/api/design/{design.pk}/'
+        self.client.get(url)
+        view_counts.flush()
+        for _ in range(4):
+            self.buffer.increment(design.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.flush()
+        # One view from the first request, four from the buffer, plus this request's own
+        self.assertEqual(self.client.get(url).json()['view_count'], 6)
+
+    def test_failed_flush_keeps_its_increments(self):
+        design = self.designs[0]
+        self.buffer.increment(design.pk, 3)
+        with mock.patch('designs.view_counter.bump_designs', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending(design.pk), 3)
+        design.refresh_from_db()
+        self.assertEqual(design.view_count, 0)
+
+        self.buffer.increment(design.pk)
+        self.buffer.flush()
+        design.refresh_from_db()
+        self.assertEqual(design.view_count, 4)
+
+    def test_not_modified_detail_still_counts_a_view(self):
+        design = self.designs[0]
+        url = f'/api/design/{design.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(view_counts.pending(design.pk), 2)
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        for i in range(3):
+            designer = User.objects.create_user(username=f'designer{i}', user_id=f'designer{i}', nickname=f'designer{i}')
+            Design.objects.create(user=designer, title=f'design {i}', description='desc')
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()['results']
+
+    def test_card_view(self):
+        _, results = self.get('/api/feed/?view=card')
+        self.assertEqual([list(item) for item in results], [CARD_FIELDS] * 3)
+
+    def test_fields(self):
+        _, results = self.get('/api/designs/?fields=id,title,unknown')
+        self.assertEqual([list(item) for item in results], [['id', 'title']] * 3)
+
+    def test_unrequested_viewer_state_is_not_queried(self):
+        anonymous, _ = self.get('/api/designs/?fields=id,title')
+        self.client.force_authenticate(self.viewer)
+        sparse, _ = self.get('/api/designs/?fields=id,title')
+        liked_only, _ = self.get('/api/designs/?fields=id,is_liked')
+        full, _ = self.get('/api/designs/')
+        self.assertEqual(sparse, anonymous)
+        self.assertEqual(liked_only, sparse + 1)
+        self.assertEqual(full, sparse + 3)
+
+
+class FastRenderingParityTests(TestCase):
+    """The .values() rendering path must produce exactly what DesignSerializer does"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        plain = User.objects.create_user(username='plain', user_id='plain', nickname='plain')
+        famous = User.objects.create_user(
+            username='famous', user_id='famous', nickname='유명한 디자이너', bio='소개',
+            profile_image='https://example.com/p.jpg', location='Busan, Korea',
+            follower_count=2_500_000, following_count=1234, design_count=999,
+        )
+        Design.objects.create(user=plain, title='plain', description='')
+        Design.objects.create(
+            user=famous, title='봄 원피스', description='가벼운 린넨\n두 줄', hashtags='#봄 #linen',
+            materials='Linen 100%', image_urls=['https://example.com/1.jpg', {
+                'original': 'https://example.com/2.jpg',
+                '320': {'jpeg': 'https://example.com/2_w320.jpg', 'webp': 'https://example.com/2_w320.webp'},
+            }],
+            sketch_url='https://example.com/s.jpg', try_on_url='https://example.com/t.jpg',
+            session_id='abc', funding_progress=Decimal('0.75'), funding_amount='₩1,000',
+            view_count=42, like_count=3, comment_count=1,
+        )
+        Follow.objects.create(follower=self.viewer, followee=famous)
+        Like.objects.create(design=Design.objects.get(title='plain'), user=self.viewer)
+
+    def assert_rows_match_serializer(self):
+        serializer = DesignSerializer(context={})
+        rows = {row['id']: row for row in Design.objects.values(*DESIGN_VALUES)}
+        for design in Design.objects.select_related('user'):
+            self.assertEqual(render_row(rows[design.pk]), serializer.shared_representation(design))
+
+    def test_row_rendering(self):
+        self.assert_rows_match_serializer()
+
+    @override_settings(TIME_ZONE='Asia/Seoul')
+    def test_row_rendering_in_local_time(self):
+        self.assert_rows_match_serializer()
+
+    def assert_matches_list(self, url):
+        cache.clear()
+        fast = self.client.get(url).json()['results']
+        cache.clear()
+        query = url.partition('?')[2]
+        reference = {item['id']: item for item in self.client.get(f'/api/designs/?{query}').json()['results']}
+        self.assertTrue(fast)
+        for item in fast:
+            self.assertEqual(item, reference[item['id']])
+
+    def test_feed_and_user_designs_match_serializer(self):
+        for authenticated in (False, True):
+            if authenticated:
+                self.client.force_authenticate(self.viewer)
+            for query in ('', 'view=card', 'fields=id,user,is_liked'):
+                self.assert_matches_list(f'/api/feed/?{query}')
+                for user in User.objects.exclude(pk=self.viewer.pk):
+                    self.assert_matches_list(f'/api/designs/user_designs/?user_id={user.pk}&{query}')
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        self.design = Design.objects.create(user=self.designer, title='design', description='desc')
+        self.client.force_authenticate(self.viewer)
+
+    def counts(self, obj, *fields):
+        obj.refresh_from_db()
+        return tuple(getattr(obj, field) for field in fields)
+
+    def test_toggles_count_up_and_down(self):
+        for url, field in [
+            (f'/api/like/{self.design.pk}/', 'like_count'),
+            (f'/api/bookmark/{self.design.pk}/', 'bookmark_count'),
+        ]:
+            self.client.post(url)
+            self.assertEqual(self.counts(self.design, field), (1,))
+            self.client.post(url)
+            self.assertEqual(self.counts(self.design, field), (0,))
+
+        url = f'/api/follow/{self.designer.pk}/'
+        self.client.post(url)
+        self.assertEqual(self.counts(self.designer, 'follower_count'), (1,))
+        self.assertEqual(self.counts(self.viewer, 'following_count'), (1,))
+        self.client.post(url)
+        self.assertEqual(self.counts(self.designer, 'follower_count'), (0,))
+        self.assertEqual(self.counts(self.viewer, 'following_count'), (0,))
+
+    def test_comments_count_up_and_down(self):
+        response = self.client.post(f'/api/comment/{self.design.pk}/', {'content': 'nice'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(self.design, 'comment_count'), (1,))
+        comment = Comment.objects.get()
+        self.assertEqual(self.client.delete(f'/api/comments/{comment.pk}/').status_code, 204)
+        self.assertEqual(self.counts(self.design, 'comment_count'), (0,))
+
+    def test_design_count_follows_create_and_delete(self):
+        self.client.force_authenticate(self.designer)
+        response = self.client.post('/api/designs/', {'title': 'new', 'description': 'desc'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(self.designer, 'design_count'), (1,))
+        self.assertEqual(self.client.delete(f'/api/designs/{self.design.pk}/').status_code, 204)
+        self.assertEqual(self.counts(self.designer, 'design_count'), (0,))
+
+    def test_drifted_counters_never_go_negative(self):
+        Like.objects.create(design=self.design, user=self.viewer)
+        Follow.objects.create(follower=self.viewer, followee=self.designer)
+        comment = Comment.objects.create(design=self.design, user=self.viewer, content='nice')
+        # The rows exist but their counters were never incremented
+        self.assertEqual(self.client.post(f'/api/like/{self.design.pk}/').status_code, 200)
+        self.assertEqual(self.client.post(f'/api/follow/{self.designer.pk}/').status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/comments/{comment.pk}/').status_code, 204)
+        self.assertEqual(self.counts(self.design, 'like_count', 'comment_count'), (0, 0))
+        self.assertEqual(self.counts(self.designer, 'follower_count'), (0,))
+        self.assertEqual(self.counts(self.viewer, 'following_count'), (0,))
+
+    def test_repair_counters_fixes_drift(self):
+        Like.objects.create(design=self.design, user=self.viewer)
+        Bookmark.objects.create(design=self.design, user=self.viewer)
+        Follow.objects.create(follower=self.viewer, followee=self.designer)
+        Design.objects.filter(pk=self.design.pk).update(comment_count=5)
+
+        output = StringIO()
+        call_command('repair_counters', '--dry-run', stdout=output)
+        self.assertIn('Found 1 design(s) and 2 user(s)', output.getvalue())
+        self.assertEqual(self.counts(self.design, 'like_count', 'comment_count'), (0, 5))
+
+        output = StringIO()
+        call_command('repair_counters', '--batch-size', '1', stdout=output)
+        self.assertIn('Repaired 1 design(s) and 2 user(s)', output.getvalue())
+        self.assertEqual(self.counts(self.design, 'like_count', 'comment_count', 'bookmark_count'), (1, 0, 1))
+        self.assertEqual(self.counts(self.designer, 'follower_count', 'design_count'), (1, 1))
+        self.assertEqual(self.counts(self.viewer, 'following_count'), (1,))
+
+        output = StringIO()
+        call_command('repair_counters', stdout=output)
+        self.assertIn('Repaired 0 design(s) and 0 user(s)', output.getvalue())
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+
+    def create_design(self, title, age_hours=0, **counts):
+        design = Design.objects.create(user=self.designer, title=title, description='desc', **counts)
+        created_at = timezone.now() - timedelta(hours=age_hours)
+        Design.objects.filter(pk=design.pk).update(created_at=created_at, last_activity_at=created_at)
+        return design
+
+    def update_trending(self, *args):
+        output = StringIO()
+        call_command('update_trending', *args, stdout=output)
+        return output.getvalue()
+
+    def trending_titles(self):
+        return [item['title'] for item in self.client.get('/api/feed/trending/').json()['results']]
+
+    def test_new_designs_are_ranked_before_the_next_run(self):
+        design = Design.objects.create(user=self.designer, title='new', description='desc')
+        self.assertGreater(design.hot_score, 0)
+        self.assertIsNone(design.score_updated_at)
+        self.assertEqual(self.trending_titles(), ['new'])
+
+    def test_engagement_decays_with_age(self):
+        # Three half-lives old: 8 likes weigh as much as 1 like today
+        self.create_design('old and liked', age_hours=72, like_count=6)
+        self.create_design('fresh', like_count=1)
+        self.create_design('fresh and bookmarked', bookmark_count=1)
+        self.update_trending('--all')
+        self.assertEqual(self.trending_titles(), ['fresh and bookmarked', 'fresh', 'old and liked'])
+
+    def test_only_designs_with_new_activity_are_rescored(self):
+        quiet = self.create_design('quiet', age_hours=2)
+        active = self.create_design('active', age_hours=2)
+        self.assertIn('2 design(s)', self.update_trending())
+        quiet.refresh_from_db()
+        scored_at = quiet.score_updated_at
+
+        Design.objects.filter(pk=active.pk).update(like_count=10, last_activity_at=timezone.now())
+        self.assertIn('1 design(s)', self.update_trending())
+        quiet.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(quiet.score_updated_at, scored_at)
+        self.assertGreater(active.score_updated_at, scored_at)
+        self.assertEqual(self.trending_titles(), ['active', 'quiet'])
+        self.assertIn('2 design(s)', self.update_trending('--all'))
+
+    def test_cursor_pages_follow_the_score(self):
+        for i in range(7):
+            self.create_design(f'design {i}', like_count=i)
+        self.update_trending()
+        titles, url = [], '/api/feed/trending/?page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            titles += [item['title'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(titles, [f'design {i}' for i in reversed(range(7))])
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+
+    def tags(self, design):
+        return set(DesignTag.objects.filter(design=design).values_list('tag__name', flat=True))
+
+    def test_parse_hashtags(self):
+        self.assertEqual(parse_hashtags('#Linen, #summer #linen'), ['linen', 'summer'])
+        # Plain words are tags too; the '#' is optional
+        self.assertEqual(parse_hashtags('linen cotton,#Denim'), ['linen', 'cotton', 'denim'])
+        self.assertEqual(parse_hashtags("['#linen', 'summer']"), ['linen', 'summer'])
+        self.assertEqual(parse_hashtags(''), [])
+        self.assertEqual(parse_hashtags(None), [])
+
+    def test_save_syncs_tags_only_when_hashtags_change(self):
+        design = Design.objects.create(user=self.designer, title='shirt', description='desc', hashtags='#linen #summer')
+        self.assertEqual(self.tags(design), {'linen', 'summer'})
+
+        design = Design.objects.get(pk=design.pk)
+        design.title = 'renamed'
+        with CaptureQueriesContext(connection) as context:
+            design.save()
+        self.assertFalse([query for query in context.captured_queries if 'designtag' in query['sql']])
+
+        design.hashtags = '#linen #winter'
+        design.save()
+        self.assertEqual(self.tags(design), {'linen', 'winter'})
+        design.hashtags = ''
+        design.save()
+        self.assertEqual(self.tags(design), set())
+
+    def test_backfill_tags_indexes_existing_rows(self):
+        # bulk_create skips save(), like rows written before the index existed
+        designs = Design.objects.bulk_create([
+            Design(user=self.designer, title=f'design {i}', description='desc', hashtags=f'#linen tag{i}')
+            for i in range(3)
+        ])
+        output = StringIO()
+        call_command('backfill_tags', '--batch-size', '2', stdout=output)
+        self.assertIn('Indexed 3 design(s): 6 tag link(s) added, 0 removed', output.getvalue())
+        self.assertEqual(self.tags(designs[1]), {'linen', 'tag1'})
+        self.assertEqual(Tag.objects.filter(name='linen').count(), 1)
+
+    def test_tagged_lists_designs_newest_first(self):
+        for i, hashtags in enumerate(['#linen', 'Linen #summer', '#summer']):
+            Design.objects.create(user=self.designer, title=f'design {i}', description='desc', hashtags=hashtags)
+        data = self.client.get('/api/tag/LINEN/').json()
+        self.assertEqual([item['title'] for item in data['results']], ['design 1', 'design 0'])
+        self.assertEqual(self.client.get('/api/tag/wool/').json()['results'], [])
+
+
+class BenchmarkHarnessTests(TestCase):
+    def test_benchmarks_leave_the_database_and_cache_alone(self):
+        cache.set('live-entry', 'kept')
+        call_command('bench_serializers', '--page-size', '2', '--repeat', '1', stdout=StringIO())
+        self.assertEqual(cache.get('live-entry'), 'kept')
+        self.assertFalse(Design.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+
+    def create_design(self, title, description='desc', **fields):
+        return Design.objects.create(user=self.designer, title=title, description=description, **fields)
+
+    def search(self, **params):
+        return self.client.get('/api/search/', params)
+
+    @skipIf(connection.vendor == 'postgresql', 'ranked by the fallback field weights')
+    def test_title_matches_rank_ahead_of_description_matches(self):
+        self.create_design('plain shirt', 'a linen summer shirt')
+        self.create_design('linen summer dress')
+        self.create_design('summer hat', 'straw', materials='linen')
+        self.create_design('wool coat', 'winter')
+        data = self.search(q='linen summer').json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([item['title'] for item in data['results']], ['linen summer dress', 'summer hat', 'plain shirt'])
+        # Every term has to match
+        self.assertEqual(self.search(q='linen winter').json()['count'], 0)
+
+    def test_query_is_required(self):
+        for params in [{}, {'q': '  '}]:
+            response = self.search(**params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'q parameter required'})
+
+    def test_results_are_paginated(self):
+        for i in range(7):
+            self.create_design(f'linen {i}')
+        first = self.search(q='linen', page_size=3).json()
+        self.assertEqual((first['count'], len(first['results'])), (7, 3))
+        last = self.search(q='linen', page_size=3, page=3).json()
+        self.assertEqual(len(last['results']), 1)
+        self.assertIsNone(last['next'])
+        titles = [
+            item['title'] for page in range(1, 4)
+            for item in self.search(q='linen', page_size=3, page=page).json()['results']
+        ]
+        self.assertEqual(titles, [f'linen {i}' for i in reversed(range(7))])
+        self.assertEqual(self.search(q='linen', page=9).status_code, 404)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'full-text search needs the tsvector and pg_trgm indexes')
+class PostgresSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+
+    def create_design(self, title, description='desc'):
+        return Design.objects.create(user=self.designer, title=title, description=description)
+
+    def search(self, **params):
+        return self.client.get('/api/search/', params)
+
+    def test_query_is_required(self):
+        self.assertEqual(self.search().status_code, 400)
+        self.assertEqual(self.search(q=' ').status_code, 400)
+
+    def test_title_matches_rank_ahead_of_description_matches(self):
+        self.create_design('plain shirt', 'a linen summer shirt')
+        self.create_design('linen summer dress')
+        self.create_design('wool coat', 'winter')
+        data = self.search(q='linen summer').json()
+        self.assertEqual([item['title'] for item in data['results']], ['linen summer dress', 'plain shirt'])
+        self.assertEqual(self.search(q='linen winter').json()['count'], 0)
+
+    def test_partial_words_match_through_trigrams(self):
+        self.create_design('린넨셔츠', '여름용')
+        self.assertEqual([item['title'] for item in self.search(q='린넨').json()['results']], ['린넨셔츠'])
+
+    def test_edits_are_searchable(self):
+        design = self.create_design('wool coat', 'winter')
+        design.title = 'linen coat'
+        design.save()
+        self.assertEqual([item['title'] for item in self.search(q='linen').json()['results']], ['linen coat'])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.designs = [
+            Design.objects.create(user=self.designer, title=f'design {i}', description='desc', hashtags='#linen')
+            for i in range(8)
+        ]
+        # Equal timestamps, so pages have to break ties on id
+        created_at = timezone.now()
+        Design.objects.update(created_at=created_at)
+        DesignTag.objects.update(created_at=created_at)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids += [int(item['id']) for item in data['results']]
+            url = data['next']
+        return ids
+
+    def test_pages_cover_every_design_once(self):
+        expected = [design.pk for design in reversed(self.designs)]
+        for url in [
+            f'/api/designs/user_designs/?user_id={self.designer.pk}&page_size=3',
+            '/api/tag/linen/?page_size=3',
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), expected)
+
+    def test_page_size_is_capped(self):
+        Design.objects.bulk_create([
+            Design(user=self.designer, title=f'more {i}', description='desc') for i in range(50)
+        ])
+        data = self.client.get(f'/api/designs/user_designs/?user_id={self.designer.pk}&page_size=500').json()
+        self.assertEqual(len(data['results']), 50)
+        self.assertIsNotNone(data['next'])
+
+
+class DesignBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username='viewer', user_id='viewer', nickname='viewer')
+        self.client.force_authenticate(self.viewer)
+        self.designs = []
+        for i in range(12):
+            designer = User.objects.create_user(username=f'designer{i}', user_id=f'designer{i}', nickname=f'designer{i}')
+            self.designs.append(Design.objects.create(user=designer, title=f'design {i}', description='desc'))
+        Like.objects.create(design=self.designs[3], user=self.viewer)
+
+    def get(self, ids):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/designs/batch/', {'ids': ','.join(str(pk) for pk in ids)})
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.json()
+
+    def test_request_order_and_missing(self):
+        ids = [self.designs[5].pk, 999999, self.designs[3].pk, self.designs[0].pk]
+        _, data = self.get(ids)
+        self.assertEqual([int(item['id']) for item in data['results']], [ids[0], ids[2], ids[3]])
+        self.assertEqual(data['missing'], [999999])
+        self.assertEqual([item['is_liked'] for item in data['results']], [False, True, False])
+
+    def test_query_count_is_constant(self):
+        small, _ = self.get([design.pk for design in self.designs[:2]])
+        large, data = self.get([design.pk for design in self.designs])
+        self.assertEqual(small, large)
+        self.assertEqual(len(data['results']), 12)
+
+    def test_cached_designs_skip_the_design_query(self):
+        ids = [design.pk for design in self.designs]
+        cold, _ = self.get(ids)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/designs/batch/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(len(context.captured_queries), cold - 1)
+
+    def test_views_are_not_counted(self):
+        self.get([self.designs[0].pk])
+        self.assertEqual(view_counts.pending(self.designs[0].pk), 0)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/designs/batch/', {'ids': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/designs/batch/').status_code, 400)
+        too_many = ','.join(str(pk) for pk in range(1, 102))
+        self.assertEqual(self.client.get('/api/designs/batch/', {'ids': too_many}).status_code, 400)
+
+
+def encode_image(image, format='JPEG', **save_options):
+    output = BytesIO()
+    image.save(output, format, **save_options)
+    return base64.b64encode(output.getvalue()).decode('ascii')
+
+
+class CallbackBackend(GenerationBackend):
+    reports_completion = True
+
+    def submit(self, job, payload):
+        pass
+
+
+class RecordingBackend(GenerationBackend):
+    reports_completion = True
+    payloads = []
+
+    def submit(self, job, payload):
+        self.payloads.append(payload)
+
+
+class BrokenBackend(GenerationBackend):
+    def submit(self, job, payload):
+        raise RuntimeError('generator unavailable')
+
+
+@override_settings(GENERATION_BACKEND='designs.generation_backends.FakeBackend', GENERATION_FAKE_LATENCY=0)
+class GenerationJobTests(TransactionTestCase):
+    payload = {'image': encode_image(Image.new('RGB', (64, 64), 'white')), 'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='maker', user_id='maker', nickname='maker')
+        self.client.force_authenticate(self.user)
+
+    def test_generate_returns_a_job_and_completes_in_the_background(self):
+        response = self.client.post('/api/generate/', self.payload, format='json')
+        self.assertEqual(response.status_code, 202)
+        session_id = response.json()['job_id']
+        self.assertTrue(response.json()['status_url'].endswith(f'/api/generation-status/{session_id}/'))
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            data = self.client.get(f'/api/generation-status/{session_id}/').json()
+            if data['status'] == 'completed':
+                break
+            time.sleep(0.02)
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['progress'], 100.0)
+        self.assertTrue(data['step_1'].endswith(f'{session_id}/step_1.jpg'))
+        self.assertEqual(GenerationJob.objects.get(session_id=session_id).parameters['style'], 'casual')
+
+    def test_fake_backend_with_local_storage_creates_no_aws_clients(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+            SKETCH_STORAGE_BACKEND='designs.storage.LocalStorage', SKETCH_STORAGE_ROOT=root,
+            GENERATION_BACKEND='designs.generation_backends.BlockingFakeBackend',
+        ), mock.patch('designs.storage.aws_client') as storage_client, \
+                mock.patch('designs.generation_backends.aws_client') as lambda_client:
+            response = self.client.post('/api/generate/', self.payload, format='json')
+            # The blocking backend has finished by the time the request returns
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertEqual((data['status'], data['progress']), ('completed', 100.0))
+            self.assertTrue(data['step_1'].endswith(f"{data['session_id']}/step_1.jpg"))
+            data = self.client.get(f"/api/generation-status/{data['job_id']}/").json()
+        self.assertEqual(data['status'], 'completed')
+        storage_client.assert_not_called()
+        lambda_client.assert_not_called()
+
+    def test_loading_the_urls_does_not_import_the_aws_sdk(self):
+        # A fresh interpreter, since this one has imported botocore for other tests
+        script = (
+            'import sys, django; django.setup(); import fab_sketch_project.urls; '
+            "print(sorted(name for name in ('boto3', 'botocore') if name in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'fab_sketch_project.settings'},
+        )
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '[]')
+
+    @override_settings(GENERATION_BACKEND='designs.tests.BrokenBackend')
+    def test_submit_failure_marks_the_job_failed(self):
+        response = self.client.post('/api/generate/', self.payload, format='json')
+        self.assertEqual(response.status_code, 500)
+        job = GenerationJob.objects.get(session_id=response.json()['session_id'])
+        self.assertEqual(job.status, GenerationJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'generator unavailable')
+
+
+def s3_missing(code='404'):
+    from botocore.exceptions import ClientError
+
+    def head_object(**kwargs):
+        raise ClientError({'Error': {'Code': code}}, 'HeadObject')
+    return head_object
+
+
+@override_settings(GENERATION_BACKEND='designs.tests.CallbackBackend', GENERATION_CALLBACK_SECRET='s3cret')
+class GenerationStatusTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='maker', user_id='maker', nickname='maker')
+        self.job = GenerationJob.objects.create(session_id='sess-1', user=self.user)
+        self.url = '/api/generation-status/sess-1/'
+
+    def callback(self, data, secret='s3cret'):
+        return self.client.post('/api/generation-callback/', data, format='json', HTTP_X_GENERATION_SECRET=secret)
+
+    @mock.patch('designs.storage.aws_client')
+    def test_callback_completes_job_without_s3(self, aws_client):
+        self.assertEqual(self.client.get(self.url).json()['status'], 'pending')
+        self.assertEqual(self.callback({'session_id': 'sess-1', 'status': 'completed'}, secret='wrong').status_code, 403)
+
+        response = self.callback({'session_id': 'sess-1', 'status': 'completed', 'step_1': 'https://cdn/1.jpg'})
+        self.assertEqual(response.status_code, 200)
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['step_1'], 'https://cdn/1.jpg')
+        self.assertTrue(data['step_2'].endswith('sess-1/step_2.jpg'))
+        aws_client.return_value.head_object.assert_not_called()
+
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+    def test_failed_callback(self):
+        self.callback({'session_id': 'sess-1', 'status': 'failed', 'error': 'out of memory'})
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['status'], data['error']), ('failed', 'out of memory'))
+        self.assertEqual(self.callback({'session_id': 'missing', 'status': 'failed'}).status_code, 404)
+
+    @override_settings(GENERATION_BACKEND='designs.tests.BrokenBackend')
+    @mock.patch('designs.storage.aws_client')
+    def test_s3_fallback_marks_job_completed_and_is_cached(self, aws_client):
+        s3_client = aws_client.return_value
+        s3_client.head_object.side_effect = s3_missing()
+        self.assertEqual(self.client.get(self.url).json()['status'], 'pending')
+        self.assertEqual(s3_client.head_object.call_count, 3)
+
+        cache.clear()
+        s3_client.head_object.side_effect = None
+        self.assertEqual(self.client.get(self.url).json()['status'], 'completed')
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, GenerationJob.STATUS_COMPLETED)
+
+        self.client.get(self.url)
+        self.assertEqual(s3_client.head_object.call_count, 6)
+        aws_client.assert_called_with('s3', 'ap-northeast-2')
+
+    @override_settings(GENERATION_BACKEND='designs.tests.BrokenBackend')
+    @mock.patch('designs.storage.aws_client')
+    def test_s3_access_denied_counts_as_not_written_yet(self, aws_client):
+        aws_client.return_value.head_object.side_effect = s3_missing('403')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'pending')
+
+
+def sse_events(chunk):
+    events = []
+    for block in chunk.decode().strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@override_settings(
+    GENERATION_BACKEND='designs.tests.CallbackBackend', GENERATION_CALLBACK_SECRET='s3cret',
+    GENERATION_EVENTS_POLL_INTERVAL=30,
+)
+class GenerationEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='maker', user_id='maker', nickname='maker')
+        self.job = GenerationJob.objects.create(session_id='sess-1', user=self.user)
+        self.url = '/api/generation-status/sess-1/events/'
+
+    def committed(self, func, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args)
+
+    def callback(self, data):
+        return APIClient().post('/api/generation-callback/', data, format='json', HTTP_X_GENERATION_SECRET='s3cret')
+
+    async def next_events(self, stream):
+        return sse_events(await asyncio.wait_for(anext(stream), 5))
+
+    async def test_pushes_steps_as_the_generator_reports_them(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 30000\n\n')
+        [(event, data)] = await self.next_events(stream)
+        self.assertEqual((event, data['status']), ('status', 'pending'))
+        self.assertEqual(generation_events.subscriber_count('sess-1'), 1)
+
+        # Far quicker than the 30s poll interval, so these arrive by being pushed
+        await sync_to_async(self.committed)(self.callback, {'session_id': 'sess-1', 'status': 'running', 'step_1': 'https://cdn/1.jpg'})
+        [step, (event, data)] = await self.next_events(stream)
+        self.assertEqual(step, ('step', {'session_id': 'sess-1', 'name': 'step_1', 'value': 'https://cdn/1.jpg'}))
+        self.assertEqual((event, data['status'], data['completed_files']), ('status', 'running', ['step_1.jpg']))
+
+        result = {'step_1': 'https://cdn/1.jpg', 'step_2': 'https://cdn/2.jpg', 'step_3': 'https://cdn/3.jpg', 'specs_log': 'ok'}
+        await sync_to_async(self.committed)(complete_job, 'sess-1', result)
+        events = await self.next_events(stream)
+        self.assertEqual([data['name'] for event, data in events[:-1]], ['step_2', 'step_3', 'specs_log'])
+        self.assertEqual((events[-1][0], events[-1][1]['status']), ('status', 'completed'))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(generation_events.subscriber_count('sess-1'), 0)
+
+    @override_settings(GENERATION_EVENTS_POLL_INTERVAL=0.05, GENERATION_STATUS_CACHE_TIMEOUT=0)
+    async def test_polls_for_changes_made_in_another_process(self):
+        response = await self.async_client.get(self.url)
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        await self.next_events(stream)
+
+        # Nothing is published for an update this process did not make
+        await GenerationJob.objects.filter(session_id='sess-1').aupdate(status=GenerationJob.STATUS_FAILED, error='lost')
+        events = await self.next_events(stream)
+        while not events:
+            events = await self.next_events(stream)
+        self.assertEqual(events[-1][1]['error'], 'lost')
+
+    def test_wsgi_sends_the_current_status_once(self):
+        complete_job('sess-1', {'step_1': 'https://cdn/1.jpg'})
+        response = self.client.get(self.url)
+        events = sse_events(b''.join(response.streaming_content))
+        self.assertEqual([event for event, data in events], ['step', 'status'])
+        self.assertEqual(events[-1][1]['status'], 'completed')
+
+
+@override_settings(SKETCH_MAX_DIMENSION=256)
+class SketchPreprocessingTests(TestCase):
+    def decode(self, sketch):
+        return Image.open(BytesIO(sketch.data))
+
+    def test_downsizes_and_applies_exif_orientation(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90° clockwise, as phones store portrait photos
+        image_data = encode_image(Image.new('RGB', (1200, 800), 'gray'), exif=exif)
+        sketch = preprocess_image_data(image_data)
+        self.assertEqual((sketch.width, sketch.height), (171, 256))
+        image = self.decode(sketch)
+        self.assertEqual((image.format, image.size), ('JPEG', (171, 256)))
+        self.assertNotIn(0x0112, image.getexif())
+        self.assertLess(len(sketch.data), sketch.original_bytes)
+
+    def test_transparent_png_is_flattened_on_white(self):
+        image = Image.new('RGBA', (100, 50), (0, 0, 0, 0))
+        sketch = preprocess_image_data('data:image/png;base64,' + encode_image(image, 'PNG'))
+        image = self.decode(sketch)
+        self.assertEqual((image.mode, image.size), ('RGB', (100, 50)))
+        self.assertGreater(min(image.getpixel((10, 10))), 250)
+
+    @override_settings(SKETCH_MAX_DIMENSION=1024)
+    def test_noisy_photo_is_reencoded_to_fit_the_generator_payload(self):
+        noise = Image.effect_noise((1024, 1024), 60)
+        image = Image.merge('RGB', [noise, noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise.rotate(90)])
+        sketch = preprocess_image_data(encode_image(image, quality=95))
+        payload = generation_payload(
+            str(uuid.uuid4()), {name: 'x' * 50 for name in GENERATION_PARAMETERS}, image_data=sketch.as_base64(),
+            callback_url='https://api.example.com/api/generation-callback/',
+        )
+        self.assertLessEqual(len(json.dumps(payload)), 256 * 1024)
+        self.assertGreater(len(json.dumps(payload)), 128 * 1024)
+
+        with override_settings(GENERATION_MAX_PAYLOAD_BYTES=8 * 1024):
+            self.assertRaises(SketchError, preprocess_image_data, encode_image(image))
+
+    def test_rejects_invalid_uploads(self):
+        for image_data in ['not base64!', base64.b64encode(b'hello').decode(), encode_image(Image.new('RGB', (8, 8)), 'GIF')]:
+            with self.assertRaises(SketchError):
+                preprocess_image_data(image_data)
+        with override_settings(SKETCH_MAX_UPLOAD_BYTES=10):
+            with self.assertRaises(SketchError):
+                decode_image_data('A' * 100)
+
+    def test_generate_rejects_unreadable_sketch(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='maker', user_id='maker', nickname='maker'))
+        response = client.post('/api/generate/', {
+            'image': 'aGVsbG8=', 'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GenerationJob.objects.exists())
+
+
+@override_settings(
+    GENERATION_BACKEND='designs.tests.CallbackBackend',
+    SKETCH_STORAGE_BACKEND='designs.storage.LocalStorage',
+)
+class SketchUploadTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(SKETCH_STORAGE_ROOT=root.name))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='maker', user_id='maker', nickname='maker'))
+        output = BytesIO()
+        Image.new('RGB', (300, 200), 'white').save(output, 'JPEG')
+        self.sketch = output.getvalue()
+
+    def generate(self, **data):
+        return self.client.post('/api/generate/', {
+            'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top', **data,
+        }, format='json')
+
+    @override_settings(GENERATION_BACKEND='designs.tests.RecordingBackend')
+    def test_upload_then_generate_from_key(self):
+        RecordingBackend.payloads = []
+        target = self.client.post('/api/generate/upload-url/').json()
+        self.assertEqual(target['sketch_key'], f"{target['session_id']}/sketch.jpg")
+        self.assertEqual(self.generate(sketch_key=target['sketch_key']).status_code, 400)
+
+        upload = APIClient().put(target['upload_url'], self.sketch, content_type='image/jpeg')
+        self.assertEqual(upload.status_code, 200)
+        response = self.generate(sketch_key=target['sketch_key'])
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['session_id'], target['session_id'])
+        self.assertEqual(self.generate(sketch_key=target['sketch_key']).status_code, 400)
+
+        # Passed by key only, and the generator finds the preprocessed sketch there
+        [payload] = RecordingBackend.payloads
+        self.assertEqual(payload['sketch_key'], target['sketch_key'])
+        self.assertNotIn('image_data', payload)
+        stored = get_sketch_storage().read(target['sketch_key'])
+        self.assertEqual(stored, preprocess_upload(self.sketch).data)
+
+    @override_settings(SKETCH_MAX_UPLOAD_BYTES=1000)
+    def test_oversized_upload_is_only_read_up_to_the_limit(self):
+        sketch_key = f'{uuid.uuid4()}/sketch.jpg'
+        # Written straight to storage, as an upload that bypassed the size check would be
+        get_sketch_storage().write(sketch_key, b'x' * 5000)
+        with mock.patch.object(LocalStorage, 'read', autospec=True, side_effect=LocalStorage.read) as read:
+            response = self.generate(sketch_key=sketch_key)
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'image is too large'))
+        read.assert_called_once_with(mock.ANY, sketch_key, limit=1001)
+        self.assertEqual(len(get_sketch_storage().read(sketch_key, limit=1001)), 1001)
+
+    @override_settings(SKETCH_STORAGE_BACKEND='designs.storage.S3Storage')
+    @mock.patch('designs.storage.aws_client')
+    def test_s3_uploads_are_size_limited(self, aws_client):
+        s3_client = aws_client.return_value
+        s3_client.generate_presigned_post.return_value = {'url': 'https://bucket.s3/', 'fields': {'key': 'k', 'policy': 'p'}}
+        target = self.client.post('/api/generate/upload-url/').json()
+        self.assertEqual((target['method'], target['fields']), ('POST', {'key': 'k', 'policy': 'p'}))
+        conditions = s3_client.generate_presigned_post.call_args.kwargs['Conditions']
+        self.assertIn(['content-length-range', 1, 15 * 1024 * 1024], conditions)
+
+        get_sketch_storage().read('a/sketch.jpg', limit=1001)
+        s3_client.get_object.assert_called_once_with(Bucket=mock.ANY, Key='a/sketch.jpg', Range='bytes=0-1000')
+
+    def test_stored_files_are_served_at_their_url(self):
+        storage = get_sketch_storage()
+        storage.write('sess-1/step_1.jpg', self.sketch)
+        url = storage.url('sess-1/step_1.jpg')
+        self.assertEqual(url, '/media/sess-1/step_1.jpg')
+        response = self.client.get(url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/jpeg'))
+        self.assertEqual(b''.join(response.streaming_content), self.sketch)
+        self.assertEqual(self.client.get(storage.url('sess-1/missing.jpg')).status_code, 404)
+        self.assertIn(self.client.get('/media/../settings.py').status_code, (400, 404))
+        with override_settings(SKETCH_STORAGE_BACKEND='designs.storage.S3Storage'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_upload_url_is_signed(self):
+        target = self.client.post('/api/generate/upload-url/').json()
+        forged = target['upload_url'].replace('token=', 'token=x')
+        self.assertEqual(APIClient().put(forged, self.sketch, content_type='image/jpeg').status_code, 403)
+        for key in ['../escape/sketch.jpg', 'abc/sketch.jpg']:
+            self.assertEqual(self.generate(sketch_key=key).status_code, 400)
+
+
+@override_settings(GENERATION_BACKEND='designs.tests.CallbackBackend')
+class GenerationDedupeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='maker', user_id='maker', nickname='maker')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.image = encode_image(Image.new('RGB', (64, 64), 'white'))
+
+    def generate(self, client=None, **data):
+        return (client or self.client).post('/api/generate/', {
+            'image': self.image, 'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top', **data,
+        }, format='json')
+
+    def test_resubmission_reuses_the_job(self):
+        first = self.generate()
+        self.assertEqual(first.status_code, 202)
+        session_id = first.json()['job_id']
+        retry = self.generate()
+        self.assertEqual((retry.status_code, retry.json()['job_id']), (202, session_id))
+
+        complete_job(session_id, {'step_1': 'https://cdn/1.jpg'})
+        cache.clear()  # the job rows answer once the cache forgets
+        done = self.generate()
+        self.assertEqual((done.status_code, done.json()['job_id']), (200, session_id))
+        self.assertEqual(done.json()['step_1'], 'https://cdn/1.jpg')
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+    def test_different_parameters_or_users_generate_again(self):
+        session_id = self.generate().json()['job_id']
+        self.assertNotEqual(self.generate(style='formal').json()['job_id'], session_id)
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', user_id='other', nickname='other'))
+        self.assertNotEqual(self.generate(client=other).json()['job_id'], session_id)
+
+    def test_failed_and_expired_jobs_are_not_reused(self):
+        session_id = self.generate().json()['job_id']
+        fail_job(session_id, 'boom')
+        retry_id = self.generate().json()['job_id']
+        self.assertNotEqual(retry_id, session_id)
+
+        complete_job(retry_id, {})
+        with override_settings(GENERATION_DEDUPE_TTL=0):
+            self.assertNotEqual(self.generate().json()['job_id'], retry_id)
+
+    def test_concurrent_identical_requests_coalesce(self):
+        first = GenerationJob.objects.create(session_id='a', user=self.user, content_hash='f' * 64)
+        second = GenerationJob.objects.create(session_id='b', user=self.user, content_hash='f' * 64)
+        self.assertIsNone(claim(first))
+        self.assertEqual(claim(second), first)
+
+
+@override_settings(SKETCH_STORAGE_BACKEND='designs.storage.LocalStorage', IMAGE_DERIVATIVE_WIDTHS=[320, 640, 1080])
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(SKETCH_STORAGE_ROOT=root.name))
+        self.storage = get_sketch_storage()
+        output = BytesIO()
+        Image.new('RGB', (800, 600), 'navy').save(output, 'JPEG')
+        self.storage.write('sess/step_1.jpg', output.getvalue())
+        self.original = self.storage.url('sess/step_1.jpg')
+        designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.design = Design.objects.create(
+            user=designer, title='t', description='d', image_urls=[self.original, 'https://elsewhere.com/x.jpg']
+        )
+        self.client = APIClient()
+
+    def test_builds_variants_narrower_than_the_original(self):
+        self.assertTrue(build_design_derivatives(self.design.pk))
+        self.design.refresh_from_db()
+        entry, external = self.design.image_urls
+        self.assertEqual(external, 'https://elsewhere.com/x.jpg')
+        self.assertEqual(sorted(entry), ['320', '640', 'original'])
+        self.assertEqual(entry['320']['webp'], self.storage.url('sess/step_1_w320.webp'))
+        with Image.open(BytesIO(self.storage.read('sess/step_1_w640.jpg'))) as image:
+            self.assertEqual(image.size, (640, 480))
+        self.assertFalse(build_design_derivatives(self.design.pk))
+
+    def test_responses_pick_the_smallest_suitable_variant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            build_design_derivatives(self.design.pk)
+        url = f'/api/designs/{self.design.pk}/'
+        self.addCleanup(view_counts.flush)
+        self.assertEqual(self.client.get(url).json()['image_urls'][0], self.original)
+        self.assertEqual(
+            self.client.get(url, {'image_width': 300, 'image_format': 'webp'}).json()['image_urls'],
+            [self.storage.url('sess/step_1_w320.webp'), 'https://elsewhere.com/x.jpg'],
+        )
+        self.assertEqual(self.client.get(url, {'image_width': 2000}).json()['image_urls'][0], self.original)
+        card = self.client.get('/api/feed/', {'view': 'card'}).json()['results'][0]
+        self.assertEqual(card['image_urls'][0], self.storage.url('sess/step_1_w640.jpg'))
+
+    def test_saving_a_design_schedules_derivatives(self):
+        client = APIClient()
+        client.force_authenticate(self.design.user)
+        with mock.patch('designs.derivatives.get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.post('/api/designs/', {
+                    'title': 'new', 'description': 'd', 'image_urls': [self.original],
+                }, format='json')
+        self.assertEqual(response.status_code, 201)
+        get_executor.return_value.submit.assert_called_once()
+
+
+@override_settings(
+    GENERATION_BACKEND='designs.tests.RecordingBackend', GENERATION_BATCH_CONCURRENCY=2,
+    GENERATION_CALLBACK_SECRET='s3cret', SKETCH_STORAGE_BACKEND='designs.storage.LocalStorage',
+)
+class GenerationBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        RecordingBackend.payloads = []
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(SKETCH_STORAGE_ROOT=root.name))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='maker', user_id='maker', nickname='maker'))
+
+    def start(self, variants):
+        return self.client.post('/api/generate/batch/', {
+            'image': encode_image(Image.new('RGB', (64, 64), 'white')),
+            'category': 'adult_clothing', 'gender': 'unisex', 'type': 'top', 'variants': variants,
+        }, format='json')
+
+    def callback(self, data):
+        return self.client.post('/api/generation-callback/', data, format='json', HTTP_X_GENERATION_SECRET='s3cret')
+
+    def test_variants_run_within_the_concurrency_cap_and_report_partial_results(self):
+        response = self.start([{'style': 'casual'}, {'style': 'street'}, {'style': 'formal'}, {'style': 'casual'}])
+        self.assertEqual(response.status_code, 202)
+        batch = response.json()
+        self.assertEqual((batch['total'], batch['status']), (3, 'in_progress'))
+        self.assertEqual([v['parameters']['style'] for v in batch['variants']], ['casual', 'street', 'formal'])
+        first, second, third = [v['job_id'] for v in batch['variants']]
+        self.assertEqual([p['session_id'] for p in RecordingBackend.payloads], [first, second])
+        # The sketch is stored once, under the parent session
+        sketch_key = f"{batch['session_id']}/sketch.jpg"
+        self.assertEqual({p['sketch_key'] for p in RecordingBackend.payloads}, {sketch_key})
+        self.assertFalse(any('image_data' in p for p in RecordingBackend.payloads))
+        self.assertTrue(get_sketch_storage().read(sketch_key))
+
+        self.callback({'session_id': second, 'status': 'completed', 'step_1': 'https://cdn/street.jpg'})
+        self.assertEqual(RecordingBackend.payloads[-1]['session_id'], third)
+        batch = self.client.get(batch['status_url']).json()
+        self.assertEqual((batch['completed'], batch['status']), (1, 'in_progress'))
+        self.assertEqual(batch['variants'][1]['step_1'], 'https://cdn/street.jpg')
+        self.assertEqual(batch['variants'][0]['status'], 'pending')
+
+        self.callback({'session_id': first, 'status': 'failed', 'error': 'timeout'})
+        self.callback({'session_id': third, 'status': 'completed'})
+        batch = self.client.get(batch['status_url']).json()
+        self.assertEqual((batch['completed'], batch['failed'], batch['status']), (2, 1, 'completed'))
+        self.assertEqual(len(RecordingBackend.payloads), 3)
+
+    def test_rejects_invalid_variants(self):
+        self.assertEqual(self.start([]).status_code, 400)
+        self.assertEqual(self.start(['casual']).status_code, 400)
+        with override_settings(GENERATION_BATCH_MAX_VARIANTS=2):
+            self.assertEqual(self.start([{'style': s} for s in 'abc']).status_code, 400)
+        self.assertFalse(GenerationJob.objects.exists())
+        self.assertEqual(self.client.get('/api/generate/batch/missing/').status_code, 404)
@@ -0,0 +1,38 @@
+import math
+
+from django.conf import settings
+
+from fab_sketch_project.pagination import CreatedAtCursorPagination
+
+# Engagement weight per signal; a bookmark says more than a view
+DEFAULT_WEIGHTS = {
+    'like_count': 1.0,
+    'comment_count': 2.0,
+    'bookmark_count': 3.0,
+    'view_count': 0.05,
+}
+
+
+def hot_score(like_count, comment_count, bookmark_count, view_count, created_at):
+    """
+    Time-decayed popularity, stored in a form that never needs re-decaying.
+
+    Engagement halves in weight every ``TRENDING_HALF_LIFE_HOURS``. Ranking by
+    ``engagement * 2 ** (-age / half_life)`` orders designs exactly like
+    ``log2(engagement) + created_at / half_life``, which only changes when the
+    engagement does, so designs without new activity keep a valid score.
+    """
+    weights = getattr(settings, 'TRENDING_WEIGHTS', DEFAULT_WEIGHTS)
+    half_life = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    engagement = (
+        weights['like_count'] * like_count
+        + weights['comment_count'] * comment_count
+        + weights['bookmark_count'] * bookmark_count
+        + weights['view_count'] * view_count
+    )
+    return math.log2(1 + engagement) + created_at.timestamp() / half_life
+
+
+class TrendingCursorPagination(CreatedAtCursorPagination):
+    """Keyset pagination over the stored hot score, highest first"""
+    ordering = ('-hot_score', '-id')
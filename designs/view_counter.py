@@ -0,0 +1,141 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from .cache import bump_designs
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    In-process write-behind buffer for ``Design.view_count``.
+
+    Detail views add increments here instead of updating the row on every hit.
+    Pending increments are written back when the oldest one is older than
+    ``VIEW_COUNT_FLUSH_INTERVAL`` seconds (a background timer guarantees this
+    even without traffic) or when more than ``VIEW_COUNT_MAX_PENDING`` views
+    are buffered, whichever comes first. Designs that share the same delta are
+    updated together, so a flush costs one UPDATE per distinct delta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        # Deltas taken by a running flush, still counted until they are committed
+        self._flushing = {}
+        self._total = 0
+        self._oldest = None
+        self._timer = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+
+    def increment(self, design_id, amount=1):
+        """Buffer ``amount`` views and return the delta not yet written for ``design_id``"""
+        with self._lock:
+            self._pending[design_id] += amount
+            self._total += amount
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            delta = self._pending[design_id] + self._flushing.get(design_id, 0)
+            due = (
+                self.flush_interval <= 0
+                or self._total >= self.max_pending
+                or time.monotonic() - self._oldest >= self.flush_interval
+            )
+            if not due:
+                self._schedule()
+        if due:
+            self.flush()
+        return delta
+
+    def pending(self, design_id):
+        with self._lock:
+            return self._pending.get(design_id, 0) + self._flushing.get(design_id, 0)
+
+    def flush(self):
+        """Write buffered increments to the database; returns the number of designs updated"""
+        with self._lock:
+            if self._flushing:
+                # Another thread is writing; make sure what is left gets picked up
+                if self._pending:
+                    self._schedule()
+                return 0
+            if not self._pending:
+                return 0
+            batch = self._flushing = dict(self._pending)
+            self._pending.clear()
+            self._total = 0
+            self._oldest = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        from .models import Design
+
+        by_delta = defaultdict(list)
+        for design_id, delta in batch.items():
+            by_delta[delta].append(design_id)
+        try:
+            with transaction.atomic():
+                for delta, design_ids in sorted(by_delta.items()):
+                    Design.objects.filter(pk__in=sorted(design_ids)).update(
+                        view_count=F('view_count') + delta, last_activity_at=Now()
+                    )
+                bump_designs(*batch)
+        except Exception:
+            # Keep the increments for the next flush rather than dropping them
+            with self._lock:
+                for design_id, delta in batch.items():
+                    self._pending[design_id] += delta
+                    self._total += delta
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+                if self._pending:
+                    self._schedule()
+        return len(batch)
+
+    def _schedule(self):
+        if self._timer is None:
+            # At least a second apart so a failing database is not retried in a tight loop
+            self._timer = threading.Timer(max(self.flush_interval, 1), self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Failed to flush buffered view counts')
+        finally:
+            connection.close()
+
+
+view_counts = ViewCountBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counts.flush()
+    except Exception:
+        logger.exception('Failed to flush buffered view counts on exit')
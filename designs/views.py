@@ -1,42 +1,189 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from django.db.models import F
-from .models import Design
-from .serializers import DesignSerializer, DesignCreateSerializer
+from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Greatest
+from django.contrib.auth import get_user_model
+from fab_sketch_project.conditional import conditional_response, make_etag
+from .models import Design, DesignTag
+from .serializers import CARD_FIELDS, CARD_IMAGE_WIDTH, DesignSerializer, DesignCreateSerializer, requested_fields
+from .images import requested_image_size
+from .feed import RandomFeedPagination
+from .trending import TrendingCursorPagination
+from .tags import normalize_tag
+from .search import SearchPagination, search_designs
+from .view_counter import view_counts
+from .rendering import DESIGN_VALUES, render_row
+from .cache import bump_designs, bump_users, get_or_render
+from .derivatives import schedule_derivatives
+from social.models import Bookmark, Follow, Like
+from social.timeline import fan_out_design, following_designs
+
+User = get_user_model()
 
 class DesignViewSet(viewsets.ModelViewSet):
-    queryset = Design.objects.select_related('user').prefetch_related('likes', 'bookmarks', 'comments')
+    queryset = Design.objects.select_related('user')
     permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_value_regex = r'\d+'
+    batch_max_ids = 100
     
     def get_serializer_class(self):
         if self.action == 'create':
             return DesignCreateSerializer
         return DesignSerializer
     
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is DesignSerializer:
+            fields = requested_fields(self.request)
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('image_size', requested_image_size(
+                self.request, default_width=CARD_IMAGE_WIDTH if fields is CARD_FIELDS else None
+            ))
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_permissions(self):
+        if self.action == 'following':
+            return [IsAuthenticated()]
+        return super().get_permissions()
+    
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            design = serializer.save(user=self.request.user)
+            User.objects.filter(pk=self.request.user.pk).update(design_count=F('design_count') + 1)
+            bump_users(self.request.user.pk)
+            schedule_derivatives(design)
+        fan_out_design(design)
+    
+    def perform_update(self, serializer):
+        design = serializer.save()
+        bump_designs(design.pk)
+        schedule_derivatives(design)
+    
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            pk = instance.pk
+            instance.delete()
+            User.objects.filter(pk=instance.user_id).update(design_count=Greatest(F('design_count') - 1, 0))
+            bump_designs(pk)
+            bump_users(instance.user_id)
     
     def retrieve(self, request, *args, **kwargs):
-        # Increment view count
-        instance = self.get_object()
-        Design.objects.filter(pk=instance.pk).update(view_count=F('view_count') + 1)
-        instance.refresh_from_db()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        pk = int(kwargs['pk'])
+        serializer = self.get_serializer()
+        
+        def render_payload(missing):
+            instance = self.get_object()
+            return {instance.pk: (instance.user_id, serializer.shared_representation(instance))}
+        
+        def render():
+            data = serializer.with_viewer(get_or_render([pk], render_payload)[pk])
+            # Buffer the view; the response shows the cached count plus unflushed views
+            delta = view_counts.increment(pk)
+            if 'view_count' in data:
+                data['view_count'] += delta
+            return Response(data)
+        
+        validators = self.get_validators(pk)
+        if validators is None:
+            return render()
+        response = conditional_response(request, *validators, render)
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            view_counts.increment(pk)
+        return response
+    
+    def get_validators(self, pk):
+        """ETag and Last-Modified of a design detail from one indexed query, None if it does not exist"""
+        designs = Design.objects.filter(pk=pk)
+        fields = [
+            'updated_at', 'like_count', 'comment_count', 'bookmark_count',
+            'user__updated_at', 'user__follower_count', 'user__following_count', 'user__design_count',
+        ]
+        viewer = self.request.user
+        if viewer.is_authenticated:
+            designs = designs.annotate(
+                liked=Exists(Like.objects.filter(design_id=OuterRef('pk'), user_id=viewer.pk)),
+                bookmarked=Exists(Bookmark.objects.filter(design_id=OuterRef('pk'), user_id=viewer.pk)),
+                viewer_follows=Exists(Follow.objects.filter(followee_id=OuterRef('user_id'), follower_id=viewer.pk)),
+            )
+            fields += ['liked', 'bookmarked', 'viewer_follows']
+        row = designs.values_list(*fields).first()
+        if row is None:
+            return None
+        # view_count is left out: every request changes it, so it would never validate
+        return make_etag('design', pk, viewer.pk, *row), max(row[0], row[4])
     
     @action(detail=False, methods=['get'])
     def feed(self, request):
-        """Random feed for home page"""
-        designs = self.get_queryset().order_by('?')  # Random order
+        """Random feed for home page, stable per seed so pages never repeat"""
+        paginator = RandomFeedPagination()
+        page = paginator.paginate_queryset(self.get_queryset().values(*DESIGN_VALUES), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Designs for ?ids=1,2,3 in request order; unknown ids are listed in 'missing'. Views are not counted"""
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()))
+        except ValueError:
+            return Response({'error': 'ids must be comma separated design ids'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > self.batch_max_ids:
+            return Response({'error': f'ids parameter required (at most {self.batch_max_ids})'},
+                          status=status.HTTP_400_BAD_REQUEST)
+        
+        def render(missing):
+            rows = self.get_queryset().filter(pk__in=missing).values(*DESIGN_VALUES)
+            return {row['id']: (row['user_id'], render_row(row)) for row in rows}
+        
+        # Cached designs need no query; the rest are fetched together
+        payloads = get_or_render(ids, render)
+        found = [pk for pk in ids if pk in payloads]
+        serializer = self.get_serializer()
+        serializer.preload_viewer({pk: payloads[pk]['user']['id'] for pk in found})
+        return Response({
+            'results': [serializer.with_viewer(payloads[pk]) for pk in found],
+            'missing': [pk for pk in ids if pk not in payloads],
+        })
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Designs ranked by the time-decayed hot score, seeded on create and refreshed by update_trending"""
+        paginator = TrendingCursorPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def following(self, request):
+        """Designs from people the current user follows, newest first"""
+        designs = following_designs(request.user, self.get_queryset())
         page = self.paginate_queryset(designs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked full-text search over title, description, materials and hashtags"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q parameter required'},
+                          status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = self.get_serializer(designs, many=True)
-        return Response(serializer.data)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(search_designs(self.get_queryset(), query), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path=r'tags/(?P<name>[^/]+)')
+    def tagged(self, request, name=None):
+        """Designs carrying a hashtag, newest first"""
+        links = DesignTag.objects.filter(tag__name=normalize_tag(name)).select_related('design__user')
+        page = self.paginate_queryset(links)
+        serializer = self.get_serializer([link.design for link in page], many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def user_designs(self, request):
@@ -46,7 +193,7 @@ class DesignViewSet(viewsets.ModelViewSet):
             return Response({'error': 'user_id parameter required'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        designs = self.get_queryset().filter(user_id=user_id)
+        designs = self.get_queryset().filter(user_id=user_id).values(*DESIGN_VALUES)
         page = self.paginate_queryset(designs)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -0,0 +1,34 @@
+"""
+Shared boto3 clients.
+
+Clients are created on first use instead of at import time, so processes
+that never talk to AWS (management commands, tests, local runs with the fake
+or local backends) neither import boto3 nor build its clients. One client per service and region is
+shared by every thread of the process; boto3 clients are thread-safe and
+keep a pool of up to ``AWS_MAX_POOL_CONNECTIONS`` connections.
+"""
+import threading
+
+from django.conf import settings
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def aws_client(service, region_name):
+    key = (service, region_name)
+    client = _clients.get(key)
+    if client is None:
+        import boto3
+        from botocore.config import Config
+
+        # Creating clients is not thread-safe, and two threads would build two pools
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.session.Session().client(service, region_name=region_name, config=Config(
+                    max_pool_connections=getattr(settings, 'AWS_MAX_POOL_CONNECTIONS', 20),
+                    retries={'max_attempts': 3, 'mode': 'standard'},
+                ))
+                _clients[key] = client
+    return client
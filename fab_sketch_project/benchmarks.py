@@ -0,0 +1,43 @@
+"""
+Database and cache harnesses for the ``bench_*`` management commands.
+
+Benchmarks that only add rows of their own run inside ``rolled_back()``.
+Those that need whole tables to themselves, to measure at an exact table
+size, run in ``scratch_database()``: an empty, migrated database created
+the way the test runner creates one, so existing data is never touched.
+
+Both also swap the default cache for a private in-memory one. The deployed
+cache may be shared with running servers, and entries for rolled-back rows
+would outlive them under ids that real designs get later.
+"""
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test import override_settings
+
+PRIVATE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmarks',
+    }
+}
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in one transaction that is rolled back at the end"""
+    with override_settings(CACHES=PRIVATE_CACHES), transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def scratch_database():
+    """Point the default connection at a throwaway test database for the block"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(CACHES=PRIVATE_CACHES):
+            yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
@@ -0,0 +1,31 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag over the values a representation is derived from"""
+    return '"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    Answer ``If-None-Match`` with a 304 before ``render()`` runs.
+
+    ``etag`` must cover everything the response depends on, including the
+    viewer's own state. ``Last-Modified`` is sent for clients that want it,
+    but 304s are decided by the ETag alone; the timestamps cannot see every
+    change a counter or a follow makes.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+        if response.status_code != 200:
+            return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Responses carry per-viewer fields; let clients keep them, but only after revalidating
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Opaque cursor pagination over ``(created_at, id)``, newest first.
+
+    Each page is a range scan from the previous cursor position, so deep pages
+    cost the same as the first one. Every list endpoint uses it by default.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 50
@@ -85,6 +85,96 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'fab_sketch_project.pagination.CreatedAtCursorPagination',
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Serialized designs are cached per design/designer version (designs/cache.py).
+# Local memory is per process; point CACHE_BACKEND at a shared cache to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='fab-sketch'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+DESIGN_CACHE_TIMEOUT = config('DESIGN_CACHE_TIMEOUT', default=300, cast=int)
+
+# Design view counts are buffered in-process and written back in batches.
+# The stored count lags by at most FLUSH_INTERVAL seconds or MAX_PENDING views.
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=5, cast=float)
+VIEW_COUNT_MAX_PENDING = config('VIEW_COUNT_MAX_PENDING', default=1000, cast=int)
+
+# Following timeline: designers with more followers than this are read on demand
+# instead of being fanned out to every follower's inbox
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Recent designs copied into the inbox when following someone
+TIMELINE_BACKFILL_LIMIT = 100
+
+# Trending feed: engagement loses half its weight every TRENDING_HALF_LIFE_HOURS.
+# Scores are refreshed by running `manage.py update_trending` periodically (cron).
+TRENDING_HALF_LIFE_HOURS = 24
+
+# Design generation runs off the request thread. LambdaEventBackend invokes the
+# generator Lambda asynchronously; FakeBackend completes jobs locally after
+# GENERATION_FAKE_LATENCY seconds, for development and load tests without AWS.
+GENERATION_BACKEND = config('GENERATION_BACKEND', default='designs.generation_backends.LambdaEventBackend')
+GENERATION_FAKE_LATENCY = config('GENERATION_FAKE_LATENCY', default=2.0, cast=float)
+GENERATION_FAKE_WORKERS = config('GENERATION_FAKE_WORKERS', default=4, cast=int)
+
+# The generator reports job state to /api/generation-callback/ with this shared
+# secret; without it, status polls fall back to checking the step files in S3.
+GENERATION_CALLBACK_SECRET = config('GENERATION_CALLBACK_SECRET', default='')
+# Unfinished job statuses are cached this long; reported jobs are still checked
+# against S3 once they are older than GENERATION_STATUS_FALLBACK_AFTER seconds
+GENERATION_STATUS_CACHE_TIMEOUT = config('GENERATION_STATUS_CACHE_TIMEOUT', default=2, cast=int)
+GENERATION_STATUS_FALLBACK_AFTER = config('GENERATION_STATUS_FALLBACK_AFTER', default=120, cast=int)
+
+# Sketches are decoded, auto-oriented and downsized to SKETCH_MAX_DIMENSION on a
+# pool of SKETCH_PREPROCESS_WORKERS threads before they are sent to the generator
+SKETCH_MAX_DIMENSION = config('SKETCH_MAX_DIMENSION', default=1024, cast=int)
+SKETCH_JPEG_QUALITY = config('SKETCH_JPEG_QUALITY', default=90, cast=int)
+# Lambda rejects Event payloads over 256 KB; sketches are re-encoded smaller to fit
+GENERATION_MAX_PAYLOAD_BYTES = config('GENERATION_MAX_PAYLOAD_BYTES', default=256 * 1024, cast=int)
+SKETCH_MAX_UPLOAD_BYTES = config('SKETCH_MAX_UPLOAD_BYTES', default=15 * 1024 * 1024, cast=int)
+SKETCH_PREPROCESS_WORKERS = config('SKETCH_PREPROCESS_WORKERS', default=4, cast=int)
+SKETCH_PREPROCESS_TIMEOUT = config('SKETCH_PREPROCESS_TIMEOUT', default=10, cast=float)
+
+# Sketch uploads: designs.storage.S3Storage (the media bucket) or LocalStorage,
+# which keeps files under SKETCH_STORAGE_ROOT and accepts uploads at /api/uploads/
+SKETCH_STORAGE_BACKEND = config('SKETCH_STORAGE_BACKEND', default='designs.storage.S3Storage')
+SKETCH_STORAGE_ROOT = config('SKETCH_STORAGE_ROOT', default=os.path.join(BASE_DIR, 'media'))
+# Where LocalStorage files are served from (fab_sketch_project/urls.py)
+SKETCH_STORAGE_URL = config('SKETCH_STORAGE_URL', default='/media/')
+SKETCH_UPLOAD_URL_EXPIRES = config('SKETCH_UPLOAD_URL_EXPIRES', default=600, cast=int)
+
+# Resubmitting the same sketch and parameters reuses the user's completed job for
+# GENERATION_DEDUPE_TTL seconds, or joins the running one unless it is older than
+# GENERATION_INFLIGHT_TIMEOUT seconds
+GENERATION_DEDUPE_TTL = config('GENERATION_DEDUPE_TTL', default=24 * 60 * 60, cast=int)
+GENERATION_INFLIGHT_TIMEOUT = config('GENERATION_INFLIGHT_TIMEOUT', default=600, cast=int)
+
+# Resized JPEG/WebP copies of design images at these widths are built in the
+# background by IMAGE_DERIVATIVE_WORKERS threads (`manage.py build_derivatives` backfills)
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1080]
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+
+# /api/generate/batch/ runs up to GENERATION_BATCH_MAX_VARIANTS variants of one
+# sketch, at most GENERATION_BATCH_CONCURRENCY of them with the generator at once
+GENERATION_BATCH_MAX_VARIANTS = config('GENERATION_BATCH_MAX_VARIANTS', default=8, cast=int)
+GENERATION_BATCH_CONCURRENCY = config('GENERATION_BATCH_CONCURRENCY', default=3, cast=int)
+
+# AWS resources; clients are created on first use (fab_sketch_project/aws.py)
+AWS_STORAGE_BUCKET_NAME = config('AWS_STORAGE_BUCKET_NAME', default='fab-sketch-media-xp8zu198')
+AWS_S3_REGION_NAME = config('AWS_S3_REGION_NAME', default='ap-northeast-2')
+LAMBDA_FUNCTION_NAME = config('LAMBDA_FUNCTION_NAME', default='fabsketch-gen')
+LAMBDA_REGION = config('LAMBDA_REGION', default='ap-northeast-2')
+AWS_MAX_POOL_CONNECTIONS = config('AWS_MAX_POOL_CONNECTIONS', default=20, cast=int)
+
+# GET /api/generation-status/<session_id>/events/ streams status changes (SSE) for up to
+# GENERATION_EVENTS_TIMEOUT seconds; changes made in another server process are
+# picked up within GENERATION_EVENTS_POLL_INTERVAL seconds
+GENERATION_EVENTS_POLL_INTERVAL = config('GENERATION_EVENTS_POLL_INTERVAL', default=5, cast=float)
+GENERATION_EVENTS_TIMEOUT = config('GENERATION_EVENTS_TIMEOUT', default=600, cast=int)
@@ -0,0 +1,36 @@
+from django.http import StreamingHttpResponse
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """
+    Writes a JSON array item by item instead of building the whole body.
+
+    Items are encoded with the same encoder and options as ``JSONRenderer``,
+    so the bytes match a regular response; feed it a ``.iterator()`` and
+    memory stays bounded by ``buffer_size`` no matter how many rows there are.
+    """
+    buffer_size = 64 * 1024
+
+    def stream(self, items):
+        dumps = self.encoder_class(
+            ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict,
+            separators=SHORT_SEPARATORS if self.compact else LONG_SEPARATORS,
+        ).encode
+        buffer = bytearray(b'[')
+        separator = b''
+        for item in items:
+            buffer += separator
+            # Same escaping of the two JavaScript line terminators as JSONRenderer.render
+            buffer += dumps(item).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+            separator = b','
+            if len(buffer) >= self.buffer_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']'
+        yield bytes(buffer)
+
+    def response(self, items, status=200):
+        return StreamingHttpResponse(self.stream(items), status=status, content_type=self.media_type)
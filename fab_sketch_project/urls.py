@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
@@ -30,24 +31,39 @@ urlpatterns = [
     
     # Design generation endpoints
     path('api/generate/', generation_views.generate_design, name='generate_design'),
+    path('api/generate/upload-url/', generation_views.sketch_upload_url, name='sketch_upload_url'),
+    path('api/generate/batch/', generation_views.generate_batch, name='generate_batch'),
+    path('api/generate/batch/<str:session_id>/', generation_views.get_batch_status, name='generation_batch_status'),
+    path('api/uploads/', generation_views.local_sketch_upload, name='sketch_upload'),
     path('api/save-design/', generation_views.save_design_to_feed, name='save_design_to_feed'),
     path('api/generation-status/<str:session_id>/', generation_views.get_generation_status, name='generation_status'),
+    path('api/generation-status/<str:session_id>/events/', generation_views.generation_status_events, name='generation_events'),
+    path('api/generation-callback/', generation_views.generation_callback, name='generation_callback'),
     
     # PRD-compatible endpoints
     path('api/feed/', DesignViewSet.as_view({'get': 'feed'}), name='feed'),
+    path('api/feed/trending/', DesignViewSet.as_view({'get': 'trending'}), name='trending_feed'),
+    path('api/feed/following/', DesignViewSet.as_view({'get': 'following'}), name='following_feed'),
     path('api/design/<int:pk>/', DesignViewSet.as_view({'get': 'retrieve'}), name='design_detail'),
     path('api/design/', DesignViewSet.as_view({'post': 'create'}), name='design_create'),
+    path('api/search/', DesignViewSet.as_view({'get': 'search'}), name='design_search'),
+    path('api/tag/<str:name>/', DesignViewSet.as_view({'get': 'tagged'}), name='tag_designs'),
     path('api/user/<int:pk>/', UserViewSet.as_view({'get': 'profile', 'put': 'update'}), name='user_profile'),
     
     # Social endpoints (simple toggle)
     path('api/like/<int:design_id>/', LikeViewSet.as_view({'post': 'toggle'}), name='toggle_like'),
-    path('api/bookmark/<int:design_id>/', BookmarkViewSet.as_view({'post': 'toggle'}), name='toggle_bookmark'),
+    # POST toggles a bookmark on design <pk>, GET lists the bookmarks of user <pk>
+    path('api/bookmark/<int:pk>/', BookmarkViewSet.as_view({'post': 'toggle', 'get': 'user_bookmarks'}), name='bookmark'),
     path('api/follow/<int:user_id>/', FollowViewSet.as_view({'post': 'toggle'}), name='toggle_follow'),
     
     # Comment endpoints
     path('api/comment/<int:design_id>/', CommentViewSet.as_view({'get': 'list', 'post': 'create'}), name='design_comments'),
     path('api/comment/<int:pk>/', CommentViewSet.as_view({'put': 'update', 'delete': 'destroy'}), name='comment_detail'),
-    
-    # User content endpoints
-    path('api/bookmark/<int:user_id>/', BookmarkViewSet.as_view({'get': 'user_bookmarks'}), name='user_bookmarks'),
 ]
+
+# LocalStorage sketches, generated steps and derivatives (404 with other storages)
+sketch_storage_url = getattr(settings, 'SKETCH_STORAGE_URL', '/media/')
+if sketch_storage_url.startswith('/'):
+    urlpatterns.append(
+        path(f"{sketch_storage_url.lstrip('/')}<path:key>", generation_views.local_sketch_file, name='sketch_file')
+    )
@@ -0,0 +1,74 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from designs.models import Design
+from fab_sketch_project.benchmarks import rolled_back
+from social.models import Follow, TimelineEntry
+from social.timeline import fan_out_design, following_designs
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure fan-out-on-write cost and push vs pull read cost of the following timeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', default='100,1000,10000',
+                            help='Comma separated follower counts to benchmark')
+        parser.add_argument('--designs', type=int, default=50,
+                            help='Designs already in the timeline when measuring reads')
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        counts = [int(count) for count in options['followers'].split(',')]
+        self.page_size = options['page_size']
+
+        self.stdout.write(f"{'followers':>10} {'fan-out':>10} {'rows/s':>10} {'read push':>10} {'read pull':>10}")
+        with rolled_back():
+            for count in counts:
+                designer, followers = self.create_audience(count)
+                for i in range(options['designs']):
+                    fan_out_design(Design.objects.create(user=designer, title=f'bench {i}', description='bench'))
+
+                design = Design.objects.create(user=designer, title='bench', description='bench')
+                with override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=count):
+                    start = time.perf_counter()
+                    written = fan_out_design(design)
+                    fanout = time.perf_counter() - start
+
+                reader = followers[0]
+                push = self.time_read(reader, limit=count)
+                TimelineEntry.objects.filter(author=designer).delete()
+                pull = self.time_read(reader, limit=0)
+
+                self.stdout.write(
+                    f'{count:>10} {fanout * 1000:>8.1f}ms {written / fanout:>10.0f} '
+                    f'{push:>8.2f}ms {pull:>8.2f}ms'
+                )
+
+    def create_audience(self, count):
+        designer = User.objects.create(
+            username=f'bench_designer_{count}', user_id=f'bench_designer_{count}',
+            nickname='bench', follower_count=count,
+        )
+        followers = User.objects.bulk_create([
+            User(username=f'bench_{count}_{i}', user_id=f'bench_{count}_{i}', nickname='bench', password='!')
+            for i in range(count)
+        ], batch_size=1000)
+        Follow.objects.bulk_create([
+            Follow(follower=follower, followee=designer) for follower in followers
+        ], batch_size=1000)
+        return designer, followers
+
+    def time_read(self, user, limit, repeat=5):
+        samples = []
+        with override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=limit):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(following_designs(user, Design.objects.select_related('user'))
+                     .order_by('-created_at', '-id')[:self.page_size])
+                samples.append((time.perf_counter() - start) * 1000)
+        return min(samples)
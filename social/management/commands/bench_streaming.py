@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from designs.models import Design
+from fab_sketch_project.benchmarks import rolled_back
+from fab_sketch_project.streaming import StreamingJSONRenderer
+from social.models import Bookmark
+from social.views import BOOKMARK_VALUES, bookmark_item
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare peak memory of a buffered vs streamed full bookmark list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated bookmark counts to benchmark')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        self.chunk_size = options['chunk_size']
+
+        self.stdout.write(f"{'bookmarks':>10} {'buffered':>12} {'streamed':>12} {'bytes':>12}")
+        with rolled_back():
+            reader = User.objects.create(username='bench_reader', user_id='bench_reader', nickname='reader')
+            designer = User.objects.create(username='bench_designer', user_id='bench_designer', nickname='designer')
+            created = 0
+            for size in sizes:
+                created = self.fill(reader, designer, created, size)
+                bookmarks = Bookmark.objects.filter(user=reader).values(*BOOKMARK_VALUES).order_by('-created_at', '-id')
+                buffered, body_size, buffered_s = self.measure(lambda: self.buffered(bookmarks))
+                streamed, _, streamed_s = self.measure(lambda: self.streamed(bookmarks))
+                self.stdout.write(
+                    f'{size:>10} {buffered / 2**20:>8.1f} MiB {streamed / 2**20:>8.1f} MiB {body_size:>12}'
+                    f'   ({buffered_s:.2f}s vs {streamed_s:.2f}s)'
+                )
+
+    def fill(self, reader, designer, created, size, batch_size=5000):
+        while created < size:
+            count = min(batch_size, size - created)
+            designs = Design.objects.bulk_create([
+                Design(user=designer, title=f'bench design {created + i}', description='bench ' * 10,
+                       image_urls=[f'https://example.com/{created + i}.jpg'])
+                for i in range(count)
+            ])
+            Bookmark.objects.bulk_create([Bookmark(user=reader, design=design) for design in designs])
+            created += count
+        return created
+
+    def buffered(self, bookmarks):
+        # What a non-streaming response does: every item, then the whole body
+        return len(JSONRenderer().render([bookmark_item(row) for row in bookmarks]))
+
+    def streamed(self, bookmarks):
+        rows = bookmarks.iterator(chunk_size=self.chunk_size)
+        return sum(len(chunk) for chunk in StreamingJSONRenderer().stream(bookmark_item(row) for row in rows))
+
+    def measure(self, func):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak, result, time.perf_counter() - start
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0004_remove_design_designs_des_user_id_84d3bd_idx_and_more'),
+        ('social', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookmark',
+            name='social_book_user_id_7d6158_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='social_book_user_id_5ea28d_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 08:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('designs', '0004_remove_design_designs_des_user_id_84d3bd_idx_and_more'),
+        ('social', '0003_remove_bookmark_social_book_user_id_7d6158_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('design', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='designs.design')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at'], name='social_time_user_id_fd42b5_idx'), models.Index(fields=['user', 'author'], name='social_time_user_id_f74b3a_idx')],
+                'unique_together': {('user', 'design')},
+            },
+        ),
+    ]
@@ -25,7 +25,7 @@ class Bookmark(models.Model):
     class Meta:
         unique_together = ('design', 'user')
         indexes = [
-            models.Index(fields=['user_id']),
+            models.Index(fields=['user', '-created_at', '-id']),
             models.Index(fields=['-created_at']),
         ]
     
@@ -52,3 +52,21 @@ class Follow(models.Model):
     
     def __str__(self):
         return f"{self.follower.nickname} follows {self.followee.nickname}"
+
+class TimelineEntry(models.Model):
+    """Fan-out-on-write inbox row: ``design`` shows up in ``user``'s following feed"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    design = models.ForeignKey('designs.Design', on_delete=models.CASCADE, related_name='timeline_entries')
+    # Denormalized from the design so unfollows can prune without a join
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ('user', 'design')
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['user', 'author']),
+        ]
+    
+    def __str__(self):
+        return f"{self.design_id} in {self.user_id}'s timeline"
@@ -1,3 +1,103 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from designs.models import Design
+from fab_sketch_project.streaming import StreamingJSONRenderer
+from .models import Bookmark, TimelineEntry
+from .timeline import fan_out_design
+
+User = get_user_model()
+
+
+class StreamingBookmarksTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='reader', user_id='reader', nickname='reader')
+        self.client.force_authenticate(self.user)
+        designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        for i in range(5):
+            design = Design.objects.create(
+                user=designer, title=f'디자인 {i}\u2028', description='desc', image_urls=[f'{i}.jpg']
+            )
+            Bookmark.objects.create(user=self.user, design=design)
+
+    def test_stream_matches_paginated_list(self):
+        url = f'/api/bookmark/{self.user.pk}/'
+        paginated = self.client.get(url, {'page_size': 50}).json()['results']
+        response = self.client.get(url, {'stream': 1})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body, JSONRenderer().render(paginated))
+
+    def test_stream_chunks(self):
+        renderer = StreamingJSONRenderer()
+        renderer.buffer_size = 16
+        items = [{'n': i, 'text': 'x' * 10} for i in range(20)]
+        chunks = list(renderer.stream(iter(items)))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b''.join(chunks), JSONRenderer().render(items))
+        self.assertEqual(b''.join(renderer.stream([])), b'[]')
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class FollowingTimelineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.designer = User.objects.create_user(username='designer', user_id='designer', nickname='designer')
+        self.first = User.objects.create_user(username='first', user_id='first', nickname='first')
+        self.second = User.objects.create_user(username='second', user_id='second', nickname='second')
+
+    def toggle_follow(self, follower):
+        client = APIClient()
+        client.force_authenticate(follower)
+        return client.post(f'/api/follow/{self.designer.pk}/')
+
+    def post(self, title):
+        design = Design.objects.create(user=User.objects.get(pk=self.designer.pk), title=title, description='desc')
+        return design, fan_out_design(design)
+
+    def timeline(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return [item['title'] for item in client.get('/api/feed/following/').json()['results']]
+
+    def test_designs_below_the_limit_are_fanned_out(self):
+        self.toggle_follow(self.first)
+        design, written = self.post('pushed')
+        self.assertEqual(written, 1)
+        self.assertTrue(Design.objects.get(pk=design.pk).fanned_out)
+        self.assertEqual(list(TimelineEntry.objects.values_list('user_id', flat=True)), [self.first.pk])
+        self.assertEqual(self.timeline(self.first), ['pushed'])
+        self.assertEqual(self.timeline(self.second), [])
+
+    def test_designs_above_the_limit_are_pulled(self):
+        self.toggle_follow(self.first)
+        self.toggle_follow(self.second)
+        design, written = self.post('pulled')
+        self.assertEqual(written, 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.timeline(self.first), ['pulled'])
+        self.assertEqual(self.timeline(self.second), ['pulled'])
+
+    def test_nothing_is_lost_when_the_designer_drops_below_the_limit(self):
+        self.toggle_follow(self.first)
+        self.post('before')
+        # The second follower lifts the designer over the limit
+        self.toggle_follow(self.second)
+        self.post('above')
+        self.toggle_follow(self.first)
+        self.post('after')
+        self.assertEqual(self.timeline(self.second), ['after', 'above', 'before'])
+        self.assertEqual(self.timeline(self.first), [])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.post('old')
+        self.toggle_follow(self.first)
+        self.assertEqual(self.timeline(self.first), ['old'])
+        self.toggle_follow(self.first)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.timeline(self.first), [])
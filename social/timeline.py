@@ -0,0 +1,94 @@
+"""
+Following timeline with hybrid fan-out.
+
+Designs from regular designers are pushed into each follower's inbox
+(``TimelineEntry``) when they are created. Designers with more than
+``TIMELINE_FANOUT_MAX_FOLLOWERS`` followers are skipped on write; their
+designs are pulled at read time instead, so one post never turns into
+millions of inserts.
+
+``Design.fanned_out`` records which designs reached the inboxes. The rest
+are always pulled, so designs posted while a designer was above the limit
+stay in the feed after they drop back below it.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from designs.models import Design
+from .models import Follow, TimelineEntry
+
+User = get_user_model()
+
+
+def fanout_limit():
+    return getattr(settings, 'TIMELINE_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def batch_size():
+    return getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', 1000)
+
+
+def is_fanned_out(user):
+    """Whether designs by ``user`` are pushed to followers' inboxes"""
+    return user.follower_count <= fanout_limit()
+
+
+def fan_out_design(design):
+    """Insert ``design`` into every follower's inbox; returns the number of rows written"""
+    if not is_fanned_out(design.user):
+        return 0
+
+    follower_ids = Follow.objects.filter(followee_id=design.user_id).values_list(
+        'follower_id', flat=True
+    ).iterator(chunk_size=batch_size())
+    written = 0
+    entries = []
+    for follower_id in follower_ids:
+        entries.append(TimelineEntry(
+            user_id=follower_id, design_id=design.pk,
+            author_id=design.user_id, created_at=design.created_at,
+        ))
+        if len(entries) >= batch_size():
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            written += len(entries)
+            entries = []
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+        written += len(entries)
+    Design.objects.filter(pk=design.pk).update(fanned_out=True)
+    design.fanned_out = True
+    return written
+
+
+def backfill_followee(follower, followee):
+    """
+    Copy the followee's recent fanned-out designs into a new follower's inbox;
+    the others are pulled anyway. Done whatever the followee's follower count,
+    so nothing is missing if they later drop below the fan-out limit.
+    """
+    limit = getattr(settings, 'TIMELINE_BACKFILL_LIMIT', 100)
+    designs = followee.designs.filter(fanned_out=True).order_by('-created_at').values_list('pk', 'created_at')[:limit]
+    entries = [
+        TimelineEntry(user_id=follower.pk, design_id=pk, author_id=followee.pk, created_at=created_at)
+        for pk, created_at in designs
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    return len(entries)
+
+
+def prune_followee(follower, followee):
+    """Drop an unfollowed designer's designs from the follower's inbox"""
+    deleted, _ = TimelineEntry.objects.filter(user_id=follower.pk, author_id=followee.pk).delete()
+    return deleted
+
+
+def following_designs(user, queryset):
+    """Restrict a Design queryset to the user's following timeline"""
+    inbox = TimelineEntry.objects.filter(user_id=user.pk).values('design_id')
+    follows = Follow.objects.filter(follower_id=user.pk)
+    # Designers above the fan-out limit are read on demand
+    pulled = follows.filter(followee__follower_count__gt=fanout_limit()).values('followee_id')
+    # As are designs that never reached the inboxes (designs_not_fanned_out_idx)
+    missed = Q(fanned_out=False, user_id__in=follows.values('followee_id'))
+    return queryset.filter(Q(pk__in=inbox) | Q(user_id__in=pulled) | missed)
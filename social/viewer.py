@@ -0,0 +1,80 @@
+from .models import Like, Bookmark, Follow
+
+
+class ViewerContext:
+    """
+    What the requesting user has liked, bookmarked and followed.
+
+    Serializers ask this object instead of running an ``exists()`` per row.
+    List serializers call ``load()`` with every id on the page first, so the
+    whole response costs at most three set-based queries; ids that were not
+    preloaded are fetched on demand.
+    """
+
+    def __init__(self, user=None):
+        self.user_id = user.pk if user is not None and user.is_authenticated else None
+        self.liked = set()
+        self.bookmarked = set()
+        self.followed = set()
+        self._loaded_likes = set()
+        self._loaded_bookmarks = set()
+        self._loaded_users = set()
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    def load(self, design_ids=(), user_ids=(), likes=True, bookmarks=True):
+        """Preload state for these ids; ``likes``/``bookmarks`` skip a query the caller does not need"""
+        if not self.is_authenticated:
+            return self
+
+        if likes:
+            self._load_designs(Like, design_ids, self.liked, self._loaded_likes)
+        if bookmarks:
+            self._load_designs(Bookmark, design_ids, self.bookmarked, self._loaded_bookmarks)
+
+        user_ids = set(user_ids) - self._loaded_users - {self.user_id}
+        if user_ids:
+            self.followed.update(Follow.objects.filter(
+                follower_id=self.user_id, followee_id__in=user_ids
+            ).values_list('followee_id', flat=True))
+            self._loaded_users.update(user_ids)
+        return self
+
+    def _load_designs(self, model, design_ids, found, loaded):
+        design_ids = set(design_ids) - loaded
+        if design_ids:
+            found.update(model.objects.filter(
+                user_id=self.user_id, design_id__in=design_ids
+            ).values_list('design_id', flat=True))
+            loaded.update(design_ids)
+
+    def is_self(self, user_id):
+        return self.is_authenticated and user_id == self.user_id
+
+    def is_liked(self, design_id):
+        self.load(design_ids=[design_id], bookmarks=False)
+        return design_id in self.liked
+
+    def is_bookmarked(self, design_id):
+        self.load(design_ids=[design_id], likes=False)
+        return design_id in self.bookmarked
+
+    def is_following(self, user_id):
+        if not self.is_authenticated or user_id == self.user_id:
+            return False
+        self.load(user_ids=[user_id])
+        return user_id in self.followed
+
+
+def get_viewer(context):
+    """Return the ViewerContext shared by every serializer of the current request"""
+    request = context.get('request')
+    if request is None:
+        return ViewerContext()
+    viewer = getattr(request, 'viewer_context', None)
+    if viewer is None:
+        viewer = ViewerContext(request.user)
+        request.viewer_context = viewer
+    return viewer
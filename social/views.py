@@ -4,12 +4,36 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
 from .models import Like, Bookmark, Follow
 from .serializers import LikeSerializer, BookmarkSerializer, FollowSerializer
+from .timeline import backfill_followee, prune_followee
+from designs.cache import bump_designs, bump_users
+from designs.images import image_urls, requested_image_size
 from designs.models import Design
+from fab_sketch_project.streaming import StreamingJSONRenderer
 
 User = get_user_model()
 
+BOOKMARK_VALUES = [
+    'id', 'created_at', 'design_id', 'design__title', 'design__description',
+    'design__image_urls', 'design__user__user_id', 'design__created_at',
+]
+
+def bookmark_item(row, image_size=(None, 'jpeg')):
+    """Design data with bookmark info, from a BOOKMARK_VALUES row"""
+    return {
+        'id': row['design_id'],
+        'title': row['design__title'],
+        'description': row['design__description'],
+        'image_urls': image_urls(row['design__image_urls'], *image_size),
+        'user_id': row['design__user__user_id'],
+        'created_at': row['design__created_at'],
+        'bookmarked_at': row['created_at'],
+    }
+
 class LikeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = LikeSerializer
@@ -20,14 +44,25 @@ class LikeViewSet(viewsets.ModelViewSet):
     def toggle(self, request, design_id=None):
         """Toggle like for a design (URL parameter)"""
         design = get_object_or_404(Design, id=design_id)
-        like, created = Like.objects.get_or_create(
-            design=design, 
-            user=request.user
-        )
-        
-        if not created:
-            like.delete()
-            return Response({'liked': False, 'message': 'Like removed'})
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(
+                design=design, 
+                user=request.user
+            )
+            
+            if not created:
+                deleted, _ = Like.objects.filter(pk=like.pk).delete()
+                if deleted:
+                    Design.objects.filter(pk=design.pk).update(
+                        like_count=Greatest(F('like_count') - 1, 0), last_activity_at=Now()
+                    )
+                    bump_designs(design.pk)
+                return Response({'liked': False, 'message': 'Like removed'})
+            
+            Design.objects.filter(pk=design.pk).update(
+                like_count=F('like_count') + 1, last_activity_at=Now()
+            )
+            bump_designs(design.pk)
         
         return Response({'liked': True, 'message': 'Like added'})
 
@@ -38,40 +73,44 @@ class BookmarkViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return Bookmark.objects.filter(user=self.request.user).select_related('design')
     
-    def toggle(self, request, design_id=None):
-        """Toggle bookmark for a design (URL parameter)"""
-        design = get_object_or_404(Design, id=design_id)
-        bookmark, created = Bookmark.objects.get_or_create(
-            design=design, 
-            user=request.user
-        )
-        
-        if not created:
-            bookmark.delete()
-            return Response({'bookmarked': False, 'message': 'Bookmark removed'})
+    def toggle(self, request, pk=None):
+        """Toggle bookmark for a design (URL parameter is the design id)"""
+        design = get_object_or_404(Design, id=pk)
+        with transaction.atomic():
+            bookmark, created = Bookmark.objects.get_or_create(
+                design=design, 
+                user=request.user
+            )
+            
+            if not created:
+                deleted, _ = Bookmark.objects.filter(pk=bookmark.pk).delete()
+                if deleted:
+                    Design.objects.filter(pk=design.pk).update(
+                        bookmark_count=Greatest(F('bookmark_count') - 1, 0), last_activity_at=Now()
+                    )
+                    bump_designs(design.pk)
+                return Response({'bookmarked': False, 'message': 'Bookmark removed'})
+            
+            Design.objects.filter(pk=design.pk).update(
+                bookmark_count=F('bookmark_count') + 1, last_activity_at=Now()
+            )
+            bump_designs(design.pk)
         
         return Response({'bookmarked': True, 'message': 'Bookmark added'})
     
-    def user_bookmarks(self, request, user_id=None):
-        """Get user's bookmarked designs"""
-        user = get_object_or_404(User, id=user_id) if user_id else request.user
-        bookmarks = Bookmark.objects.filter(user=user).select_related('design', 'design__user')
+    def user_bookmarks(self, request, pk=None):
+        """Get user's bookmarked designs (URL parameter is the user id), newest bookmark first"""
+        user = get_object_or_404(User, id=pk) if pk else request.user
+        bookmarks = Bookmark.objects.filter(user=user).values(*BOOKMARK_VALUES)
+        image_size = requested_image_size(request)
         
-        # Return design data with bookmark info
-        designs = []
-        for bookmark in bookmarks:
-            design_data = {
-                'id': bookmark.design.id,
-                'title': bookmark.design.title,
-                'description': bookmark.design.description,
-                'image_urls': bookmark.design.image_urls,
-                'user_id': bookmark.design.user.user_id,
-                'created_at': bookmark.design.created_at,
-                'bookmarked_at': bookmark.created_at,
-            }
-            designs.append(design_data)
+        # ?stream returns every bookmark in one response, written as it is read
+        if 'stream' in request.query_params:
+            rows = bookmarks.order_by('-created_at', '-id').iterator(chunk_size=2000)
+            return StreamingJSONRenderer().response(bookmark_item(row, image_size) for row in rows)
         
-        return Response(designs)
+        page = self.paginate_queryset(bookmarks)
+        return self.get_paginated_response([bookmark_item(row, image_size) for row in page])
 
 class FollowViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -87,13 +126,24 @@ class FollowViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Cannot follow yourself'}, 
                           status=status.HTTP_400_BAD_REQUEST)
         
-        follow, created = Follow.objects.get_or_create(
-            follower=request.user, 
-            followee=followee
-        )
-        
-        if not created:
-            follow.delete()
-            return Response({'following': False, 'message': 'Unfollowed'})
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                follower=request.user, 
+                followee=followee
+            )
+            
+            if not created:
+                deleted, _ = Follow.objects.filter(pk=follow.pk).delete()
+                if deleted:
+                    User.objects.filter(pk=followee.pk).update(follower_count=Greatest(F('follower_count') - 1, 0))
+                    User.objects.filter(pk=request.user.pk).update(following_count=Greatest(F('following_count') - 1, 0))
+                    prune_followee(request.user, followee)
+                    bump_users(followee.pk, request.user.pk)
+                return Response({'following': False, 'message': 'Unfollowed'})
+            
+            User.objects.filter(pk=followee.pk).update(follower_count=F('follower_count') + 1)
+            User.objects.filter(pk=request.user.pk).update(following_count=F('following_count') + 1)
+            backfill_followee(request.user, followee)
+            bump_users(followee.pk, request.user.pk)
         
         return Response({'following': True, 'message': 'Following'})
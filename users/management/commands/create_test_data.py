@@ -1,3 +1,4 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from designs.models import Design
@@ -29,6 +30,9 @@ class Command(BaseCommand):
         self.create_social_interactions(users, designs)
         self.stdout.write('Created social interactions')
         
+        # Fixtures bypass the views, so recompute the denormalized counters
+        call_command('repair_counters', stdout=self.stdout)
+        
         self.stdout.write(self.style.SUCCESS('Test data created successfully!'))
 
     def create_users(self):
@@ -45,6 +49,7 @@ class Command(BaseCommand):
             user, created = User.objects.get_or_create(
                 username=data['username'],
                 defaults={
+                    'user_id': data['username'],
                     'nickname': data['nickname'],
                     'bio': data['bio'],
                     'profile_image': f'https://picsum.photos/200/200?random={random.randint(1, 100)}'
@@ -98,11 +103,11 @@ class Command(BaseCommand):
                 defaults={
                     'user': users[i % len(users[:4])],  # Only designers create designs
                     'description': data['description'],
-                    'hashtags': data['hashtags'],
+                    'hashtags': ' '.join(f'#{tag}' for tag in data['hashtags']),
                     'materials': data['materials'],
                     'sketch_url': f'https://picsum.photos/400/600?random={i+10}',
-                    'flat_url': f'https://picsum.photos/400/600?random={i+20}',
-                    'wearing_url': f'https://picsum.photos/400/600?random={i+30}',
+                    'tech_flat_url': f'https://picsum.photos/400/600?random={i+20}',
+                    'try_on_url': f'https://picsum.photos/400/600?random={i+30}',
                     'view_count': random.randint(10, 500)
                 }
             )
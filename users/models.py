@@ -11,22 +11,21 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    def __str__(self):
-        return f"{self.nickname} ({self.user_id})"
-    
-    @property
-    def design_count(self):
-        return self.designs.count()
+    # Denormalized counters, updated with F() expressions by the follow/design views
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    design_count = models.PositiveIntegerField(default=0)
     
-    @property
-    def follower_count(self):
-        return self.followers.count()
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
-    @property
-    def following_count(self):
-        return self.following.count()
+    def __str__(self):
+        return f"{self.nickname} ({self.user_id})"
     
-    def format_count(self, count):
+    @staticmethod
+    def format_count(count):
         """Format count as 1.2K, 500M etc."""
         if count >= 1000000:
             return f'{count / 1000000:.1f}M'
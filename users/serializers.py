@@ -1,8 +1,18 @@
+from django.db import models
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from social.viewer import get_viewer
 
 User = get_user_model()
 
+class UserListSerializer(serializers.ListSerializer):
+    """Loads the viewer's follow state for every listed user in one query"""
+    
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        get_viewer(self.context).load(user_ids=[user.pk for user in users])
+        return super().to_representation(users)
+
 class UserSerializer(serializers.ModelSerializer):
     follower_count = serializers.CharField(source='formatted_follower_count', read_only=True)
     following_count = serializers.CharField(source='formatted_following_count', read_only=True)
@@ -16,12 +26,10 @@ class UserSerializer(serializers.ModelSerializer):
             'created_at', 'follower_count', 'following_count', 'post_count', 'is_following'
         ]
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = UserListSerializer
     
     def get_is_following(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.followers.filter(follower=request.user).exists()
-        return False
+        return get_viewer(self.context).is_following(obj.pk)
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
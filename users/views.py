@@ -3,13 +3,18 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from .serializers import UserSerializer, UserCreateSerializer
+from designs.cache import bump_users
+from fab_sketch_project.conditional import conditional_response, make_etag
+from social.models import Follow
 
 User = get_user_model()
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_value_regex = r'\d+'
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -23,22 +28,34 @@ class UserViewSet(viewsets.ModelViewSet):
                           status=status.HTTP_403_FORBIDDEN)
         return super().update(request, *args, **kwargs)
     
+    def perform_update(self, serializer):
+        user = serializer.save()
+        bump_users(user.pk)
+    
     @action(detail=True, methods=['get'])
     def profile(self, request, pk=None):
         """Get user profile with stats"""
-        user = self.get_object()
-        serializer = self.get_serializer(user)
-        data = serializer.data
-        
-        # Add social stats
-        data['followers_count'] = user.followers.count()
-        data['following_count'] = user.following.count()
-        data['designs_count'] = user.designs.count()
+        def render():
+            user = self.get_object()
+            serializer = self.get_serializer(user)
+            data = serializer.data
+            
+            # Add social stats
+            data['followers_count'] = user.follower_count
+            data['following_count'] = user.following_count
+            data['designs_count'] = user.design_count
+            
+            return Response(data)
         
-        # Check if current user follows this user
+        users = User.objects.filter(pk=pk)
+        fields = ['updated_at', 'follower_count', 'following_count', 'design_count']
         if request.user.is_authenticated:
-            data['is_following'] = user.followers.filter(follower=request.user).exists()
-        else:
-            data['is_following'] = False
-            
-        return Response(data)
+            users = users.annotate(viewer_follows=Exists(
+                Follow.objects.filter(followee_id=OuterRef('pk'), follower_id=request.user.pk)
+            ))
+            fields.append('viewer_follows')
+        row = users.values_list(*fields).first()
+        if row is None:
+            return render()
+        etag = make_etag('profile', pk, request.user.pk, *row)
+        return conditional_response(request, etag, row[0], render)